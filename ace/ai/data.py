@@ -6,20 +6,56 @@ Collection of classes and functions for loading and manipulating data for the AI
 IntentClassifierDataset:
     All the data and functionality needed to train an intent classifier model.
 
-#### Functions: None
+EntityValues:
+    The sorted values of a single entity, read from a compiled entity store.
+
+EntityStore:
+    Compiled entity values, memory-mapped from disk instead of loaded into memory.
+
+#### Functions:
+
+load_entities(entities_directory: str = "data/rules/entities") -> dict
+    Load the entities into a dictionary from the entities files.
+
+load_intents(intents_directory: str = "data/rules/intents") -> dict
+    Load the intents into a dictionary from the intents files.
+
+intent_dependencies(raw_intents: dict) -> dict[str, set[str]]
+    Find the entities used in the templates of each intent.
+
+generate_intent_dataset(
+    raw_intents: dict,
+    raw_entities: dict,
+    num_examples: int = 100,
+    cache_directory: Union[str, None] = None,
+) -> dict[str, Union[set[str], list[str]]]
+    Generates all combinations of intents and entities, but only if the entity is in the intent.
+
+save_dataset(dataset: dict[str, Union[set[str], list[str]]], directory: str, filename: str = "dataset.csv") -> None
+    Save the dataset to the given format.
 """
 
+import hashlib
 import itertools
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Mapping, Sequence
 from pathlib import Path
 import re
 import csv
-from typing import Union
+from typing import Iterator, Union
 
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
 from ace.utils import Logger
 
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:['-][^\W_]+)*")
+STORE_MANIFEST = "manifest.json"
+
 logger = Logger.from_toml(config_file_name="logs.toml", log_name="data")
 
 
@@ -138,6 +174,342 @@ class IntentClassifierDataset:
         return data
 
 
+class _StringTable:
+    """
+    Sorted strings, memory-mapped from a file of their UTF-8 bytes along with the
+    offset of each string and an index of where the strings starting with each byte
+    begin, so a string can be found with a binary search.
+
+    #### Parameters:
+
+    path: Path
+        The path of the table, without the file suffixes.
+
+    #### Methods: None
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._data = _map_file(Path(f"{path}.bin"))
+        # Offsets are read as Python ints straight from the mapped file
+        self._offsets = memoryview(_map_file(Path(f"{path}.offsets"))).cast("q")
+        self._index = memoryview(Path(f"{path}.index").read_bytes()).cast("q").tolist()
+        self._size = len(self._offsets) - 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> str:
+        if not -len(self) <= index < len(self):
+            raise IndexError("String table index out of range")
+        return self._bytes(index % len(self)).decode("utf-8")
+
+    def __contains__(self, string: object) -> bool:
+        if not isinstance(string, str):
+            return False
+        key = string.encode("utf-8")
+        position = self._bisect(key)
+        return position < self._size and self._bytes(position) == key
+
+    def lookup(self, words: str) -> tuple[bool, bool]:
+        """
+        Look up a string of words separated by single spaces.
+
+        #### Parameters:
+
+        words: str
+            The words to look up.
+
+        #### Returns: tuple[bool, bool]
+            Whether the words are in the table, and whether a string in the table
+            starts with the words followed by more words.
+
+        #### Raises: None
+        """
+        key = words.encode("utf-8")
+        position = self._bisect(key)
+        found = position < self._size and self._bytes(position) == key
+        # No byte of a word sorts before a space, so longer strings come next
+        position += found
+        return found, position < self._size and self._bytes(position).startswith(
+            key + b" "
+        )
+
+    def _bytes(self, index: int) -> bytes:
+        return self._data[self._offsets[index] : self._offsets[index + 1]]
+
+    def _bisect(self, key: bytes) -> int:
+        # Only search the strings with the same first byte
+        low, high = (
+            (self._index[key[0]], self._index[key[0] + 1]) if key else (0, self._size)
+        )
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @staticmethod
+    def write(path: Path, strings: list[str]) -> None:
+        """
+        Write the sorted strings to the files of a table.
+
+        #### Parameters:
+
+        path: Path
+            The path of the table, without the file suffixes.
+
+        strings: list[str]
+            The strings to write, sorted and without duplicates or empty strings.
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        # Sorting by code point is the same as sorting the UTF-8 bytes
+        encoded = [string.encode("utf-8") for string in strings]
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        first_bytes = np.array([string[0] for string in encoded], dtype=np.int64)
+
+        Path(f"{path}.bin").write_bytes(b"".join(encoded))
+        offsets.tofile(f"{path}.offsets")
+        np.searchsorted(first_bytes, np.arange(257)).astype(np.int64).tofile(
+            f"{path}.index"
+        )
+
+
+def _map_file(path: Path) -> Union[mmap.mmap, bytes]:
+    """
+    Helper function to memory-map a file for reading.
+
+    #### Parameters:
+
+    path: Path
+        The file to map.
+
+    #### Returns: Union[mmap.mmap, bytes]
+        The mapped file, or no bytes if the file is empty.
+
+    #### Raises: None
+    """
+    with open(path, "rb") as file:
+        # An empty file cannot be memory-mapped
+        if not os.fstat(file.fileno()).st_size:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class EntityValues(Sequence):
+    """
+    The values of a single entity, read from a compiled entity store. The values
+    are sorted and without duplicates, and each one is only decoded when it is
+    used. The values can also be looked up by their tokens, ignoring case and
+    punctuation, for the rule-based matchers.
+
+    #### Parameters:
+
+    directory: Path
+        The directory the entity was compiled into.
+
+    fingerprint: str
+        The SHA-256 hex digest of the entity file the values were compiled from.
+
+    #### Methods:
+
+    match(tokens: list[str], start: int = 0, short: bool = False) -> Iterator[int]
+        Find the values that start at the given token.
+    """
+
+    def __init__(self, directory: Path, fingerprint: str) -> None:
+        self.fingerprint = fingerprint
+        self._values = _StringTable(directory / "values")
+        self._keys = _StringTable(directory / "keys")
+        self._short_keys = _StringTable(directory / "short_keys")
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, index):  # type: ignore
+        if isinstance(index, slice):
+            return [self._values[i] for i in range(*index.indices(len(self)))]
+        return self._values[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._values[index] for index in range(len(self)))
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._values
+
+    def __repr__(self) -> str:
+        return f"EntityValues({len(self)} values)"
+
+    def match(
+        self, tokens: list[str], start: int = 0, short: bool = False
+    ) -> Iterator[int]:
+        """
+        Find the values that start at the given token. The tokens are compared to
+        the lowercase words of each value, so case and punctuation are ignored.
+
+        #### Parameters:
+
+        tokens: list[str]
+            The lowercase tokens of the text.
+
+        start: int (default: 0)
+            The position of the first token of the value.
+
+        short: bool (default: False)
+            Whether a value written as "name, qualifier" can also be found by the
+            name alone, e.g. "tokyo, japan" by "tokyo".
+
+        #### Returns: Iterator[int]
+            The positions just after each matching value, in order.
+
+        #### Raises: None
+        """
+        tables = [self._keys, self._short_keys] if short else [self._keys]
+
+        key = ""
+        for position in range(start, len(tokens)):
+            key = f"{key} {tokens[position]}" if key else tokens[position]
+            found, longer = False, False
+            for table in tables:
+                in_table, longer_in_table = table.lookup(key)
+                found, longer = found or in_table, longer or longer_in_table
+
+            if found:
+                yield position + 1
+            # Stop as soon as no longer value could match
+            if not longer:
+                return
+
+
+class EntityStore(Mapping):
+    """
+    Compiled entity values, memory-mapped from disk instead of loaded into memory,
+    so very large entity files can be used. Each entity is compiled into tables of
+    sorted strings with an index of their first bytes, and is read as an
+    `EntityValues` sequence. The store can be used in place of the dictionary from
+    `load_entities`.
+
+    #### Parameters:
+
+    store_directory: str (default: "models/entities")
+        The directory the entities were compiled into.
+
+    #### Methods:
+
+    build(
+        entities_directory: str = "data/rules/entities",
+        store_directory: str = "models/entities",
+    ) -> EntityStore
+        Compile the entity files into a store, only compiling the files that have
+        changed.
+    """
+
+    def __init__(self, store_directory: str = "models/entities") -> None:
+        self.directory = Path(store_directory)
+        manifest = json.loads(
+            (self.directory / STORE_MANIFEST).read_text(encoding="utf-8")
+        )
+        self._entities = {
+            name: EntityValues(self.directory / name, entry["fingerprint"])
+            for name, entry in manifest.items()
+        }
+
+    def __getitem__(self, name: str) -> EntityValues:
+        return self._entities[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entities)
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    @staticmethod
+    def build(
+        entities_directory: str = "data/rules/entities",
+        store_directory: str = "models/entities",
+    ) -> "EntityStore":
+        """
+        Compile the entity files into a store. Each entity is only compiled again
+        when its file has changed, and the entities whose files were removed are
+        removed from the store.
+
+        #### Parameters:
+
+        entities_directory: str (default: "data/rules/entities")
+            The directory containing the entity files.
+
+        store_directory: str (default: "models/entities")
+            The directory to compile the entities into.
+
+        #### Returns: EntityStore
+            The compiled entity store.
+
+        #### Raises: FileNotFoundError
+            If no entities are found in the given directory.
+        """
+        entities_dir = Path(entities_directory)
+        store_dir = Path(store_directory)
+        store_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            manifest = json.loads(
+                (store_dir / STORE_MANIFEST).read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            manifest = {}
+
+        with logger.log_context(
+            "info",
+            f"Compiling entities from {entities_dir} into: {store_dir}",
+            "Finished compiling entities",
+        ):
+            compiled = {}
+            for entity in sorted(entities_dir.glob("*.entity")):
+                content = entity.read_bytes()
+                fingerprint = hashlib.sha256(content).hexdigest()
+
+                if (
+                    manifest.get(entity.stem, {}).get("fingerprint") == fingerprint
+                    and (store_dir / entity.stem).is_dir()
+                ):
+                    compiled[entity.stem] = manifest[entity.stem]
+                    continue
+
+                values = sorted(set(content.decode("utf-8").splitlines()) - {""})
+                if not values:
+                    logger.log("warning", f"Skipping empty entity file: {entity}")
+                    continue
+
+                logger.log("debug", f"Compiling {len(values)} values of: {entity}")
+                _compile_entity(store_dir / entity.stem, values)
+                compiled[entity.stem] = {
+                    "fingerprint": fingerprint,
+                    "values": len(values),
+                }
+
+            if not compiled:
+                logger.log("fatal", "No entities found.")
+                raise FileNotFoundError(
+                    f"No entities found in directory '{entities_dir}'."
+                )
+
+            for name in set(manifest) - set(compiled):
+                logger.log("debug", f"Removing compiled entity: {name}")
+                shutil.rmtree(store_dir / name, ignore_errors=True)
+
+            (store_dir / STORE_MANIFEST).write_text(
+                json.dumps(compiled, indent=4), encoding="utf-8"
+            )
+
+        return EntityStore(str(store_dir))
+
+
 def load_entities(entities_directory: str = "data/rules/entities") -> dict:
     """
     Load the entities into a dictionary from the entities files.
@@ -215,64 +587,105 @@ def load_intents(intents_directory: str = "data/rules/intents") -> dict:
     return intents
 
 
+def intent_dependencies(raw_intents: dict) -> dict[str, set[str]]:
+    """
+    Find the entities used in the templates of each intent, so an intent only has to
+    be regenerated when its templates or one of these entities change.
+
+    #### Parameters:
+
+    raw_intents: dict
+        A dictionary of the intents and their values.
+
+    #### Returns: dict[str, set[str]]
+        The names of the entities used by each intent.
+
+    #### Raises: None
+    """
+    return {
+        intent: {
+            entity
+            for template in intent_templates
+            for entity in re.findall(r"{(.*?)}", template)
+        }
+        for intent, intent_templates in raw_intents.items()
+    }
+
+
 def generate_intent_dataset(
-    raw_intents: dict, raw_entities: dict, num_examples: int = 100
+    raw_intents: dict,
+    raw_entities: dict,
+    num_examples: int = 100,
+    cache_directory: Union[str, None] = None,
 ) -> dict[str, Union[set[str], list[str]]]:
     """
     Generates all combinations of intents and entities, but only if the entity is in the intent.
 
+    If a cache directory is given, the examples of each intent are saved there along
+    with a fingerprint of the intent's templates and the entities they use. Only the
+    intents whose fingerprint has changed are generated again.
+
     #### Parameters:
 
     raw_intents: dict
         A dictionary of the intents and their values.
 
     raw_entities: dict
-        A dictionary of the entities and their values.
+        A dictionary of the entities and their values, or an `EntityStore`.
 
     num_examples: int (default: 100)
         The number of examples to generate for each intent.
 
+    cache_directory: Union[str, None] (default: None)
+        The directory to cache the examples of each intent in. Leave empty to
+        generate every intent.
+
     #### Returns: dict[str, Union[set[str], list[str]]
         The generated dataset.
             format: {intent: {example1, example2, ...}}
                     {intent: [example1, example2, ...]}
 
-    #### Raises: None
+    #### Raises: ValueError
+        If no examples are generated.
     """
+    cache_dir = Path(cache_directory) if cache_directory else None
+    dependencies = intent_dependencies(raw_intents)
 
     dataset = {}
+    regenerated = []
     for intent, intent_templates in tqdm(raw_intents.items(), desc="Creating dataset"):
-        logger.log("info", f"Creating dataset for intent '{intent}'.")
-
-        examples = []
-        for template in intent_templates:
-            logger.log("debug", f"Generating examples for template: {template}")
-
-            # Check if we have any entities in the template
-            entities = re.findall(r"{(.*?)}", template)
-            logger.log("debug", f"Entities in template: {entities}")
+        fingerprint = _intent_fingerprint(
+            intent_templates,
+            {
+                entity: _entity_fingerprint(raw_entities.get(entity))
+                for entity in sorted(dependencies[intent])
+            },
+            num_examples,
+        )
+        cache_file = cache_dir / f"{intent}.json" if cache_dir else None
+
+        if (
+            cache_file
+            and (examples := _load_examples(cache_file, fingerprint)) is not None
+        ):
+            logger.log("debug", f"Using cached examples for intent '{intent}'.")
+            dataset[intent] = examples
+            continue
 
-            if not entities:
-                examples.append(template)
-                continue
+        logger.log("info", f"Creating dataset for intent '{intent}'.")
+        dataset[intent] = _generate_examples(
+            intent_templates, raw_entities, num_examples
+        )
+        regenerated.append(intent)
 
-            # Generate all possible combinations of entities
-            try:
-                examples = list(
-                    map(
-                        lambda combination: template.format(
-                            **dict(zip(entities, combination))
-                        ),
-                        itertools.product(
-                            *[raw_entities[entity] for entity in entities]
-                        ),
-                    )
-                )
-            except KeyError as e:
-                logger.log("warning", f"No entity examples found for: {e}")
-                continue
+        if cache_file:
+            _save_examples(cache_file, fingerprint, dataset[intent])
 
-        dataset[intent] = set(examples[:num_examples])
+    if cache_dir:
+        logger.log(
+            "info",
+            f"Regenerated {len(regenerated)} of {len(dataset)} intents: {regenerated}",
+        )
 
     # Check if we have any examples
     if not dataset:
@@ -329,6 +742,63 @@ def save_dataset(
             raise ValueError(f"Unsupported file type: {save_path.suffix}")
 
 
+def _compile_entity(directory: Path, values: list[str]) -> None:
+    """
+    Helper function to compile the values of an entity into its string tables: the
+    values, their lowercase words, and the lowercase words of the name before the
+    first comma of each value.
+
+    #### Parameters:
+
+    directory: Path
+        The directory to compile the entity into.
+
+    values: list[str]
+        The sorted values of the entity.
+
+    #### Returns: None
+
+    #### Raises: None
+    """
+    # Compile next to the old tables, then swap them, so the old tables are
+    # never left half written
+    staging = directory.with_name(f"{directory.name}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    _StringTable.write(staging / "values", values)
+    _StringTable.write(
+        staging / "keys", sorted({_key(value) for value in values} - {""})
+    )
+    _StringTable.write(
+        staging / "short_keys",
+        sorted(
+            {_key(value.split(",", 1)[0]) for value in values if "," in value} - {""}
+        ),
+    )
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+
+def _key(value: str) -> str:
+    """
+    Helper function to find the key of a value: its lowercase words, ignoring
+    punctuation and spacing.
+
+    #### Parameters:
+
+    value: str
+        The value of an entity.
+
+    #### Returns: str
+        The words of the value, separated by single spaces.
+
+    #### Raises: None
+    """
+    return " ".join(TOKEN_PATTERN.findall(value.lower()))
+
+
 def _save_as_csv(
     dataset: dict[str, Union[set[str], list[str]]], save_path: Path
 ) -> None:
@@ -353,3 +823,187 @@ def _save_as_csv(
         for intent, examples in dataset.items():
             for example in examples:
                 writer.writerow([example, intent])
+
+
+def _generate_examples(
+    intent_templates: list[str], raw_entities: dict, num_examples: int
+) -> set[str]:
+    """
+    Helper function to generate the examples of a single intent from its templates.
+
+    #### Parameters:
+
+    intent_templates: list[str]
+        The templates of the intent.
+
+    raw_entities: dict
+        A dictionary of the entities and their values.
+
+    num_examples: int
+        The number of examples to generate.
+
+    #### Returns: set[str]
+        The generated examples.
+
+    #### Raises: None
+    """
+    examples = []
+    for template in intent_templates:
+        logger.log("debug", f"Generating examples for template: {template}")
+
+        # Check if we have any entities in the template
+        entities = re.findall(r"{(.*?)}", template)
+        logger.log("debug", f"Entities in template: {entities}")
+
+        if not entities:
+            examples.append(template)
+            continue
+
+        # Generate the combinations of entities, stopping once there are enough
+        try:
+            examples = list(
+                itertools.islice(
+                    map(
+                        lambda combination: template.format(
+                            **dict(zip(entities, combination))
+                        ),
+                        _product([raw_entities[entity] for entity in entities]),
+                    ),
+                    num_examples,
+                )
+            )
+        except KeyError as e:
+            logger.log("warning", f"No entity examples found for: {e}")
+            continue
+
+    return set(examples[:num_examples])
+
+
+def _product(sequences: list) -> Iterator[tuple]:
+    """
+    Helper function to generate the combinations of the values in each sequence,
+    in the same order as `itertools.product`, without copying the sequences.
+
+    #### Parameters:
+
+    sequences: list
+        The sequences to combine, e.g. lists or `EntityValues`.
+
+    #### Returns: Iterator[tuple]
+        Each combination of values.
+
+    #### Raises: None
+    """
+    if not all(len(sequence) for sequence in sequences):
+        return
+
+    indices = [0] * len(sequences)
+    while True:
+        yield tuple(sequence[index] for sequence, index in zip(sequences, indices))
+
+        # Advance the last sequence fastest, like an odometer
+        for position in reversed(range(len(sequences))):
+            indices[position] += 1
+            if indices[position] < len(sequences[position]):
+                break
+            indices[position] = 0
+        else:
+            return
+
+
+def _entity_fingerprint(values: Union[Sequence, None]) -> Union[list, str, None]:
+    """
+    Helper function to find what to fingerprint for the values of an entity.
+
+    #### Parameters:
+
+    values: Union[Sequence, None]
+        The values of the entity, or None if the entity does not exist.
+
+    #### Returns: Union[list, str, None]
+        The fingerprint of the entity file for compiled values, otherwise the
+        values themselves.
+
+    #### Raises: None
+    """
+    return values.fingerprint if isinstance(values, EntityValues) else values
+
+
+def _intent_fingerprint(
+    intent_templates: list[str], entities: dict, num_examples: int
+) -> str:
+    """
+    Helper function to fingerprint everything the examples of an intent depend on.
+
+    #### Parameters:
+
+    intent_templates: list[str]
+        The templates of the intent.
+
+    entities: dict
+        The values of each entity used by the templates, or None if the entity
+        does not exist.
+
+    num_examples: int
+        The number of examples to generate.
+
+    #### Returns: str
+        The SHA-256 hex digest of the inputs.
+
+    #### Raises: None
+    """
+    content = json.dumps([intent_templates, entities, num_examples], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _load_examples(cache_file: Path, fingerprint: str) -> Union[set[str], None]:
+    """
+    Helper function to load the cached examples of an intent.
+
+    #### Parameters:
+
+    cache_file: Path
+        The file the examples were cached in.
+
+    fingerprint: str
+        The fingerprint of the intent's current templates and entities.
+
+    #### Returns: Union[set[str], None]
+        The cached examples, or None if they are missing or out of date.
+
+    #### Raises: None
+    """
+    try:
+        cached = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("fingerprint") != fingerprint:
+        return None
+    return set(cached["examples"])
+
+
+def _save_examples(cache_file: Path, fingerprint: str, examples: set[str]) -> None:
+    """
+    Helper function to cache the examples of an intent.
+
+    #### Parameters:
+
+    cache_file: Path
+        The file to cache the examples in.
+
+    fingerprint: str
+        The fingerprint of the intent's templates and entities.
+
+    examples: set[str]
+        The generated examples.
+
+    #### Returns: None
+
+    #### Raises: None
+    """
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(
+        json.dumps({"fingerprint": fingerprint, "examples": sorted(examples)}),
+        encoding="utf-8",
+    )
@@ -0,0 +1,364 @@
+"""
+A lightweight runtime for the intent classifier that only needs NumPy. It loads the
+n-gram weights exported from a trained TextCatBOW model, so the assistant can
+classify intents without importing spaCy or thinc.
+
+#### Classes:
+
+LiteIntentClassifierModel:
+    Predicts intents from an exported TextCatBOW model using NumPy only.
+
+#### Functions:
+
+confidence(scores: np.ndarray) -> Union[float, np.ndarray]
+    Calculate the confidence of a prediction, or of each row of a score matrix.
+
+tokenise(text: str) -> list[str]
+    Split text into tokens the same way as spaCy's English tokenizer, for the
+    kinds of text the assistant is given.
+"""
+
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Union
+
+import numpy as np
+import toml
+
+from ace.utils import Logger
+
+CONFIG_PATH = os.path.join("config", "ai.toml")
+TOKEN_PATTERN = re.compile(r"n't\b|'\w+|\w+(?=n't\b)|\w+(?:\.\w+)*|[^\w\s]")
+
+logger = Logger.from_toml(config_file_name="logs.toml", log_name="models")
+
+
+def confidence(scores: np.ndarray) -> Union[float, np.ndarray]:
+    """
+    Calculate the confidence of a prediction. This is done by getting the standard
+    deviation of the scores and dividing it by the mean of the scores.
+
+    #### Parameters:
+
+    scores: np.ndarray
+        The scores for a single prediction, or a matrix of scores with one
+        prediction per row.
+
+    #### Returns: Union[float, np.ndarray]
+        The confidence of the prediction, or of each row of the matrix.
+
+    #### Raises: None
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.shape[-1] < 2:
+        return np.zeros(scores.shape[:-1])
+
+    mean = scores.mean(axis=-1)
+    deviation = scores.std(axis=-1, ddof=1)
+
+    # All zero scores have no confidence
+    return np.divide(deviation, mean, out=np.zeros_like(mean), where=mean > 0)
+
+
+def tokenise(text: str) -> list[str]:
+    """
+    Split text into tokens the same way as spaCy's English tokenizer, for the kinds
+    of text the assistant is given: words, punctuation and contractions.
+
+    #### Parameters:
+
+    text: str
+        The text to split.
+
+    #### Returns: list[str]
+        The tokens in the text.
+
+    #### Raises: None
+    """
+    return TOKEN_PATTERN.findall(text)
+
+
+class LiteIntentClassifierModel:
+    """
+    Predicts intents from an exported TextCatBOW model using NumPy only. The
+    exported file holds the weights of every n-gram seen in training, so the
+    text's n-grams are looked up directly, with no hashing.
+
+    #### Parameters:
+
+    path: Union[str, Path] (default: "models/intents/model-lite.npz")
+        The path to the exported model.
+
+    threshold: float (default: 0.5)
+        The threshold to use when predicting the intent.
+
+    #### Methods:
+
+    from_toml(config_file: Union[str, None] = None) -> LiteIntentClassifierModel
+        Load the model using the location and threshold of the intent classifier
+        in a TOML file.
+
+    predict(text: str) -> str
+        Predict the intent of the given text.
+
+    predict_batch(texts: Iterable[str]) -> list[tuple[str, dict[str, float]]]
+        Predict the intents of many texts at once.
+
+    predict_scores(text: str) -> list[tuple[str, float]]
+        Predict the score of every intent for the given text, ranked from highest to lowest.
+
+    top_k(text: str, k: int = 3) -> list[tuple[str, float]]
+        Predict the k highest scoring intents for the given text.
+
+    scores(texts: list[str]) -> np.ndarray
+        Score each text against every intent.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = "models/intents/model-lite.npz",
+        threshold: float = 0.5,
+    ) -> None:
+        self.path = Path(path)
+        self.threshold = threshold
+
+        with logger.log_context(
+            "info",
+            f"Loading lite intent classifier from: {self.path}",
+            "Finished loading lite intent classifier",
+        ):
+            with np.load(self.path, allow_pickle=False) as archive:
+                self.labels = tuple(archive["labels"].tolist())
+                self.ngram_size = int(archive["ngram_size"])
+                self.activation = str(archive["activation"])
+                self._bias = archive["bias"].astype(np.float32)
+                self._weights = archive["weights"]
+                # Compacted models store int8 weights with a scale for each n-gram
+                self._scales = (
+                    archive["scales"].astype(np.float32)
+                    if "scales" in archive.files
+                    else None
+                )
+                self._features = {
+                    feature: row
+                    for row, feature in enumerate(archive["features"].tolist())
+                }
+
+    @staticmethod
+    def from_toml(config_file: Union[str, None] = None) -> "LiteIntentClassifierModel":
+        """
+        Load the model using the location and threshold of the intent classifier
+        in a TOML file. Leave the config_file parameter empty to load the
+        configuration from the default location: config/ai.toml.
+
+        #### Parameters:
+
+        config_file: Union[str, None] (default: None)
+            The path to the TOML file to load the configuration from.
+
+        #### Returns: LiteIntentClassifierModel
+            The lite intent classifier model.
+
+        #### Raises: None
+        """
+        config = toml.load(config_file or CONFIG_PATH)["IntentClassifierModelConfig"]
+        return LiteIntentClassifierModel(
+            config.get("lite_model_location", "models/intents/model-lite.npz"),
+            config.get("threshold", 0.5),
+        )
+
+    def predict(self, text: str) -> str:
+        """
+        Predict the intent of the given text.
+
+        #### Parameters:
+
+        text: str
+            The text to predict the intent of.
+
+        #### Returns: str
+            The predicted intent.
+
+        #### Raises: None
+        """
+        return self._intents(self.scores([text]))[0]
+
+    def predict_batch(self, texts: Iterable[str]) -> list[tuple[str, dict[str, float]]]:
+        """
+        Predict the intents of many texts at once.
+
+        #### Parameters:
+
+        texts: Iterable[str]
+            The texts to predict the intents of.
+
+        #### Returns: list[tuple[str, dict[str, float]]]
+            A list of tuples containing the predicted intent and the scores for
+            each intent, in the same order as the given texts.
+
+        #### Raises: None
+        """
+        scores = self.scores(list(texts))
+        return [
+            (intent, dict(zip(self.labels, row.tolist())))
+            for intent, row in zip(self._intents(scores), scores)
+        ]
+
+    def predict_scores(self, text: str) -> list[tuple[str, float]]:
+        """
+        Predict the score of every intent for the given text.
+
+        #### Parameters:
+
+        text: str
+            The text to score.
+
+        #### Returns: list[tuple[str, float]]
+            The intents and their scores, ranked from the highest to the lowest score.
+
+        #### Raises: None
+        """
+        return self.top_k(text, len(self.labels))
+
+    def top_k(self, text: str, k: int = 3) -> list[tuple[str, float]]:
+        """
+        Predict the k highest scoring intents for the given text.
+
+        #### Parameters:
+
+        text: str
+            The text to score.
+
+        k: int (default: 3)
+            The number of intents to return.
+
+        #### Returns: list[tuple[str, float]]
+            The k highest scoring intents and their scores, ranked from the highest
+            to the lowest score.
+
+        #### Raises: None
+        """
+        scores = self.scores([text])[0]
+        ranked = np.argsort(-scores, kind="stable")[: max(k, 0)]
+        return [(self.labels[index], float(scores[index])) for index in ranked]
+
+    def scores(self, texts: list[str]) -> np.ndarray:
+        """
+        Score each text against every intent.
+
+        #### Parameters:
+
+        texts: list[str]
+            The texts to score.
+
+        #### Returns: np.ndarray
+            A matrix of shape (number of texts, number of labels) holding the scores.
+
+        #### Raises: None
+        """
+        logits = np.tile(self._bias, (len(texts), 1))
+        empty = np.zeros(len(texts), dtype=bool)
+
+        for index, text in enumerate(texts):
+            if not (ngrams := self._ngrams(text)):
+                empty[index] = True
+                continue
+
+            rows, counts = self._rows(ngrams)
+            if rows:
+                if self._scales is not None:
+                    counts *= self._scales[rows]
+                logits[index] += counts @ self._weights[rows]
+
+        scores = self._activate(logits)
+
+        # spaCy gives no scores to texts without any tokens
+        scores[empty] = 0
+        return scores
+
+    def _ngrams(self, text: Union[str, None]) -> Counter:
+        """
+        Helper function to count the n-grams in the normalised text.
+
+        #### Parameters:
+
+        text: Union[str, None]
+            The text to count the n-grams of.
+
+        #### Returns: Counter
+            The number of times each n-gram appears in the text.
+
+        #### Raises: None
+        """
+        tokens = tokenise(text.strip().lower()) if text else []
+        return Counter(
+            " ".join(tokens[start : start + size])
+            for size in range(1, self.ngram_size + 1)
+            for start in range(len(tokens) - size + 1)
+        )
+
+    def _rows(self, ngrams: Counter) -> tuple[list[int], np.ndarray]:
+        """
+        Helper function to find the weight rows of the n-grams.
+
+        #### Parameters:
+
+        ngrams: Counter
+            The number of times each n-gram appears in the text.
+
+        #### Returns: tuple[list[int], np.ndarray]
+            The rows of the known n-grams and the number of times each appears.
+
+        #### Raises: None
+        """
+        rows, counts = [], []
+        for ngram, count in ngrams.items():
+            if (row := self._features.get(ngram)) is not None:
+                rows.append(row)
+                counts.append(count)
+        return rows, np.asarray(counts, dtype=np.float32)
+
+    def _activate(self, logits: np.ndarray) -> np.ndarray:
+        """
+        Helper function to apply the output activation of the exported model.
+
+        #### Parameters:
+
+        logits: np.ndarray
+            The raw scores for each text.
+
+        #### Returns: np.ndarray
+            The activated scores.
+
+        #### Raises: None
+        """
+        if self.activation == "softmax":
+            exponents = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            return exponents / exponents.sum(axis=-1, keepdims=True)
+        if self.activation == "logistic":
+            return 1 / (1 + np.exp(-logits))
+        return logits
+
+    def _intents(self, scores: np.ndarray) -> list[str]:
+        """
+        Helper function to pick the intent for each row of a score matrix.
+
+        #### Parameters:
+
+        scores: np.ndarray
+            A matrix of shape (number of texts, number of labels) holding the scores.
+
+        #### Returns: list[str]
+            The predicted intent for each row, or "unknown" if the model is not
+            confident enough.
+
+        #### Raises: None
+        """
+        confident = confidence(scores) >= self.threshold
+        best = scores.argmax(axis=-1)
+        return [
+            self.labels[index] if is_confident else "unknown"
+            for index, is_confident in zip(best, confident)
+        ]
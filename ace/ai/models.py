@@ -15,21 +15,56 @@ NERModelConfig:
 NERModel:
     A model that can be used to recognize named entities.
 
+PredictionCache:
+    A bounded, in-process cache for model predictions that tracks how often it is used.
+
+MicroBatcher:
+    Collects concurrent asyncio requests into batches.
+
+ModelHolder:
+    Holds a loaded model and swaps in a new one without restarting.
+
+LazyModel:
+    Loads a model the first time it is used, or in the background once asked.
+
+TrainingStep:
+    The metrics from one evaluation step while training a spaCy pipeline.
+
+TrainingSummary:
+    The results of training a spaCy pipeline.
+
 #### Functions: None
 """
 
+import asyncio
+import hashlib
+import itertools
+import json
 import os
-from dataclasses import dataclass
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
 from pathlib import Path
-from typing import Union
-from statistics import stdev, mean
+from typing import Any, Callable, Iterable, Iterator, Union
 
+import numpy as np
 import spacy
 import toml
-from spacy.tokens import DocBin
+from cachetools import FIFOCache, LFUCache, LRUCache
+from spacy.cli.init_config import fill_config
+from spacy.tokens import Doc, DocBin
+from spacy.vocab import Vocab
+from spacy.training import Example
+from spacy.training.initialize import init_nlp
+from spacy.training.loop import train as train_nlp
 from tqdm import tqdm
 
-from ace.ai import data
+from ace.ai import data, lite
+from ace.prefork import PreforkPool
 from ace.utils import Logger
 
 SEED = 42
@@ -37,6 +72,9 @@ CONFIG_PATH = os.path.join("config", "ai.toml")
 
 logger = Logger.from_toml(config_file_name="logs.toml", log_name="models")
 
+# The callback of the current training run, used by the registered training logger
+_training_callback: Union[Callable[["TrainingStep"], None], None] = None
+
 
 @dataclass
 class IntentClassifierModelConfig:
@@ -61,10 +99,21 @@ class IntentClassifierModelConfig:
         The path to save the validation data to.
 
     rebuild_config: bool (default: False)
-        Whether or not to rebuild the config file.
+        Whether or not to rebuild the config file. It is only rebuilt if the base
+        config or spaCy version has changed since it was last built.
 
     rebuild_data: bool (default: False)
-        Whether or not to rebuild the data files.
+        Whether or not to rebuild the data files. They are only rebuilt if the data
+        file, split, seed, spaCy model or shard size has changed since they were
+        last built.
+
+    force_rebuild: bool (default: False)
+        Whether or not to rebuild the config and data files even if their inputs
+        have not changed.
+
+    data_cache_dir: str (default: "data/intents/cache")
+        The directory to cache the prepared docs of each intent in, so only the
+        intents whose examples have changed are prepared again.
 
     best_model_location: str (default: "models/intents/model-best")
         The path to save the best model to.
@@ -81,6 +130,60 @@ class IntentClassifierModelConfig:
     mode: str (default: "train")
         The mode to run the model in. Can be "train" or "predict".
 
+    cache_size: int (default: 0)
+        The maximum number of predictions to cache. Set to 0 to disable the cache.
+
+    cache_eviction: str (default: "lru")
+        The policy used to evict predictions when the cache is full. Can be "lru",
+        "lfu" or "fifo".
+
+    components: list[str] (default: [])
+        The pipeline components to load. Any other components are excluded, leaving
+        just the tokenizer if none of them are in the pipeline. Leave empty to
+        load every component.
+
+    lite_model_location: str (default: "models/intents/model-lite.npz")
+        The path to export the model to for the NumPy only runtime.
+
+    runtime: str (default: "spacy")
+        The runtime used to make predictions outside of training. Can be "spacy" to
+        use the spaCy pipeline, or "lite" to use the exported (or compacted) model
+        at `lite_model_location` with the NumPy only runtime.
+
+    max_batch_size: int (default: 32)
+        The maximum number of concurrent `apredict` calls to classify together.
+
+    max_wait_ms: float (default: 5.0)
+        The maximum time in milliseconds an `apredict` call waits for others to
+        join its batch.
+
+    n_process: int (default: 1)
+        The number of processes to use when creating the training docs.
+
+    batch_size: int (default: 256)
+        The number of texts to buffer when creating the training docs.
+
+    shard_size: int (default: 0)
+        The maximum number of docs in each file of the training and validation data.
+        When set, the data paths are directories of `.spacy` files, which spaCy
+        reads as one corpus. Set to 0 to save each dataset to a single file.
+
+    watch_interval: float (default: 0.0)
+        The number of seconds between checks for a new model at
+        `best_model_location` (or `lite_model_location`) while the assistant is
+        running. Set to 0 to only load a new model when asked.
+
+    vectors_mmap_path: str (default: "")
+        The path to a `.npy` file to keep the word vectors of the spaCy model in.
+        The file is written from the model the first time, then memory-mapped
+        read-only, so processes on the same machine share the vectors. Leave empty
+        to read the vectors into each process.
+
+    analyse_with_ner: bool (default: False)
+        Whether to tokenise each message once with the named entity recognition
+        model and classify that doc, loading the model into the same vocab, so the
+        intents that need entities reuse the doc instead of tokenising it again.
+
     #### Methods:
 
     from_toml(config_file: Union[str, None] = None) -> IntentClassifierModelConfig
@@ -95,11 +198,26 @@ class IntentClassifierModelConfig:
     valid_data_save_path: str = "data/intents/dev.spacy"
     rebuild_config: bool = False
     rebuild_data: bool = False
+    force_rebuild: bool = False
+    data_cache_dir: str = "data/intents/cache"
     best_model_location: str = "models/intents/model-best"
     threshold: float = 0.5
     base_config: str = "data/intents/base_config.cfg"
     output_dir: str = "models/intents"
     mode: str = "train"
+    cache_size: int = 0
+    cache_eviction: str = "lru"
+    components: list[str] = field(default_factory=list)
+    lite_model_location: str = "models/intents/model-lite.npz"
+    runtime: str = "spacy"
+    max_batch_size: int = 32
+    max_wait_ms: float = 5.0
+    n_process: int = 1
+    batch_size: int = 256
+    shard_size: int = 0
+    watch_interval: float = 0.0
+    vectors_mmap_path: str = ""
+    analyse_with_ner: bool = False
 
     @staticmethod
     def from_toml(
@@ -133,6 +251,27 @@ class NERModelConfig:
     spacy_model: str (default: "en_core_web_md")
         The name of the spaCy model to use.
 
+    components: list[str] (default: [])
+        The pipeline components to load. Any other components are excluded. Leave
+        empty to load every component.
+
+    vectors_mmap_path: str (default: "")
+        The path to a `.npy` file to keep the word vectors of the spaCy model in.
+        The file is written from the model the first time, then memory-mapped
+        read-only, so processes on the same machine share the vectors. Leave empty
+        to read the vectors into each process.
+
+    preload: bool (default: False)
+        Whether to start loading the model in the background once the assistant
+        has started, rather than when it is first needed.
+
+    cache_size: int (default: 0)
+        The maximum number of predictions to cache. Set to 0 to disable the cache.
+
+    cache_eviction: str (default: "lru")
+        The policy used to evict predictions when the cache is full. Can be "lru",
+        "lfu" or "fifo".
+
     #### Methods:
 
     from_toml(config_file: Union[str, None] = None) -> NERModelConfig
@@ -141,6 +280,11 @@ class NERModelConfig:
     """
 
     spacy_model: str = "en_core_web_md"
+    components: list[str] = field(default_factory=list)
+    vectors_mmap_path: str = ""
+    preload: bool = False
+    cache_size: int = 0
+    cache_eviction: str = "lru"
 
     @staticmethod
     def from_toml(config_file: Union[str, None] = None) -> "NERModelConfig":
@@ -162,252 +306,3293 @@ class NERModelConfig:
         return NERModelConfig(**config["NERModelConfig"])
 
 
-class IntentClassifierModel:
+@dataclass
+class TrainingStep:
     """
-    Contains the logic for training and predicting the intent of a given text.
+    The metrics from one evaluation step while training a spaCy pipeline.
 
     #### Parameters:
 
-    config: IntentClassifierModelConfig (default: IntentClassifierModelConfig())
-        The configuration object for the intent classifier model.
+    epoch: int
+        The epoch the step was in.
+
+    step: int
+        The number of optimisation steps so far.
+
+    score: float
+        The weighted score on the validation data.
+
+    losses: dict[str, float]
+        The loss of each component.
+
+    other_scores: dict[str, Any]
+        The individual scores on the validation data, e.g. "cats_macro_f".
+
+    words_per_second: float
+        The number of training words processed per second since the last step.
+
+    seconds: float
+        The number of seconds since training started.
+
+    #### Methods: None
+    """
+
+    epoch: int
+    step: int
+    score: float
+    losses: dict[str, float]
+    other_scores: dict[str, Any]
+    words_per_second: float
+    seconds: float
+
+
+@dataclass
+class TrainingSummary:
+    """
+    The results of training a spaCy pipeline.
+
+    #### Parameters:
+
+    output_dir: str
+        The directory the trained pipelines were saved to.
+
+    best_model_location: str
+        The path to the pipeline with the best score.
+
+    best_score: float
+        The best weighted score on the validation data.
+
+    best_step: int
+        The step the best score was reached at.
+
+    epochs: int
+        The number of epochs trained for.
+
+    steps: int
+        The number of optimisation steps trained for.
+
+    seconds: float
+        The time spent training, in seconds.
+
+    history: list[TrainingStep]
+        The metrics from every evaluation step.
+
+    #### Methods: None
+    """
+
+    output_dir: str
+    best_model_location: str
+    best_score: float
+    best_step: int
+    epochs: int
+    steps: int
+    seconds: float
+    history: list[TrainingStep] = field(default_factory=list)
+
+
+class PredictionCache:
+    """
+    A bounded, in-process cache for model predictions that tracks how often it is used.
+
+    #### Parameters:
+
+    max_size: int (default: 128)
+        The maximum number of predictions to keep.
+
+    eviction: str (default: "lru")
+        The policy used to evict predictions when the cache is full. Can be "lru",
+        "lfu" or "fifo".
 
     #### Methods:
 
-    predict(text: str) -> str
-        Predict the intent of the given text.
+    get(key: str) -> Any
+        Get the cached prediction for the given key, or None if it is not cached.
+
+    put(key: str, value: Any) -> Any
+        Cache the prediction for the given key.
 
-    train() -> None
-        Prepares the data and trains the model using the given configuration.
+    ensure_version(version: str) -> None
+        Clear the cache if the given version differs from the cached version.
+
+    clear() -> None
+        Remove all of the cached predictions.
+
+    stats() -> dict[str, Union[int, float]]
+        The hit, miss and eviction counters for the cache.
     """
 
-    def __init__(
-        self, config: IntentClassifierModelConfig = IntentClassifierModelConfig()
-    ) -> None:
-        self.config = config
-        self.nlp = self._load_spacy_model(self.config.spacy_model)
+    eviction_policies = {
+        "lru": LRUCache,
+        "lfu": LFUCache,
+        "fifo": FIFOCache,
+    }
 
-    def predict(self, text: str) -> str:
+    def __init__(self, max_size: int = 128, eviction: str = "lru") -> None:
+        if eviction.lower() not in self.eviction_policies:
+            raise KeyError(
+                f"Invalid eviction policy: '{eviction}'. Valid policies are: {', '.join(self.eviction_policies)}"
+            )
+
+        self.max_size = max_size
+        self.eviction = eviction.lower()
+        self.version: Union[str, None] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._cache = self.eviction_policies[self.eviction](maxsize=max_size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
         """
-        Predict the intent of the given text.
+        The number of cached predictions.
+
+        #### Parameters: None
+
+        #### Returns: int
+            The number of cached predictions.
+
+        #### Raises: None
+        """
+        return len(self._cache)
+
+    def get(self, key: str) -> Any:
+        """
+        Get the cached prediction for the given key, or None if it is not cached.
 
         #### Parameters:
 
-        text: str
-            The text to predict the intent of.
+        key: str
+            The key to look up.
 
-        #### Returns: str
-            The predicted intent.
+        #### Returns: Any
+            The cached prediction, or None if it is not cached.
 
         #### Raises: None
         """
-        doc = self.nlp(text.strip().lower() if text else "")
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> Any:
+        """
+        Cache the prediction for the given key.
 
-        try:
-            prediction = max(doc.cats, key=doc.cats.get)  # type: ignore
-        except ValueError:
-            logger.log("error", "No predictions found")
-            return "unknown"
+        #### Parameters:
 
-        return (
-            "unknown"
-            if self._confidence(doc.cats) < self.config.threshold
-            else prediction
-        )
+        key: str
+            The key to cache the prediction under.
+
+        value: Any
+            The prediction to cache.
+
+        #### Returns: Any
+            The cached prediction.
 
-    def train(self) -> None:  # pragma: no cover
+        #### Raises: None
         """
-        Prepares the data and trains the model using the given configuration.
+        with self._lock:
+            if key not in self._cache and len(self._cache) >= self.max_size:
+                self.evictions += 1
+            self._cache[key] = value
+            return value
 
-        #### Parameters: None
+    def ensure_version(self, version: str) -> None:
+        """
+        Clear the cache if the given version differs from the version the cached
+        predictions were made with, e.g. when the model location changes.
+
+        #### Parameters:
+
+        version: str
+            The version of the model making the predictions.
 
         #### Returns: None
 
         #### Raises: None
         """
-        if self.config.rebuild_data:
-            logger.log("debug", f"Preparing data using: {self.config}")
-            self._prepare_data()
+        if version != self.version:
+            if self.version is not None:
+                logger.log(
+                    "info", f"Model changed from '{self.version}' to '{version}'"
+                )
+            self.clear()
+            self.version = version
 
-        base_config = Path(self.config.base_config)
-        full_config = base_config.with_name("config.cfg")
+    def clear(self) -> None:
+        """
+        Remove all of the cached predictions. The counters are kept.
 
-        if self.config.rebuild_config:
-            with logger.log_context(
-                "debug", "Building spaCy config", "spaCy config built"
-            ):
-                os.system(
-                    f"poetry run python -m spacy init fill-config {base_config} {full_config}"
-                )
+        #### Parameters: None
 
-        with logger.log_context(
-            "debug",
-            f"Training {type(self).__name__} using spaCy",
-            f"{type(self).__name__} trained using spaCy",
-        ):
-            os.system(
-                f"poetry run python -m spacy train {full_config} --output {Path(self.config.output_dir)}"
-            )
+        #### Returns: None
 
-    def _load_spacy_model(
-        self, spacy_model: str = "en"
-    ) -> spacy.language.Language:  # pragma: no cover
+        #### Raises: None
         """
-        Helper function to load the correct spaCy language model.
+        with self._lock:
+            self._cache.clear()
 
-        #### Parameters:
+    def stats(self) -> dict[str, Union[int, float]]:
+        """
+        The hit, miss and eviction counters for the cache.
 
-        spacy_model: str (default: "en")
-            The name of the spaCy model to load.
+        #### Parameters: None
 
-        #### Returns: spacy.language.Language
-            The spaCy language model.
+        #### Returns: dict[str, Union[int, float]]
+            The counters, along with the current size and hit rate of the cache.
 
         #### Raises: None
         """
-        if self.config.mode == "train":
-            return (
-                spacy.blank(spacy_model)
-                if spacy_model == "en"
-                else spacy.load(spacy_model)
-            )
-        return spacy.load(self.config.best_model_location)
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self),
+            "max_size": self.max_size,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent asyncio requests into batches. A batch is flushed as soon
+    as it holds `max_batch_size` items, or `max_wait_ms` after its first item
+    arrived, and is passed to the batch function on a worker thread so the event
+    loop is not blocked.
 
-    def _make_spacy_docs(
+    #### Parameters:
+
+    batch_function: Callable[[list[Any]], list[Any]]
+        The function that processes a batch of items, returning one result per
+        item in the same order.
+
+    max_batch_size: int (default: 32)
+        The maximum number of items in a batch.
+
+    max_wait_ms: float (default: 5.0)
+        The maximum time in milliseconds to wait for a batch to fill up.
+
+    #### Methods:
+
+    submit(item: Any) -> Any
+        Add an item to the next batch and wait for its result.
+
+    stats() -> dict[str, Union[int, float]]
+        The number of batches and items that have been processed.
+    """
+
+    def __init__(
         self,
-        data: list[tuple[str, str]],
-        for_training: bool = True,
-    ) -> list:  # pragma: no cover
+        batch_function: Callable[[list[Any]], list[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.batch_function = batch_function
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.items = 0
+
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: Union[asyncio.TimerHandle, None] = None
+        # The event loop only keeps weak references to tasks, so keep the running
+        # batches here until they finish
+        self._tasks: set[asyncio.Task] = set()
+        # One worker, so batches are run one at a time on the model
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def submit(self, item: Any) -> Any:
         """
-        Helper function to create take a list of texts and labels and
-        create a list of spaCy docs.
+        Add an item to the next batch and wait for its result. Must be called from
+        a single event loop.
 
         #### Parameters:
 
-        data: list[tuple[str, str]]
-            A list of tuples containing the text and the label.
-
-        for_training: bool (default: True)
-            Whether the docs are being created for training or validation.
+        item: Any
+            The item to process.
 
-        #### Returns: list
-            A list of spaCy docs.
+        #### Returns: Any
+            The result of the batch function for the item.
 
-        #### Raises: None
+        #### Raises: Exception
+            Any exception raised by the batch function.
         """
-        docs = []
-        for doc, label in tqdm(
-            self.nlp.pipe(data, as_tuples=True),
-            total=len(data),
-            desc="Creating train docs" if for_training else "Creating valid docs",
-        ):
-            doc.cats[label] = 1
-            docs.append(doc)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
 
-        return docs
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
 
-    def _prepare_data(self) -> None:  # pragma: no cover
+        return await future
+
+    def stats(self) -> dict[str, Union[int, float]]:
         """
-        Helper function to prepare and save the data for training and validation.
+        The number of batches and items that have been processed.
 
         #### Parameters: None
 
-        #### Returns: None
+        #### Returns: dict[str, Union[int, float]]
+            The batch and item counters, along with the mean batch size.
 
         #### Raises: None
         """
-        dataset = data.IntentClassifierDataset(
-            Path(self.config.data_path), shuffle=True
-        )
-        train_data, test_data = dataset.split(self.config.train_percentage)
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def _flush(self) -> None:
+        """
+        Helper function to send the pending items to the batch function.
 
-        train_docs = self._make_spacy_docs(train_data.values.tolist())
-        test_docs = self._make_spacy_docs(test_data.values.tolist(), False)
+        #### Parameters: None
+
+        #### Returns: None
 
-        train_bin = DocBin(docs=train_docs)
-        test_bin = DocBin(docs=test_docs)
+        #### Raises: None
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
 
-        train_bin.to_disk(self.config.train_data_save_path)
-        test_bin.to_disk(self.config.valid_data_save_path)
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
 
-    def _confidence(self, predictions: dict) -> float:  # pragma: no cover
+    async def _run(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
         """
-        Helper function to calculate the confidence of the model's prediction.
-        This is done by getting the standard deviation of the prediction and
-        dividing it by the mean of the predictions.
+        Helper function to run the batch function on the worker thread and resolve
+        the future of each item with its result. Items the batch function returned
+        no result for are given a ValueError.
 
         #### Parameters:
 
-        predictions: dict
-            A dictionary containing the predictions of the model.
+        batch: list[tuple[Any, asyncio.Future]]
+            The items and their futures.
 
-        #### Returns: float
-            The confidence of the model's prediction.
+        #### Returns: None
 
         #### Raises: None
         """
-        sorted_predictions = sorted(
-            predictions.items(), key=lambda x: x[1], reverse=True
-        )
-        logger.log("debug", f"Predictions: {sorted_predictions}")
-        if all(x[1] == 0 for x in sorted_predictions):
-            return 0
-        return stdev([x[1] for x in sorted_predictions]) / mean(
-            [x[1] for x in sorted_predictions]
-        )
+        self.batches += 1
+        self.items += len(batch)
+        logger.log("debug", f"Running a micro-batch of {len(batch)} items")
 
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.batch_function, [item for item, _ in batch]
+            )
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index < len(results):
+                future.set_result(results[index])
+            else:
+                future.set_exception(
+                    ValueError(
+                        f"The batch function returned {len(results)} results "
+                        f"for {len(batch)} items"
+                    )
+                )
 
-class NERModel:
+
+class ModelHolder:
     """
-    Contains the logic for the named entity recognition model.
+    Holds a loaded model and swaps in a new one without restarting. The new model
+    is loaded on a background thread, either when asked to reload or when the
+    watched file changes, while predictions carry on with the current model. It is
+    only swapped in when `swap` is called, so callers can swap between turns and
+    never use two models for one turn. The previous model is kept for rollback.
 
     #### Parameters:
 
-    config: NERModelConfig (default: NERModelConfig())
-        The configuration for the model.
+    factory: Callable[[], Any]
+        The function that loads a new model.
+
+    watch_path: Union[str, Path, None] (default: None)
+        The file or directory to watch for changes, e.g. the directory of the saved
+        model. Every file in a directory is watched, and a change is only loaded
+        once it has not changed for two checks in a row, so a model that is still
+        being written is never loaded. Leave empty to only reload when asked.
+
+    poll_interval: float (default: 2.0)
+        The number of seconds between checks of the watched path. Set to 0 to only
+        reload when asked.
 
     #### Methods:
 
-    predict(text: str) -> list[tuple[str, str]]
-        Predict the named entities of the given text.
+    reload(wait: bool = False, queue: bool = False) -> bool
+        Start loading a new model on a background thread.
+
+    swap() -> bool
+        Make the newly loaded model the current model, if one is ready.
+
+    rollback() -> bool
+        Swap the current model with the previous model.
+
+    close() -> None
+        Stop watching for changes.
     """
 
-    def __init__(self, config: NERModelConfig = NERModelConfig()) -> None:
-        self.config = config
-        self.nlp = self._load_spacy_model(self.config.spacy_model)
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        watch_path: Union[str, Path, None] = None,
+        poll_interval: float = 2.0,
+    ) -> None:
+        self.factory = factory
+        self.watch_path = Path(watch_path) if watch_path else None
+        self.poll_interval = poll_interval
+
+        self._model = factory()
+        self._previous: Any = None
+        self._pending: Any = None
+        self._loader: Union[threading.Thread, None] = None
+        self._reload_queued = False
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._signature = self._watch_signature()
+
+        self._watcher: Union[threading.Thread, None] = None
+        if self.watch_path is not None and poll_interval > 0:
+            self._watcher = threading.Thread(
+                target=self._watch, name="model-watcher", daemon=True
+            )
+            self._watcher.start()
 
-    def predict(self, text: str) -> list[tuple[str, str]]:
+    @property
+    def model(self) -> Any:
         """
-        Predict the named entities of the given text.
+        The current model.
+        """
+        return self._model
+
+    @property
+    def previous(self) -> Any:
+        """
+        The model that was replaced by the last swap, or None.
+        """
+        return self._previous
+
+    @property
+    def loading(self) -> bool:
+        """
+        Whether or not a new model is being loaded.
+        """
+        return self._loader is not None and self._loader.is_alive()
+
+    def reload(self, wait: bool = False, queue: bool = False) -> bool:
+        """
+        Start loading a new model on a background thread. Call `swap` to use it once
+        it is loaded. If a model is already being loaded, no other load is started,
+        unless `queue` is set.
 
         #### Parameters:
 
-        text: str
-            The text to predict the named entities of.
+        wait: bool (default: False)
+            Whether or not to wait for the model to finish loading.
 
-        #### Returns: list[tuple[str, str]]
-            A list of tuples containing the named entity and its label.
+        queue: bool (default: False)
+            Whether or not to load the model again once the load that is already
+            running has finished, e.g. because the factory now builds a different
+            model.
+
+        #### Returns: bool
+            Whether or not a new load was started straight away.
 
         #### Raises: None
         """
-        doc = self.nlp(text.strip() if text else "")
-        return [(ent.text, ent.label_) for ent in doc.ents]
+        with self._lock:
+            started = not self.loading
+            if started:
+                self._loader = threading.Thread(
+                    target=self._load, name="model-loader", daemon=True
+                )
+                self._loader.start()
+            elif queue:
+                self._reload_queued = True
+            loader = self._loader
 
-    def _load_spacy_model(
-        self, spacy_model: str = "en"
-    ) -> spacy.language.Language:  # pragma: no cover
+        if wait and loader is not None:
+            loader.join()
+        return started
+
+    def swap(self) -> bool:
         """
-        Helper function to load the correct spaCy language model.
+        Make the newly loaded model the current model, if one is ready. The current
+        model is kept as the previous model.
 
-        #### Parameters:
+        #### Parameters: None
 
-        spacy_model: str (default: "en")
-            The name of the spaCy model to load.
+        #### Returns: bool
+            Whether or not the model was swapped.
 
-        #### Returns: spacy.language.Language
-            The spaCy language model.
+        #### Raises: None
+        """
+        with self._lock:
+            if self._pending is None:
+                return False
+            self._previous, self._model = self._model, self._pending
+            self._pending = None
+
+        logger.log("info", "Swapped in the newly loaded model")
+        return True
+
+    def rollback(self) -> bool:
+        """
+        Swap the current model with the previous model. Any newly loaded model that
+        has not been swapped in yet is discarded.
+
+        #### Parameters: None
+
+        #### Returns: bool
+            Whether or not there was a previous model to roll back to.
 
         #### Raises: None
         """
-        return (
-            spacy.blank(spacy_model) if spacy_model == "en" else spacy.load(spacy_model)
-        )
+        with self._lock:
+            if self._previous is None:
+                return False
+            self._previous, self._model = self._model, self._previous
+            self._pending = None
+
+        logger.log("info", "Rolled back to the previous model")
+        return True
+
+    def close(self) -> None:
+        """
+        Stop watching for changes.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def _load(self) -> None:
+        """
+        Helper function to load a new model on the loader thread. If it fails, the
+        current model is kept. If another load was queued meanwhile, the model is
+        loaded again.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        while True:
+            start = time.perf_counter()
+            try:
+                model = self.factory()
+            except Exception as error:
+                logger.log("error", f"Failed to load the new model: {error}")
+                model = None
+
+            with self._lock:
+                if model is not None:
+                    self._pending = model
+                queued, self._reload_queued = self._reload_queued, False
+                # Finish while holding the lock, so a queued reload is never missed
+                if not queued:
+                    self._loader = None
+
+            if model is not None:
+                logger.log(
+                    "info", f"Loaded a new model in {time.perf_counter() - start:.3f}s"
+                )
+            if not queued:
+                return
+
+    def _watch(self) -> None:
+        """
+        Helper function to reload the model whenever the watched path changes,
+        checking every `poll_interval` seconds on the watcher thread. A change is
+        only loaded once it is the same on two checks in a row, as spaCy writes the
+        files of a model one at a time (and `spacy train` rewrites it in place).
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        previous = self._signature
+        while not self._stopped.wait(self.poll_interval):
+            previous = self._poll(previous)
+
+    def _poll(
+        self, previous: Union[tuple[tuple[str, int, int, int], ...], None]
+    ) -> Union[tuple[tuple[str, int, int, int], ...], None]:
+        """
+        Helper function to check the watched path once, and reload the model if it
+        has changed and is the same as on the previous check.
+
+        #### Parameters:
+
+        previous: Union[tuple[tuple[str, int, int, int], ...], None]
+            The signature of the watched path on the previous check.
+
+        #### Returns: Union[tuple[tuple[str, int, int, int], ...], None]
+            The signature of the watched path on this check.
+
+        #### Raises: None
+        """
+        signature = self._watch_signature()
+
+        # Keep the old signature while a load is running, so the change is picked
+        # up again once it has finished
+        if (
+            signature is not None
+            and signature == previous
+            and signature != self._signature
+        ):
+            if self.reload():
+                logger.log("info", f"Detected a new model at: {self.watch_path}")
+                self._signature = signature
+        return signature
+
+    def _watch_signature(self) -> Union[tuple[tuple[str, int, int, int], ...], None]:
+        """
+        Helper function to identify the current version of the watched file, or of
+        every file in the watched directory. The inode is included, so a file that
+        was replaced by renaming is detected even if its modification time was
+        kept.
+
+        #### Parameters: None
+
+        #### Returns: Union[tuple[tuple[str, int, int, int], ...], None]
+            The path, inode, modification time and size of each file, or None if
+            there are none (e.g. while the model is being replaced).
+
+        #### Raises: None
+        """
+        if self.watch_path is None:
+            return None
+        try:
+            paths = (
+                sorted(path for path in self.watch_path.rglob("*") if path.is_file())
+                if self.watch_path.is_dir()
+                else [self.watch_path]
+            )
+            stats = [(str(path), path.stat()) for path in paths]
+        except OSError:
+            return None
+        return (
+            tuple(
+                (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                for path, stat in stats
+            )
+            or None
+        )
+
+
+class LazyModel:
+    """
+    Loads a model the first time it is used, so processes that never need it never
+    pay to load it. It can also be preloaded on a background thread, so it is
+    usually ready by the time it is needed without delaying startup. The model is
+    only ever loaded once, even if it is asked for while it is being preloaded.
+
+    #### Parameters:
+
+    factory: Callable[[], Any]
+        The function that loads the model.
+
+    name: str (default: "model")
+        The name of the model, used in the logs.
+
+    #### Methods:
+
+    preload(wait: bool = False) -> bool
+        Start loading the model on a background thread.
+
+    on_load(callback: Callable[[Any], None]) -> None
+        Call a function with the model once it has loaded.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str = "model") -> None:
+        self.factory = factory
+        self.name = name
+
+        self._model: Any = None
+        self._callbacks: list[Callable[[Any], None]] = []
+        self._load_seconds: Union[float, None] = None
+        self._loader: Union[threading.Thread, None] = None
+        self._lock = threading.Lock()
+        self._loader_lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        """
+        The model, which is loaded first if it has not been loaded yet. If it is
+        being preloaded, this waits for it to finish.
+        """
+        if self._model is None:
+            self._load()
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        """
+        Whether or not the model has been loaded.
+        """
+        return self._model is not None
+
+    @property
+    def load_seconds(self) -> Union[float, None]:
+        """
+        The number of seconds it took to load the model, or None if it has not
+        been loaded yet.
+        """
+        return self._load_seconds
+
+    def preload(self, wait: bool = False) -> bool:
+        """
+        Start loading the model on a background thread, if it has not been loaded
+        or started loading yet. If it fails to load, it is loaded again the next
+        time it is used.
+
+        #### Parameters:
+
+        wait: bool (default: False)
+            Whether or not to wait for the model to finish loading.
+
+        #### Returns: bool
+            Whether or not a new load was started.
+
+        #### Raises: None
+        """
+        with self._loader_lock:
+            started = self._model is None and self._loader is None
+            if started:
+                self._loader = threading.Thread(
+                    target=self._preload, name=f"{self.name}-loader", daemon=True
+                )
+                self._loader.start()
+            loader = self._loader
+
+        if wait and loader is not None:
+            loader.join()
+        return started
+
+    def on_load(self, callback: Callable[[Any], None]) -> None:
+        """
+        Call a function with the model once it has loaded, on the thread that
+        loaded it. If the model has already loaded, it is called straight away.
+
+        #### Parameters:
+
+        callback: Callable[[Any], None]
+            The function to call with the model.
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        with self._lock:
+            if self._model is None:
+                self._callbacks.append(callback)
+                return
+
+        callback(self._model)
+
+    def _load(self) -> None:
+        """
+        Helper function to load the model, unless another thread already has, then
+        call the `on_load` callbacks.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: Exception
+            Any error raised by the factory while loading the model.
+        """
+        with self._lock:
+            if self._model is not None:
+                return
+
+            start = time.perf_counter()
+            model = self.factory()
+            self._load_seconds = time.perf_counter() - start
+            self._model = model
+            callbacks, self._callbacks = self._callbacks, []
+
+        logger.log("info", f"Loaded the {self.name} in {self._load_seconds:.3f}s")
+        for callback in callbacks:
+            try:
+                callback(model)
+            except Exception as error:
+                logger.log("error", f"Callback for the {self.name} failed: {error}")
+
+    def _preload(self) -> None:
+        """
+        Helper function to load the model on the loader thread.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        try:
+            self._load()
+        except Exception as error:
+            logger.log("error", f"Failed to preload the {self.name}: {error}")
+            with self._loader_lock:
+                self._loader = None
+
+
+class IntentClassifierModel:
+    """
+    Contains the logic for training and predicting the intent of a given text.
+
+    #### Parameters:
+
+    config: IntentClassifierModelConfig (default: IntentClassifierModelConfig())
+        The configuration object for the intent classifier model.
+
+    vocab: Union[Vocab, None] (default: None)
+        The vocab to load the spaCy model into, such as the vocab of the named
+        entity recognition model, so the strings are only stored once. Its vectors
+        and lookup tables are kept. Leave empty to use the model's own vocab.
+
+    #### Methods:
+
+    predict(text: str) -> str
+        Predict the intent of the given text.
+
+    predict_doc(doc: Doc) -> str
+        Predict the intent of a doc that has already been tokenised.
+
+    apredict(text: str) -> str
+        Predict the intent of the given text, batching it with concurrent calls.
+
+    predict_batch(texts: Iterable[str], batch_size: int = 128, n_process: int = 1) -> list[tuple[str, dict[str, float]]]
+        Predict the intents of many texts in a single pass through the spaCy pipeline.
+
+    predict_scores(text: str) -> list[tuple[str, float]]
+        Predict the score of every intent for the given text, ranked from highest to lowest.
+
+    top_k(text: str, k: int = 3) -> list[tuple[str, float]]
+        Predict the k highest scoring intents for the given text.
+
+    cache_stats() -> dict[str, Union[int, float]]
+        The hit, miss and eviction counters for the prediction cache.
+
+    train(callback: Union[Callable[[TrainingStep], None], None] = None) -> TrainingSummary
+        Prepares the data and trains the model in this process using the given configuration.
+
+    export_lite(path: Union[str, None] = None) -> Path
+        Export the trained TextCatBOW weights for the NumPy only runtime.
+
+    compact(path: Union[str, None] = None, prune_threshold: float = 0.01, quantise: bool = True) -> dict[str, Union[int, float]]
+        Export pruned and int8 quantised TextCatBOW weights for the NumPy only runtime.
+
+    evaluate(path: Union[str, None] = None, batch_size: int = 128, output: Union[str, None] = None) -> dict[str, Any]
+        Measure the accuracy and throughput of the model on a labelled dataset.
+
+    distil(teacher_config: str = "config/intents/teacher_config.cfg", num_examples: int = 500, epochs: int = 20, batch_size: int = 16, retrain_teacher: bool = False, callback: Union[Callable[[TrainingStep], None], None] = None) -> dict[str, Any]
+        Train the TextCatBOW model to copy a slower but more accurate teacher model.
+
+    update(examples: Iterable[tuple[str, str]], steps: int = 10, rehearsal: int = 64, learn_rate: float = 0.01, drop: float = 0.2) -> Path
+        Fold corrected examples into the loaded model and save it as a new version.
+    """
+
+    runtimes = ("spacy", "lite")
+
+    def __init__(
+        self,
+        config: IntentClassifierModelConfig = IntentClassifierModelConfig(),
+        vocab: Union[Vocab, None] = None,
+    ) -> None:
+        if config.runtime.lower() not in self.runtimes:
+            raise KeyError(
+                f"Invalid runtime: '{config.runtime}'. Valid runtimes are: {', '.join(self.runtimes)}"
+            )
+
+        self.config = config
+        self.vocab = vocab
+        self.lite = (
+            lite.LiteIntentClassifierModel(
+                self.config.lite_model_location, self.config.threshold
+            )
+            if self.config.mode != "train" and self.config.runtime.lower() == "lite"
+            else None
+        )
+        self.nlp = (
+            self._load_spacy_model(self.config.spacy_model)
+            if self.lite is None
+            else spacy.blank("en")
+        )
+        self.labels = self._load_labels()
+        self.cache = (
+            PredictionCache(self.config.cache_size, self.config.cache_eviction)
+            if self.config.cache_size > 0
+            else None
+        )
+        self.batcher = MicroBatcher(
+            self._predict_intents, self.config.max_batch_size, self.config.max_wait_ms
+        )
+
+    def predict(self, text: str) -> str:
+        """
+        Predict the intent of the given text.
+
+        #### Parameters:
+
+        text: str
+            The text to predict the intent of.
+
+        #### Returns: str
+            The predicted intent.
+
+        #### Raises: None
+        """
+        return self._predict([text])[0][0]
+
+    def predict_doc(self, doc: Doc) -> str:
+        """
+        Predict the intent of a doc that has already been tokenised, such as by
+        `NERModel.analyse`, without tokenising the text again. The model was trained
+        on lowercase text, so a lowercase copy of the tokens is classified. The
+        scores of each intent are also set on `doc.cats`, so the doc carries both
+        the intent scores and any entities.
+
+        #### Parameters:
+
+        doc: Doc
+            The tokenised doc to predict the intent of.
+
+        #### Returns: str
+            The predicted intent.
+
+        #### Raises: None
+        """
+        text = self._normalise(doc.text)
+
+        # The lite runtime has its own tokeniser, and empty docs have no scores
+        if self.lite is not None or not text:
+            intent, scores = self._predict([text])[0]
+        elif (prediction := self._from_cache(text)) is not None:
+            intent, scores = prediction
+        else:
+            lowercase = self.nlp(
+                Doc(
+                    doc.vocab,
+                    words=[token.lower_ for token in doc],
+                    spaces=[bool(token.whitespace_) for token in doc],
+                )
+            )
+            scores = self._score_matrix([lowercase])
+            intent, scores = self._store(text, (self._intents(scores)[0], scores[0]))
+
+        doc.cats = dict(zip(self.labels, scores.tolist()))
+        return intent
+
+    async def apredict(self, text: str) -> str:
+        """
+        Predict the intent of the given text. Concurrent calls are collected and
+        classified together in one batch once `max_batch_size` calls are waiting or
+        `max_wait_ms` has passed, without blocking the event loop.
+
+        #### Parameters:
+
+        text: str
+            The text to predict the intent of.
+
+        #### Returns: str
+            The predicted intent.
+
+        #### Raises: None
+        """
+        return await self.batcher.submit(text)
+
+    def predict_batch(
+        self, texts: Iterable[str], batch_size: int = 128, n_process: int = 1
+    ) -> list[tuple[str, dict[str, float]]]:
+        """
+        Predict the intents of many texts in a single pass through the spaCy pipeline,
+        applying the same threshold and confidence logic as `predict`.
+
+        #### Parameters:
+
+        texts: Iterable[str]
+            The texts to predict the intents of.
+
+        batch_size: int (default: 128)
+            The number of texts to buffer and process together.
+
+        n_process: int (default: 1)
+            The number of worker processes to use when running the pipeline. The
+            workers are forked, so they share the loaded model with this process.
+
+        #### Returns: list[tuple[str, dict[str, float]]]
+            A list of tuples containing the predicted intent and the scores for
+            each intent, in the same order as the given texts.
+
+        #### Raises: None
+        """
+        return [
+            (intent, dict(zip(self.labels, scores.tolist())))
+            for intent, scores in self._predict(texts, batch_size, n_process)
+        ]
+
+    def predict_scores(self, text: str) -> list[tuple[str, float]]:
+        """
+        Predict the score of every intent for the given text.
+
+        #### Parameters:
+
+        text: str
+            The text to score.
+
+        #### Returns: list[tuple[str, float]]
+            The intents and their scores, ranked from the highest to the lowest score.
+
+        #### Raises: None
+        """
+        return self._rank(self._predict([text])[0][1])
+
+    def top_k(self, text: str, k: int = 3) -> list[tuple[str, float]]:
+        """
+        Predict the k highest scoring intents for the given text.
+
+        #### Parameters:
+
+        text: str
+            The text to score.
+
+        k: int (default: 3)
+            The number of intents to return.
+
+        #### Returns: list[tuple[str, float]]
+            The k highest scoring intents and their scores, ranked from the highest
+            to the lowest score.
+
+        #### Raises: None
+        """
+        return self._rank(self._predict([text])[0][1], k)
+
+    def cache_stats(self) -> dict[str, Union[int, float]]:
+        """
+        The hit, miss and eviction counters for the prediction cache.
+
+        #### Parameters: None
+
+        #### Returns: dict[str, Union[int, float]]
+            The cache counters, or an empty dictionary if the cache is disabled.
+
+        #### Raises: None
+        """
+        return self.cache.stats() if self.cache is not None else {}
+
+    def train(
+        self, callback: Union[Callable[[TrainingStep], None], None] = None
+    ) -> TrainingSummary:  # pragma: no cover
+        """
+        Prepares the data and trains the model using the given configuration. spaCy
+        is run in this process, and the metrics of each evaluation step are passed
+        to the callback as they arrive.
+
+        #### Parameters:
+
+        callback: Union[Callable[[TrainingStep], None], None] (default: None)
+            A function called with the metrics of each evaluation step.
+
+        #### Returns: TrainingSummary
+            The scores and location of the best model, along with the metrics from
+            every evaluation step.
+
+        #### Raises: None
+        """
+        self._build_data()
+
+        base_config = Path(self.config.base_config)
+        full_config = base_config.with_name("config.cfg")
+        if self.config.rebuild_config:
+            self._build_config(base_config, full_config)
+
+        return self._train_pipeline(full_config, Path(self.config.output_dir), callback)
+
+    def distil(
+        self,
+        teacher_config: str = "config/intents/teacher_config.cfg",
+        num_examples: int = 500,
+        epochs: int = 20,
+        batch_size: int = 16,
+        retrain_teacher: bool = False,
+        callback: Union[Callable[[TrainingStep], None], None] = None,
+    ) -> dict[str, Any]:
+        """
+        Train the TextCatBOW model to copy a slower but more accurate teacher model,
+        so it gains accuracy without costing any more at runtime. The teacher is
+        trained (or loaded, if it was trained before) in `teacher` in the output
+        directory. It then scores examples generated from the intent and entity
+        rules, and the student is trained on those scores along with the training
+        data, keeping the epoch that is most accurate on the validation data. The
+        validation examples are never used for training.
+
+        The student is saved to `student/model-best` in the output directory. Set
+        `best_model_location` to it to use it.
+
+        #### Parameters:
+
+        teacher_config: str (default: "config/intents/teacher_config.cfg")
+            The spaCy base config of the teacher.
+
+        num_examples: int (default: 500)
+            The number of examples to generate from the rules for each intent.
+
+        epochs: int (default: 20)
+            The number of times to train the student on every example.
+
+        batch_size: int (default: 16)
+            The number of examples in each update of the student.
+
+        retrain_teacher: bool (default: False)
+            Whether or not to train the teacher even if it was trained before.
+
+        callback: Union[Callable[[TrainingStep], None], None] (default: None)
+            A function called with the metrics of each evaluation step, for the
+            teacher and then the student.
+
+        #### Returns: dict[str, Any]
+            The accuracy, p50/p95/p99 latency of a single prediction and size of the
+            teacher, the current model and the student, along with the number of
+            generated examples and the accuracy gained over the current model.
+
+        #### Raises: None
+        """
+        self._build_data()
+
+        output_dir = Path(self.config.output_dir)
+        teacher_dir = output_dir / "teacher"
+        student_dir = output_dir / "student"
+
+        if retrain_teacher or not (teacher_dir / "model-best").exists():
+            full_config = teacher_dir / "config.cfg"
+            self._build_config(Path(teacher_config), full_config)
+            self._train_pipeline(full_config, teacher_dir, callback)
+
+        texts = self._transfer_texts(num_examples)
+        with logger.log_context(
+            "info",
+            f"Labelling {len(texts)} examples with the teacher",
+            "Finished labelling examples with the teacher",
+        ):
+            teacher = spacy.load(teacher_dir / "model-best")
+            soft_labels = [doc.cats for doc in teacher.pipe(texts, batch_size=256)]
+            del teacher
+
+        base_config = Path(self.config.base_config)
+        full_config = base_config.with_name("config.cfg")
+        if self.config.rebuild_config:
+            self._build_config(base_config, full_config)
+
+        self._train_student(
+            full_config,
+            student_dir,
+            list(zip(texts, soft_labels)),
+            epochs,
+            batch_size,
+            callback,
+        )
+
+        report: dict[str, Any] = {
+            "examples": len(texts),
+            "teacher": self._measure(teacher_dir / "model-best", components=[]),
+            "baseline": (
+                self._measure(Path(self.config.best_model_location))
+                if Path(self.config.best_model_location).exists()
+                else None
+            ),
+            "student": self._measure(student_dir / "model-best"),
+        }
+        report["accuracy_gain"] = (
+            report["student"]["accuracy"] - report["baseline"]["accuracy"]
+            if report["baseline"]
+            else None
+        )
+
+        (student_dir / "distil.json").write_text(
+            json.dumps(report, indent=4), encoding="utf-8"
+        )
+        logger.log("info", f"Distilled intent classifier: {report}")
+
+        return report
+
+    def _build_data(self) -> None:  # pragma: no cover
+        """
+        Helper function to prepare the training and validation data, if
+        `rebuild_data` is set and its inputs have changed since it was last built.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        if not self.config.rebuild_data:
+            return
+
+        data_paths = (
+            self.config.train_data_save_path,
+            self.config.valid_data_save_path,
+        )
+        fingerprint = self._data_fingerprint()
+        if self._is_up_to_date(fingerprint, *data_paths):
+            logger.log("info", "Data is unchanged, skipping data preparation")
+            return
+
+        logger.log("debug", f"Preparing data using: {self.config}")
+        self._prepare_data()
+        self._save_fingerprint(fingerprint, *data_paths)
+
+    def _build_config(
+        self, base_config: Path, full_config: Path
+    ) -> None:  # pragma: no cover
+        """
+        Helper function to fill in the defaults of a spaCy base config, if the base
+        config has changed since it was last filled.
+
+        #### Parameters:
+
+        base_config: Path
+            The path to the base config.
+
+        full_config: Path
+            The path to save the filled config to.
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        fingerprint = self._config_fingerprint(base_config)
+        if self._is_up_to_date(fingerprint, full_config):
+            logger.log("info", f"{base_config} is unchanged, skipping config build")
+            return
+
+        with logger.log_context(
+            "debug", f"Building spaCy config from: {base_config}", "spaCy config built"
+        ):
+            full_config.parent.mkdir(parents=True, exist_ok=True)
+            fill_config(full_config, base_config, silent=True)
+        self._save_fingerprint(fingerprint, full_config)
+
+    def _load_training_config(self, full_config: Path) -> spacy.util.Config:
+        """
+        Helper function to load a filled spaCy config, using the training and
+        validation data in the configuration.
+
+        #### Parameters:
+
+        full_config: Path
+            The path to the filled config.
+
+        #### Returns: spacy.util.Config
+            The spaCy config.
+
+        #### Raises: None
+        """
+        return spacy.util.load_config(
+            full_config,
+            overrides={
+                "paths.train": self.config.train_data_save_path,
+                "paths.dev": self.config.valid_data_save_path,
+            },
+            interpolate=False,
+        )
+
+    def _train_pipeline(
+        self,
+        full_config: Path,
+        output_dir: Path,
+        callback: Union[Callable[[TrainingStep], None], None] = None,
+    ) -> TrainingSummary:  # pragma: no cover
+        """
+        Helper function to train a spaCy pipeline in this process.
+
+        #### Parameters:
+
+        full_config: Path
+            The path to the filled spaCy config.
+
+        output_dir: Path
+            The directory to save the trained pipeline to.
+
+        callback: Union[Callable[[TrainingStep], None], None] (default: None)
+            A function called with the metrics of each evaluation step.
+
+        #### Returns: TrainingSummary
+            The scores and location of the best model, along with the metrics from
+            every evaluation step.
+
+        #### Raises: None
+        """
+        global _training_callback
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        spacy_config = self._load_training_config(full_config)
+        spacy_config["training"]["logger"] = {
+            "@loggers": "ace.TrainingLogger.v1",
+            "wrapped": spacy_config["training"]["logger"],
+        }
+
+        history: list[TrainingStep] = []
+
+        def record(step: TrainingStep) -> None:
+            history.append(step)
+            logger.log(
+                "debug",
+                f"Epoch {step.epoch} :: Step {step.step} :: Score {step.score:.4f}",
+            )
+            if callback is not None:
+                callback(step)
+
+        with logger.log_context(
+            "debug",
+            f"Training {type(self).__name__} using spaCy",
+            f"{type(self).__name__} trained using spaCy",
+        ):
+            _training_callback = record
+            try:
+                nlp = init_nlp(spacy_config)
+                train_nlp(nlp, output_dir)
+            finally:
+                _training_callback = None
+
+        best = max(history, key=lambda step: step.score, default=None)
+        summary = TrainingSummary(
+            output_dir=str(output_dir),
+            best_model_location=str(output_dir / "model-best"),
+            best_score=best.score if best else 0.0,
+            best_step=best.step if best else 0,
+            epochs=history[-1].epoch if history else 0,
+            steps=history[-1].step if history else 0,
+            seconds=history[-1].seconds if history else 0.0,
+            history=history,
+        )
+        logger.log(
+            "info",
+            f"Best score {summary.best_score:.4f} at step {summary.best_step}, "
+            f"saved to: {summary.best_model_location}",
+        )
+
+        return summary
+
+    def export_lite(self, path: Union[str, None] = None) -> Path:
+        """
+        Export the trained TextCatBOW weights for the NumPy only runtime in
+        `ace.ai.lite`. The weights of every n-gram in the training data are
+        resolved through the model's hashing, so the runtime can look the
+        n-grams up by their text.
+
+        #### Parameters:
+
+        path: Union[str, None] (default: None)
+            The path to export the model to. Leave empty to use the
+            `lite_model_location` from the configuration.
+
+        #### Returns: Path
+            The path the model was exported to.
+
+        #### Raises: ValueError
+            If the model does not have a TextCatBOW textcat component.
+        """
+        export_path = Path(path or self.config.lite_model_location)
+
+        with logger.log_context(
+            "info",
+            f"Exporting lite intent classifier to: {export_path}",
+            "Finished exporting lite intent classifier",
+        ):
+            arrays = self._lite_arrays()
+            self._save_lite(export_path, arrays)
+            logger.log("info", f"Exported {len(arrays['features'])} n-grams")
+
+        return export_path
+
+    def compact(
+        self,
+        path: Union[str, None] = None,
+        prune_threshold: float = 0.01,
+        quantise: bool = True,
+    ) -> dict[str, Union[int, float]]:
+        """
+        Export a compacted copy of the trained TextCatBOW weights for the NumPy only
+        runtime, and report the size and accuracy trade-off against the validation
+        data. N-grams whose weights are all near zero are pruned, and the remaining
+        weights can be stored as int8 with a scale for each n-gram. Set `runtime` to
+        "lite" to make predictions with the compacted model.
+
+        #### Parameters:
+
+        path: Union[str, None] (default: None)
+            The path to export the model to. Leave empty to use the
+            `lite_model_location` from the configuration.
+
+        prune_threshold: float (default: 0.01)
+            N-grams are pruned if none of their weights are larger than this.
+
+        quantise: bool (default: True)
+            Whether or not to store the weights as int8.
+
+        #### Returns: dict[str, Union[int, float]]
+            The number of n-grams before and after pruning, the size of the weights
+            and exported file in bytes, and the accuracy of the spaCy and compacted
+            models on the validation data.
+
+        #### Raises: ValueError
+            If the model does not have a TextCatBOW textcat component.
+        """
+        export_path = Path(path or self.config.lite_model_location)
+
+        with logger.log_context(
+            "info",
+            f"Exporting compacted intent classifier to: {export_path}",
+            "Finished exporting compacted intent classifier",
+        ):
+            arrays = self._lite_arrays()
+            weights = arrays["weights"]
+            original_bytes = weights.nbytes
+
+            keep = np.abs(weights).max(axis=1, initial=0) > prune_threshold
+            arrays["features"] = arrays["features"][keep]
+            weights = weights[keep]
+
+            if quantise:
+                # Scale each n-gram's weights so its largest weight maps to 127
+                scales = np.abs(weights).max(axis=1, initial=0) / 127
+                scales[scales == 0] = 1
+                arrays["weights"] = np.round(weights / scales[:, None]).astype(np.int8)
+                arrays["scales"] = scales.astype(np.float32)
+            else:
+                arrays["weights"] = weights
+
+            self._save_lite(export_path, arrays)
+
+        examples = list(self._labelled_examples())
+        texts = [text for text, _ in examples]
+        intents = [intent for _, intent in examples]
+        compacted = lite.LiteIntentClassifierModel(export_path, self.config.threshold)
+
+        report = {
+            "features": len(keep),
+            "kept_features": int(keep.sum()),
+            "spacy_weights_bytes": self._textcat_weights_bytes(),
+            "original_weights_bytes": original_bytes,
+            "compact_weights_bytes": sum(
+                arrays[name].nbytes for name in ("weights", "scales") if name in arrays
+            ),
+            "file_bytes": export_path.stat().st_size,
+            "examples": len(texts),
+            "spacy_accuracy": self._accuracy(self.predict_batch(texts), intents),
+            "compact_accuracy": self._accuracy(compacted.predict_batch(texts), intents),
+        }
+        logger.log("info", f"Compacted intent classifier: {report}")
+
+        return report
+
+    def evaluate(
+        self,
+        path: Union[str, None] = None,
+        batch_size: int = 128,
+        output: Union[str, None] = None,
+    ) -> dict[str, Any]:
+        """
+        Measure the accuracy and throughput of the model on a labelled dataset. The
+        examples are streamed through the model in batches, without the prediction
+        cache, timing each batch.
+
+        #### Parameters:
+
+        path: Union[str, None] (default: None)
+            The path to a `.spacy` file of docs, or a CSV file readable by
+            `IntentClassifierDataset`. Leave empty to use the validation data.
+
+        batch_size: int (default: 128)
+            The number of examples to predict at a time. Use 1 to measure the
+            latency of single predictions.
+
+        output: Union[str, None] (default: None)
+            The path to write the results to as JSON. Leave empty to not write them.
+
+        #### Returns: dict[str, Any]
+            The accuracy, the precision, recall and F1 score of each intent, the
+            docs per second, and the p50/p95/p99 latency of a batch in milliseconds.
+
+        #### Raises: None
+        """
+        path = path or self.config.valid_data_save_path
+        examples = iter(self._labelled_examples(path))
+        intents: list[str] = []
+        predictions: list[str] = []
+        latencies: list[float] = []
+
+        with logger.log_context(
+            "info", f"Evaluating intent classifier on: {path}", "Finished evaluating"
+        ):
+            while batch := list(itertools.islice(examples, max(batch_size, 1))):
+                texts = [self._normalise(text) for text, _ in batch]
+
+                start = time.perf_counter()
+                to_run = [index for index, text in enumerate(texts) if text]
+                scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+                if to_run:
+                    scores[to_run] = self._score_texts(
+                        [texts[index] for index in to_run], len(to_run)
+                    )
+                predictions.extend(self._intents(scores))
+                latencies.append(time.perf_counter() - start)
+
+                intents.extend(intent for _, intent in batch)
+
+        total_time = sum(latencies)
+        percentiles = (
+            np.percentile(np.array(latencies) * 1000, [50, 95, 99]).tolist()
+            if latencies
+            else [0.0, 0.0, 0.0]
+        )
+        results = {
+            "model": (
+                str(self.lite.path)
+                if self.lite is not None
+                else self.config.best_model_location
+            ),
+            "runtime": self.config.runtime,
+            "data": str(path),
+            "examples": len(intents),
+            "batch_size": batch_size,
+            "accuracy": (
+                sum(
+                    expected == predicted
+                    for expected, predicted in zip(intents, predictions)
+                )
+                / len(intents)
+                if intents
+                else 0.0
+            ),
+            "intents": self._classification_report(intents, predictions),
+            "docs_per_second": len(intents) / total_time if total_time else 0.0,
+            "latency_ms": dict(zip(("p50", "p95", "p99"), percentiles)),
+        }
+        logger.log(
+            "info",
+            f"Accuracy: {results['accuracy']:.4f} :: Docs/sec: {results['docs_per_second']:.1f}",
+        )
+
+        if output:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            Path(output).write_text(json.dumps(results, indent=4), encoding="utf-8")
+            logger.log("info", f"Saved evaluation results to: {output}")
+
+        return results
+
+    def update(
+        self,
+        examples: Iterable[tuple[str, str]],
+        steps: int = 10,
+        rehearsal: int = 64,
+        learn_rate: float = 0.01,
+        drop: float = 0.2,
+    ) -> Path:
+        """
+        Fold corrected examples into the loaded model with a few optimizer steps, then
+        save it as a new version. Every step also trains on a sample of the training
+        data, so the model does not forget the intents that were not corrected.
+
+        The new version is saved to `versions` in the output directory under a
+        temporary name, and renamed once it is complete. It then replaces the model
+        at `best_model_location`, and the previous model is kept next to it with a
+        `.previous` suffix.
+
+        #### Parameters:
+
+        examples: Iterable[tuple[str, str]]
+            The texts and their correct intents.
+
+        steps: int (default: 10)
+            The number of optimizer steps to take.
+
+        rehearsal: int (default: 64)
+            The number of examples from the training data to train on with the
+            corrections at each step.
+
+        learn_rate: float (default: 0.01)
+            The learning rate of the optimizer. This is higher than when training,
+            so the corrections are learnt in a few steps.
+
+        drop: float (default: 0.2)
+            The dropout rate.
+
+        #### Returns: Path
+            The path the new version was saved to.
+
+        #### Raises: ValueError
+            If the model is not a spaCy textcat model, or an intent is not one of
+            its labels.
+        """
+        if self.lite is not None or "textcat" not in self.nlp.pipe_names:
+            raise ValueError("Only the spaCy textcat model can be updated.")
+
+        corrections = [(self._normalise(text), intent) for text, intent in examples]
+        if unknown := {intent for _, intent in corrections} - set(self.labels):
+            raise ValueError(f"Unknown intents: {sorted(unknown)}")
+
+        rng = random.Random(SEED)
+        rehearsed = self._rehearsal_examples(rehearsal, rng)
+
+        with logger.log_context(
+            "info",
+            f"Updating intent classifier with {len(corrections)} examples",
+            "Finished updating intent classifier",
+        ):
+            optimizer = self.nlp.resume_training()
+            optimizer.learn_rate = learn_rate
+            losses: dict[str, float] = {}
+            with self.nlp.select_pipes(enable="textcat"):
+                for _ in range(steps):
+                    batch = [
+                        self._example(text, intent)
+                        for text, intent in corrections + rehearsed
+                    ]
+                    rng.shuffle(batch)
+                    self.nlp.update(batch, sgd=optimizer, drop=drop, losses=losses)
+            logger.log("info", f"Losses after {steps} steps: {losses}")
+
+            version = self._save_version()
+
+        # The cached predictions were made with the old weights
+        if self.cache is not None:
+            self.cache.clear()
+
+        return version
+
+    def _lite_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Helper function to resolve the weights of every n-gram in the training data
+        through the TextCatBOW model's hashing.
+
+        #### Parameters: None
+
+        #### Returns: dict[str, np.ndarray]
+            The arrays to save for the NumPy only runtime.
+
+        #### Raises: ValueError
+            If the model does not have a TextCatBOW textcat component.
+        """
+        if "textcat" not in self.nlp.pipe_names:
+            raise ValueError("The model has no textcat component to export.")
+
+        model = self.nlp.get_pipe("textcat").model
+        layers = {layer.name: layer for layer in model.walk()}
+        if "extract_ngrams" not in layers or not model.has_ref("output_layer"):
+            raise ValueError("Only TextCatBOW models can be exported.")
+
+        extractor = layers["extract_ngrams"]
+        linear = model.get_ref("output_layer")
+
+        features = self._training_ngrams(
+            extractor.attrs["ngram_size"], extractor.attrs["attr"]
+        )
+        keys = np.array(list(features.values()), dtype=np.uint64)
+
+        # Pass each n-gram through the layer on its own to get its weights
+        bias = linear.get_param("b")
+        weights = (
+            linear.predict(
+                (
+                    keys,
+                    np.ones(len(keys), dtype=np.float32),
+                    np.ones(len(keys), dtype=np.int32),
+                )
+            )
+            - bias
+        )
+
+        activation = (
+            "softmax"
+            if "softmax_activation" in layers
+            else "logistic" if "logistic" in layers else "none"
+        )
+
+        return {
+            "labels": np.array(self.labels),
+            "features": np.array(list(features)),
+            "weights": np.asarray(weights, dtype=np.float32).reshape(
+                len(keys), len(self.labels)
+            ),
+            "bias": np.asarray(bias, dtype=np.float32),
+            "ngram_size": np.array(extractor.attrs["ngram_size"]),
+            "activation": np.array(activation),
+        }
+
+    def _save_lite(self, path: Path, arrays: dict[str, np.ndarray]) -> None:
+        """
+        Helper function to save the arrays for the NumPy only runtime.
+
+        #### Parameters:
+
+        path: Path
+            The path to save the arrays to.
+
+        arrays: dict[str, np.ndarray]
+            The arrays to save.
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **arrays)
+
+    def _textcat_weights_bytes(self) -> int:
+        """
+        Helper function to get the size of the hashed weight table of the textcat
+        component in the spaCy pipeline.
+
+        #### Parameters: None
+
+        #### Returns: int
+            The size of the weights in bytes.
+
+        #### Raises: None
+        """
+        linear = self.nlp.get_pipe("textcat").model.get_ref("output_layer")
+        return int(linear.get_param("W").nbytes)
+
+    def _labelled_examples(
+        self, path: Union[str, Path, None] = None
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Helper function to stream the texts and intents of a labelled dataset, from
+        either a `.spacy` file of docs or a CSV file readable by
+        `IntentClassifierDataset`.
+
+        #### Parameters:
+
+        path: Union[str, Path, None] (default: None)
+            The path to the dataset. Leave empty to use the validation data.
+
+        #### Returns: Iterator[tuple[str, str]]
+            The text and intent of each example.
+
+        #### Raises: None
+        """
+        path = Path(path or self.config.valid_data_save_path)
+
+        if path.suffix == ".csv":
+            dataset = data.IntentClassifierDataset(path)
+            for index in range(len(dataset)):
+                yield dataset[index]
+            return
+
+        for doc in _read_docs(path, self.nlp.vocab):
+            yield doc.text, max(doc.cats, key=doc.cats.get) if doc.cats else "unknown"
+
+    def _classification_report(
+        self, intents: list[str], predictions: list[str]
+    ) -> dict[str, dict[str, float]]:
+        """
+        Helper function to calculate the precision, recall and F1 score of each intent.
+
+        #### Parameters:
+
+        intents: list[str]
+            The expected intents.
+
+        predictions: list[str]
+            The predicted intents.
+
+        #### Returns: dict[str, dict[str, float]]
+            The precision, recall, F1 score and number of examples of each intent.
+
+        #### Raises: None
+        """
+        report = {}
+        for intent in sorted(set(intents) | set(predictions)):
+            true_positives = sum(
+                expected == predicted == intent
+                for expected, predicted in zip(intents, predictions)
+            )
+            predicted_count = predictions.count(intent)
+            support = intents.count(intent)
+
+            precision = true_positives / predicted_count if predicted_count else 0.0
+            recall = true_positives / support if support else 0.0
+            report[intent] = {
+                "precision": precision,
+                "recall": recall,
+                "f1": (
+                    2 * precision * recall / (precision + recall)
+                    if precision + recall
+                    else 0.0
+                ),
+                "support": support,
+            }
+        return report
+
+    def _accuracy(
+        self, predictions: list[tuple[str, dict[str, float]]], intents: list[str]
+    ) -> float:
+        """
+        Helper function to calculate the fraction of predictions with the right intent.
+
+        #### Parameters:
+
+        predictions: list[tuple[str, dict[str, float]]]
+            The predicted intents and scores.
+
+        intents: list[str]
+            The expected intents.
+
+        #### Returns: float
+            The accuracy of the predictions.
+
+        #### Raises: None
+        """
+        if not intents:
+            return 0.0
+        correct = sum(
+            intent == expected for (intent, _), expected in zip(predictions, intents)
+        )
+        return correct / len(intents)
+
+    def _training_ngrams(self, ngram_size: int, attr: int) -> dict[str, int]:
+        """
+        Helper function to find the hash keys of every n-gram in the training data,
+        the same way as the model's n-gram extractor.
+
+        #### Parameters:
+
+        ngram_size: int
+            The largest n-gram size used by the model.
+
+        attr: int
+            The token attribute the model builds its n-grams from.
+
+        #### Returns: dict[str, int]
+            The n-grams, with their tokens joined by spaces, and their hash keys.
+
+        #### Raises: None
+        """
+        ops = self.nlp.get_pipe("textcat").model.ops
+        strings = self.nlp.vocab.strings
+
+        ngrams = {}
+        for doc in _read_docs(self.config.train_data_save_path, self.nlp.vocab):
+            unigrams = doc.to_array([attr]).astype(np.uint64)
+            tokens = [strings[int(key)] for key in unigrams]
+
+            ngrams.update(zip(tokens, unigrams.tolist()))
+            for size in range(2, ngram_size + 1):
+                keys = ops.ngrams(size, unigrams).tolist()
+                ngrams.update(
+                    (" ".join(tokens[start : start + size]), key)
+                    for start, key in enumerate(keys)
+                )
+        return ngrams
+
+    def _data_fingerprint(self) -> str:
+        """
+        Helper function to fingerprint everything the prepared training and
+        validation data depend on: the contents of the data file, the split, the
+        seed, the spaCy model and version, and the shard size.
+
+        #### Parameters: None
+
+        #### Returns: str
+            The fingerprint.
+
+        #### Raises: None
+        """
+        return _fingerprint(
+            Path(self.config.data_path).read_bytes(),
+            self.config.train_percentage,
+            SEED,
+            self.config.spacy_model,
+            self.nlp.meta.get("version", ""),
+            spacy.__version__,
+            self.config.shard_size,
+        )
+
+    def _intent_fingerprint(self, phrases: list[str]) -> str:
+        """
+        Helper function to fingerprint everything the prepared docs of a single
+        intent depend on: its phrases, the split, the seed, and the spaCy model and
+        version.
+
+        #### Parameters:
+
+        phrases: list[str]
+            The phrases of the intent, in the order they appear in the data file.
+
+        #### Returns: str
+            The fingerprint.
+
+        #### Raises: None
+        """
+        return _fingerprint(
+            *phrases,
+            self.config.train_percentage,
+            SEED,
+            self.config.spacy_model,
+            self.nlp.meta.get("version", ""),
+            spacy.__version__,
+        )
+
+    def _config_fingerprint(self, base_config: Path) -> str:
+        """
+        Helper function to fingerprint everything the filled spaCy config depends
+        on: the contents of the base config and the spaCy version.
+
+        #### Parameters:
+
+        base_config: Path
+            The path to the base config.
+
+        #### Returns: str
+            The fingerprint.
+
+        #### Raises: None
+        """
+        return _fingerprint(base_config.read_bytes(), spacy.__version__)
+
+    def _is_up_to_date(self, fingerprint: str, *paths: Union[str, Path]) -> bool:
+        """
+        Helper function to check whether the outputs were built from inputs with the
+        given fingerprint, using the fingerprint files saved next to them.
+
+        #### Parameters:
+
+        fingerprint: str
+            The fingerprint of the inputs.
+
+        *paths: Union[str, Path]
+            The outputs built from the inputs.
+
+        #### Returns: bool
+            Whether or not every output exists and has the same fingerprint.
+
+        #### Raises: None
+        """
+        if self.config.force_rebuild:
+            return False
+
+        for path in map(Path, paths):
+            fingerprint_file = path.with_name(f"{path.name}.fingerprint")
+            if not path.exists() or not fingerprint_file.exists():
+                return False
+            if fingerprint_file.read_text(encoding="utf-8").strip() != fingerprint:
+                return False
+        return True
+
+    def _save_fingerprint(self, fingerprint: str, *paths: Union[str, Path]) -> None:
+        """
+        Helper function to save the fingerprint of the inputs next to each output.
+
+        #### Parameters:
+
+        fingerprint: str
+            The fingerprint of the inputs.
+
+        *paths: Union[str, Path]
+            The outputs built from the inputs.
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        for path in map(Path, paths):
+            path.with_name(f"{path.name}.fingerprint").write_text(
+                fingerprint + "\n", encoding="utf-8"
+            )
+
+    def _transfer_texts(self, num_examples: int) -> list[str]:
+        """
+        Helper function to generate the examples for the teacher to label from the
+        intent and entity rules, normalised and leaving out any validation examples.
+
+        #### Parameters:
+
+        num_examples: int
+            The number of examples to generate for each intent.
+
+        #### Returns: list[str]
+            The generated examples.
+
+        #### Raises: None
+        """
+        dataset = data.generate_intent_dataset(
+            data.load_intents(), data.load_entities(), num_examples
+        )
+        held_out = {
+            self._normalise(text)
+            for text, _ in self._labelled_examples(self.config.valid_data_save_path)
+        }
+        texts = {
+            self._normalise(text) for examples in dataset.values() for text in examples
+        }
+        return sorted(texts - held_out - {""})
+
+    def _train_student(
+        self,
+        full_config: Path,
+        output_dir: Path,
+        soft_labels: list[tuple[str, dict[str, float]]],
+        epochs: int,
+        batch_size: int,
+        callback: Union[Callable[[TrainingStep], None], None] = None,
+    ) -> TrainingSummary:  # pragma: no cover
+        """
+        Helper function to train the student on the teacher's scores and the
+        training data. spaCy's textcat only accepts scores of 0 or 1 when training,
+        so the student's model is updated directly with the error of its scores
+        against the teacher's, the same way the textcat updates it.
+
+        #### Parameters:
+
+        full_config: Path
+            The path to the filled spaCy config of the student.
+
+        output_dir: Path
+            The directory to save the student to.
+
+        soft_labels: list[tuple[str, dict[str, float]]]
+            The generated examples and the teacher's score for each intent.
+
+        epochs: int
+            The number of times to train on every example.
+
+        batch_size: int
+            The number of examples in each update.
+
+        callback: Union[Callable[[TrainingStep], None], None] (default: None)
+            A function called with the metrics after each epoch.
+
+        #### Returns: TrainingSummary
+            The scores and location of the best model, along with the metrics from
+            every epoch.
+
+        #### Raises: None
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        student = init_nlp(self._load_training_config(full_config))
+        textcat = student.get_pipe("textcat")
+        labels = list(textcat.labels)  # type: ignore
+        optimizer = student.create_optimizer()
+
+        def one_hot(intent: str) -> list[float]:
+            return [float(label == intent) for label in labels]
+
+        examples = [
+            (student.make_doc(text), one_hot(intent))
+            for text, intent in self._labelled_examples(
+                self.config.train_data_save_path
+            )
+        ] + [
+            (student.make_doc(text), [cats.get(label, 0.0) for label in labels])
+            for text, cats in soft_labels
+        ]
+        dev = list(self._labelled_examples(self.config.valid_data_save_path))
+        dev_docs = [student.make_doc(self._normalise(text)) for text, _ in dev]
+
+        rng = random.Random(SEED)
+        history: list[TrainingStep] = []
+        start = time.perf_counter()
+
+        with logger.log_context(
+            "info",
+            f"Training the student on {len(examples)} examples",
+            "Finished training the student",
+        ):
+            for epoch in range(1, epochs + 1):
+                rng.shuffle(examples)
+                loss = 0.0
+                for batch in spacy.util.minibatch(examples, size=max(batch_size, 1)):
+                    docs, targets = zip(*batch)
+                    scores, backprop = textcat.model.begin_update(list(docs))
+                    d_scores = scores - textcat.model.ops.asarray2f(targets)
+                    loss += float((d_scores**2).mean())
+                    backprop(d_scores)
+                    textcat.finish_update(optimizer)  # type: ignore
+
+                # Evaluate and save with the averaged weights, as spaCy does. Later
+                # epochs are more confident, so they are kept when tied
+                with student.use_params(optimizer.averages):
+                    scores = textcat.model.ops.to_numpy(textcat.model.predict(dev_docs))
+                    confident = self._confidence(scores) >= self.config.threshold
+                    accuracy = (
+                        sum(
+                            is_confident and labels[int(index)] == intent
+                            for index, is_confident, (_, intent) in zip(
+                                scores.argmax(axis=-1), confident, dev
+                            )
+                        )
+                        / len(dev)
+                        if dev
+                        else 0.0
+                    )
+                    if accuracy >= max((step.score for step in history), default=0):
+                        student.to_disk(output_dir / "model-best")
+
+                history.append(
+                    TrainingStep(
+                        epoch=epoch,
+                        step=epoch * -(-len(examples) // max(batch_size, 1)),
+                        score=accuracy,
+                        losses={"textcat": loss},
+                        other_scores={"accuracy": accuracy},
+                        words_per_second=0.0,
+                        seconds=time.perf_counter() - start,
+                    )
+                )
+                logger.log(
+                    "debug",
+                    f"Epoch {epoch} :: Loss {loss:.4f} :: Accuracy {accuracy:.4f}",
+                )
+                if callback is not None:
+                    callback(history[-1])
+
+        best = max(reversed(history), key=lambda step: step.score)
+        return TrainingSummary(
+            output_dir=str(output_dir),
+            best_model_location=str(output_dir / "model-best"),
+            best_score=best.score,
+            best_step=best.step,
+            epochs=epochs,
+            steps=history[-1].step,
+            seconds=history[-1].seconds,
+            history=history,
+        )
+
+    def _measure(
+        self, location: Path, components: Union[list[str], None] = None
+    ) -> dict[str, Any]:  # pragma: no cover
+        """
+        Helper function to measure the accuracy, latency and size of a saved model
+        on the validation data.
+
+        #### Parameters:
+
+        location: Path
+            The path to the saved model.
+
+        components: Union[list[str], None] (default: None)
+            The components to load. Leave empty to use the components in the
+            configuration.
+
+        #### Returns: dict[str, Any]
+            The location, accuracy, p50/p95/p99 latency of a single prediction in
+            milliseconds, and size in bytes of the model.
+
+        #### Raises: None
+        """
+        model = IntentClassifierModel(
+            replace(
+                self.config,
+                mode="test",
+                runtime="spacy",
+                cache_size=0,
+                best_model_location=str(location),
+                components=(
+                    self.config.components if components is None else components
+                ),
+            )
+        )
+        results = model.evaluate(batch_size=1)
+        return {
+            "location": str(location),
+            "accuracy": results["accuracy"],
+            "latency_ms": results["latency_ms"],
+            "model_bytes": sum(
+                path.stat().st_size for path in location.rglob("*") if path.is_file()
+            ),
+        }
+
+    def _example(self, text: str, intent: str) -> Example:
+        """
+        Helper function to create a training example that marks the given intent as
+        correct and every other intent as wrong.
+
+        #### Parameters:
+
+        text: str
+            The text of the example.
+
+        intent: str
+            The correct intent.
+
+        #### Returns: Example
+            The training example.
+
+        #### Raises: None
+        """
+        return Example.from_dict(
+            self.nlp.make_doc(text),
+            {"cats": {label: float(label == intent) for label in self.labels}},
+        )
+
+    def _rehearsal_examples(
+        self, size: int, rng: random.Random
+    ) -> list[tuple[str, str]]:
+        """
+        Helper function to sample examples from the training data, streaming the
+        docs so they are never all held in memory.
+
+        #### Parameters:
+
+        size: int
+            The number of examples to sample.
+
+        rng: random.Random
+            The random number generator to sample with.
+
+        #### Returns: list[tuple[str, str]]
+            The texts and intents of the sampled examples, skipping any intents the
+            model does not have, or an empty list if there is no training data.
+
+        #### Raises: None
+        """
+        path = Path(self.config.train_data_save_path)
+        if size <= 0 or not path.exists():
+            return []
+
+        docs = (
+            doc
+            for doc in _read_docs(path, self.nlp.vocab)
+            if doc.cats and max(doc.cats, key=doc.cats.get) in self.labels
+        )
+
+        sample: list[tuple[str, str]] = []
+        for seen, doc in enumerate(docs):
+            example = (doc.text, max(doc.cats, key=doc.cats.get))
+            if len(sample) < size:
+                sample.append(example)
+            elif (index := rng.randint(0, seen)) < size:
+                sample[index] = example
+        return sample
+
+    def _save_version(self) -> Path:
+        """
+        Helper function to save the updated model as a new version and make it the
+        model at `best_model_location`. The saved model is copied, so any components
+        that were excluded when loading it are kept, then the textcat component is
+        replaced with the updated one.
+
+        #### Parameters: None
+
+        #### Returns: Path
+            The path the new version was saved to.
+
+        #### Raises: None
+        """
+        source = Path(self.config.best_model_location)
+        versions = Path(self.config.output_dir) / "versions"
+        versions.mkdir(parents=True, exist_ok=True)
+
+        name = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        version = versions / name
+
+        # Only rename the version into place once it is completely saved
+        staged = versions / f".{name}.tmp"
+        shutil.copytree(source, staged, copy_function=shutil.copy)
+        self.nlp.get_pipe("textcat").to_disk(staged / "textcat")
+        os.rename(staged, version)
+        logger.log("info", f"Saved intent classifier version to: {version}")
+
+        staged = source.with_name(f".{source.name}.{name}.tmp")
+        shutil.copytree(version, staged, copy_function=shutil.copy)
+
+        backup = source.with_name(f"{source.name}.previous")
+        if backup.exists():
+            shutil.rmtree(backup)
+        os.rename(source, backup)
+        os.rename(staged, source)
+        logger.log("info", f"Replaced {source}, previous model kept at: {backup}")
+
+        return version
+
+    def _load_spacy_model(
+        self, spacy_model: str = "en"
+    ) -> spacy.language.Language:  # pragma: no cover
+        """
+        Helper function to load the correct spaCy language model.
+
+        #### Parameters:
+
+        spacy_model: str (default: "en")
+            The name of the spaCy model to load.
+
+        #### Returns: spacy.language.Language
+            The spaCy language model.
+
+        #### Raises: None
+        """
+        if self.config.mode == "train":
+            return (
+                spacy.blank(spacy_model)
+                if spacy_model == "en"
+                else _load_pipeline(
+                    spacy_model,
+                    self.config.components,
+                    self.config.vectors_mmap_path,
+                )
+            )
+        return _load_pipeline(
+            self.config.best_model_location, self.config.components, vocab=self.vocab
+        )
+
+    def _make_spacy_docs(
+        self,
+        data: Iterable[tuple[str, str]],
+        for_training: bool = True,
+        total: Union[int, None] = None,
+    ) -> Iterator[Doc]:  # pragma: no cover
+        """
+        Helper function to take the texts and labels and create spaCy docs as they
+        are needed, using `n_process` processes and buffering `batch_size` texts.
+
+        #### Parameters:
+
+        data: Iterable[tuple[str, str]]
+            The tuples containing the text and the label.
+
+        for_training: bool (default: True)
+            Whether the docs are being created for training or validation.
+
+        total: Union[int, None] (default: None)
+            The number of texts, to show in the progress bar.
+
+        #### Returns: Iterator[Doc]
+            The spaCy docs.
+
+        #### Raises: None
+        """
+        for doc, label in tqdm(
+            self.nlp.pipe(
+                data,
+                as_tuples=True,
+                n_process=self.config.n_process,
+                batch_size=self.config.batch_size,
+            ),
+            total=total,
+            desc="Creating train docs" if for_training else "Creating valid docs",
+        ):
+            doc.cats[label] = 1
+            yield doc
+
+    def _save_docs(self, docs: Iterable[Doc], path: Union[str, Path]) -> int:
+        """
+        Helper function to save the docs as they are created. If `shard_size` is set,
+        the path is a directory and a new file is started every `shard_size` docs,
+        otherwise the docs are saved to a single file.
+
+        #### Parameters:
+
+        docs: Iterable[Doc]
+            The docs to save.
+
+        path: Union[str, Path]
+            The file or directory to save the docs to.
+
+        #### Returns: int
+            The number of files written.
+
+        #### Raises: None
+        """
+        path = Path(path)
+
+        # Remove the old data, which may have been saved with a different shard size
+        if path.is_dir():
+            for shard in path.glob("*.spacy"):
+                shard.unlink()
+            if self.config.shard_size <= 0:
+                path.rmdir()
+        elif path.exists():
+            path.unlink()
+
+        if self.config.shard_size <= 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            DocBin(docs=docs).to_disk(path)
+            return 1
+
+        path.mkdir(parents=True, exist_ok=True)
+        shards = 0
+        doc_bin = DocBin()
+        for doc in docs:
+            doc_bin.add(doc)
+            if len(doc_bin) >= self.config.shard_size:
+                doc_bin.to_disk(path / f"{shards:04d}.spacy")
+                shards += 1
+                doc_bin = DocBin()
+
+        if len(doc_bin) or not shards:
+            doc_bin.to_disk(path / f"{shards:04d}.spacy")
+            shards += 1
+
+        logger.log("debug", f"Saved {shards} shards to: {path}")
+        return shards
+
+    def _prepare_data(self) -> None:  # pragma: no cover
+        """
+        Helper function to prepare and save the data for training and validation.
+        Each intent is split on its own and its docs are cached in `data_cache_dir`,
+        so only the intents whose examples have changed are prepared again. The
+        cached docs are then merged into the training and validation data.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        dataset = data.IntentClassifierDataset(Path(self.config.data_path))
+        cache_dir = Path(self.config.data_cache_dir)
+
+        intents = []
+        rebuilt = []
+        for intent, examples in dataset.data.groupby("intent", sort=True):
+            intents.append(intent)
+            intent_dir = cache_dir / str(intent)
+            paths = (intent_dir / "train.spacy", intent_dir / "dev.spacy")
+
+            fingerprint = self._intent_fingerprint(examples["phrase"].tolist())
+            if self._is_up_to_date(fingerprint, *paths):
+                continue
+
+            # Split each intent on its own, so every intent is in both sets
+            train_data = examples.sample(
+                frac=self.config.train_percentage, random_state=SEED
+            )
+            test_data = examples.drop(train_data.index)
+
+            intent_dir.mkdir(parents=True, exist_ok=True)
+            for split, for_training, path in zip(
+                (train_data, test_data), (True, False), paths
+            ):
+                docs = self._make_spacy_docs(
+                    split[["phrase", "intent"]].itertuples(index=False, name=None),
+                    for_training,
+                    len(split),
+                )
+                self._save_docs(docs, path)
+
+            self._save_fingerprint(fingerprint, *paths)
+            rebuilt.append(intent)
+
+        logger.log(
+            "info", f"Prepared {len(rebuilt)} of {len(intents)} intents: {rebuilt}"
+        )
+
+        # Remove the docs of intents that are no longer in the data
+        for intent_dir in cache_dir.glob("*"):
+            if intent_dir.is_dir() and intent_dir.name not in intents:
+                shutil.rmtree(intent_dir)
+
+        for name, path in [
+            ("train.spacy", self.config.train_data_save_path),
+            ("dev.spacy", self.config.valid_data_save_path),
+        ]:
+            docs = itertools.chain.from_iterable(
+                _read_docs(cache_dir / intent / name, self.nlp.vocab)
+                for intent in intents
+            )
+            self._save_docs(docs, path)
+
+    def _load_labels(self) -> tuple[str, ...]:
+        """
+        Helper function to fix the order of the intent labels once the model is loaded,
+        so the scores can be stored as vectors.
+
+        #### Parameters: None
+
+        #### Returns: tuple[str, ...]
+            The intent labels, or an empty tuple if the pipeline has no textcat component.
+
+        #### Raises: None
+        """
+        if self.lite is not None:
+            return self.lite.labels
+        if "textcat" not in self.nlp.pipe_names:
+            return ()
+        return tuple(self.nlp.get_pipe("textcat").labels)  # type: ignore
+
+    def _predict(
+        self, texts: Iterable[str], batch_size: int = 128, n_process: int = 1
+    ) -> list[tuple[str, np.ndarray]]:
+        """
+        Helper function to predict the intent and score vector for each text, using
+        the cache where possible and scoring the rest of the texts together.
+
+        #### Parameters:
+
+        texts: Iterable[str]
+            The texts to predict the intents of.
+
+        batch_size: int (default: 128)
+            The number of texts to buffer and process together.
+
+        n_process: int (default: 1)
+            The number of worker processes to use when running the pipeline. The
+            workers are forked, so they share the loaded model with this process.
+
+        #### Returns: list[tuple[str, np.ndarray]]
+            A list of tuples containing the predicted intent and the scores for each
+            intent (in the order of `labels`), in the same order as the given texts.
+
+        #### Raises: None
+        """
+        texts = [self._normalise(text) for text in texts]
+
+        predictions = {}
+        for text in texts:
+            if (prediction := self._from_cache(text)) is not None:
+                predictions[text] = prediction
+
+        # Only run the texts that were not cached, and each unique text only once
+        missing = list(dict.fromkeys(text for text in texts if text not in predictions))
+        if missing:
+            # spaCy gives empty docs no scores, and cannot batch them with other docs
+            to_run = [index for index, text in enumerate(missing) if text]
+            scores = np.zeros((len(missing), len(self.labels)), dtype=np.float32)
+            scores[to_run] = self._score_texts(
+                [missing[index] for index in to_run], batch_size, n_process
+            )
+
+            for text, intent, row in zip(missing, self._intents(scores), scores):
+                predictions[text] = self._store(text, (intent, row))
+
+        return [predictions[text] for text in texts]
+
+    def _predict_intents(self, texts: list[str]) -> list[str]:
+        """
+        Helper function to predict just the intents of a batch of texts.
+
+        #### Parameters:
+
+        texts: list[str]
+            The texts to predict the intents of.
+
+        #### Returns: list[str]
+            The predicted intents, in the same order as the given texts.
+
+        #### Raises: None
+        """
+        return [
+            intent for intent, _ in self._predict(texts, batch_size=max(len(texts), 1))
+        ]
+
+    def _normalise(self, text: Union[str, None]) -> str:
+        """
+        Helper function to normalise the text before it is passed to the model.
+
+        #### Parameters:
+
+        text: Union[str, None]
+            The text to normalise.
+
+        #### Returns: str
+            The stripped, lowercase text, or an empty string if no text was given.
+
+        #### Raises: None
+        """
+        return text.strip().lower() if text else ""
+
+    def _from_cache(self, text: str) -> Union[tuple[str, np.ndarray], None]:
+        """
+        Helper function to look up a prediction in the cache. The cache is cleared
+        first if the model location has changed since the predictions were cached.
+
+        #### Parameters:
+
+        text: str
+            The normalised text to look up.
+
+        #### Returns: Union[tuple[str, np.ndarray], None]
+            The cached intent and scores, or None if the text is not cached.
+
+        #### Raises: None
+        """
+        if self.cache is None:
+            return None
+
+        self.cache.ensure_version(
+            str(self.lite.path)
+            if self.lite is not None
+            else self.config.best_model_location
+        )
+        return self.cache.get(text)
+
+    def _store(
+        self, text: str, prediction: tuple[str, np.ndarray]
+    ) -> tuple[str, np.ndarray]:
+        """
+        Helper function to cache a prediction, if the cache is enabled.
+
+        #### Parameters:
+
+        text: str
+            The normalised text the prediction was made for.
+
+        prediction: tuple[str, np.ndarray]
+            The predicted intent and the scores for each intent.
+
+        #### Returns: tuple[str, np.ndarray]
+            The prediction.
+
+        #### Raises: None
+        """
+        return (
+            self.cache.put(text, prediction) if self.cache is not None else prediction
+        )
+
+    def _score_texts(
+        self, texts: list[str], batch_size: int = 128, n_process: int = 1
+    ) -> np.ndarray:
+        """
+        Helper function to score non-empty texts with the configured runtime.
+
+        #### Parameters:
+
+        texts: list[str]
+            The normalised texts to score.
+
+        batch_size: int (default: 128)
+            The number of texts to buffer and process together.
+
+        n_process: int (default: 1)
+            The number of worker processes to use when running the pipeline. The
+            workers are forked, so they share the loaded model with this process.
+
+        #### Returns: np.ndarray
+            A matrix of shape (number of texts, number of labels) holding the scores.
+
+        #### Raises: None
+        """
+        if self.lite is not None:
+            return self.lite.scores(texts)
+
+        if n_process > 1 and len(texts) > batch_size:
+            with PreforkPool(self._score_texts, n_process) as pool:
+                rows = pool.map(texts, batch_size)
+            return np.array(rows, dtype=np.float32).reshape(
+                len(texts), len(self.labels)
+            )
+
+        docs = (
+            [self.nlp(texts[0])]
+            if len(texts) == 1
+            else list(self.nlp.pipe(texts, batch_size=batch_size))
+        )
+        return self._score_matrix(docs)
+
+    def _score_matrix(self, docs: list[Doc]) -> np.ndarray:
+        """
+        Helper function to collect the scores stored on the docs into a matrix.
+
+        #### Parameters:
+
+        docs: list[Doc]
+            The spaCy docs that have been run through the pipeline.
+
+        #### Returns: np.ndarray
+            A matrix of shape (number of docs, number of labels) holding the scores.
+
+        #### Raises: None
+        """
+        return np.array(
+            [[doc.cats.get(label, 0.0) for label in self.labels] for doc in docs],
+            dtype=np.float32,
+        ).reshape(len(docs), len(self.labels))
+
+    def _intents(self, scores: np.ndarray) -> list[str]:
+        """
+        Helper function to pick the intent for each row of a score matrix.
+
+        #### Parameters:
+
+        scores: np.ndarray
+            A matrix of shape (number of docs, number of labels) holding the scores.
+
+        #### Returns: list[str]
+            The predicted intent for each row, or "unknown" if the model is not
+            confident enough.
+
+        #### Raises: None
+        """
+        if not self.labels:
+            logger.log("error", "No predictions found")
+            return ["unknown"] * len(scores)
+
+        confident = self._confidence(scores) >= self.config.threshold
+        best = scores.argmax(axis=-1)
+
+        return [
+            self.labels[index] if is_confident else "unknown"
+            for index, is_confident in zip(best, confident)
+        ]
+
+    def _rank(
+        self, scores: np.ndarray, k: Union[int, None] = None
+    ) -> list[tuple[str, float]]:
+        """
+        Helper function to rank the intents by their scores.
+
+        #### Parameters:
+
+        scores: np.ndarray
+            The scores for each intent, in the order of `labels`.
+
+        k: Union[int, None] (default: None)
+            The number of intents to return. Leave empty to return all of them.
+
+        #### Returns: list[tuple[str, float]]
+            The intents and their scores, ranked from the highest to the lowest score.
+
+        #### Raises: None
+        """
+        k = len(scores) if k is None else min(k, len(scores))
+        if k <= 0:
+            return []
+
+        # Only fully sort the k highest scores
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(self.labels[index], float(scores[index])) for index in top]
+
+    def _confidence(self, scores: np.ndarray) -> Union[float, np.ndarray]:
+        """
+        Helper function to calculate the confidence of the model's prediction.
+        This is done by getting the standard deviation of the prediction and
+        dividing it by the mean of the predictions.
+
+        #### Parameters:
+
+        scores: np.ndarray
+            The scores for a single prediction, or a matrix of scores with one
+            prediction per row.
+
+        #### Returns: Union[float, np.ndarray]
+            The confidence of the prediction, or of each row of the matrix.
+
+        #### Raises: None
+        """
+        return lite.confidence(scores)
+
+
+class NERModel:
+    """
+    Contains the logic for the named entity recognition model.
+
+    #### Parameters:
+
+    config: NERModelConfig (default: NERModelConfig())
+        The configuration for the model.
+
+    #### Methods:
+
+    predict(text: str) -> list[tuple[str, str]]
+        Predict the named entities of the given text.
+
+    predict_batch(
+        texts: Iterable[str], batch_size: int = 128, n_process: int = 1
+    ) -> list[list[tuple[str, str]]]
+        Predict the named entities of many texts in a single pass through the
+        spaCy pipeline.
+
+    analyse(text: str, entities: bool = True) -> Doc
+        Tokenise the text once, keeping the doc for the next call with the same text.
+
+    cache_stats() -> dict[str, Union[int, float]]
+        The hit, miss and eviction counters for the prediction cache.
+    """
+
+    def __init__(self, config: NERModelConfig = NERModelConfig()) -> None:
+        self.config = config
+        self.nlp = self._load_spacy_model(self.config.spacy_model)
+        self.cache = (
+            PredictionCache(self.config.cache_size, self.config.cache_eviction)
+            if self.config.cache_size > 0
+            else None
+        )
+        # The last doc on each thread, with whether its entities were recognised
+        self._last = threading.local()
+
+    def predict(self, text: str) -> list[tuple[str, str]]:
+        """
+        Predict the named entities of the given text. With the cache enabled, the
+        entities of a text seen before (ignoring leading and trailing spaces) are
+        returned without running the pipeline.
+
+        #### Parameters:
+
+        text: str
+            The text to predict the named entities of.
+
+        #### Returns: list[tuple[str, str]]
+            A list of tuples containing the named entity and its label.
+
+        #### Raises: None
+        """
+        text = text.strip() if text else ""
+
+        if self.cache is not None and (entities := self.cache.get(text)) is not None:
+            return list(entities)
+
+        return self._store(text, self._entities(self.analyse(text)))
+
+    def predict_batch(
+        self, texts: Iterable[str], batch_size: int = 128, n_process: int = 1
+    ) -> list[list[tuple[str, str]]]:
+        """
+        Predict the named entities of many texts in a single pass through the spaCy
+        pipeline. Cached texts are not run again, and each unique text is only run
+        once.
+
+        #### Parameters:
+
+        texts: Iterable[str]
+            The texts to predict the named entities of.
+
+        batch_size: int (default: 128)
+            The number of texts to buffer and process together.
+
+        n_process: int (default: 1)
+            The number of worker processes to use when running the pipeline. The
+            workers are forked, so they share the loaded model with this process.
+
+        #### Returns: list[list[tuple[str, str]]]
+            The named entities and their labels for each text, in the same order as
+            the given texts.
+
+        #### Raises: None
+        """
+        texts = [text.strip() if text else "" for text in texts]
+
+        predictions = {}
+        if self.cache is not None:
+            for text in texts:
+                if (entities := self.cache.get(text)) is not None:
+                    predictions[text] = entities
+
+        # Only run the texts that were not cached, and each unique text only once
+        missing = list(dict.fromkeys(text for text in texts if text not in predictions))
+        if n_process > 1 and len(missing) > batch_size:
+            with PreforkPool(self._recognise, n_process) as pool:
+                recognised = pool.map(missing, batch_size)
+        else:
+            recognised = self._recognise(missing, batch_size)
+
+        for text, entities in zip(missing, recognised):
+            predictions[text] = self._store(text, entities)
+
+        return [list(predictions[text]) for text in texts]
+
+    def analyse(self, text: str, entities: bool = True) -> Doc:
+        """
+        Tokenise the text, keeping the doc so the next call with the same text on
+        this thread reuses it. This lets the intent classifier (with
+        `IntentClassifierModel.predict_doc`) and the intents that need entities
+        share one doc for each message. The entities are only recognised once they
+        are asked for.
+
+        #### Parameters:
+
+        text: str
+            The text to analyse.
+
+        entities: bool (default: True)
+            Whether or not to run the pipeline's components to recognise the
+            entities, rather than only tokenising the text.
+
+        #### Returns: Doc
+            The doc of the stripped text.
+
+        #### Raises: None
+        """
+        text = text.strip() if text else ""
+
+        last_text, doc, annotated = getattr(self._last, "value", (None, None, False))
+        if doc is None or last_text != text:
+            doc, annotated = self.nlp.make_doc(text), False
+
+        if entities and not annotated:
+            doc, annotated = self.nlp(doc), True
+
+        self._last.value = (text, doc, annotated)
+        return doc
+
+    def cache_stats(self) -> dict[str, Union[int, float]]:
+        """
+        The hit, miss and eviction counters for the prediction cache.
+
+        #### Parameters: None
+
+        #### Returns: dict[str, Union[int, float]]
+            The cache counters, or an empty dictionary if the cache is disabled.
+
+        #### Raises: None
+        """
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _recognise(
+        self, texts: list[str], batch_size: int = 128
+    ) -> list[list[tuple[str, str]]]:
+        """
+        Helper function to run the pipeline over the texts in batches.
+
+        #### Parameters:
+
+        texts: list[str]
+            The stripped texts to recognise the named entities of.
+
+        batch_size: int (default: 128)
+            The number of texts to buffer and process together.
+
+        #### Returns: list[list[tuple[str, str]]]
+            The named entities and their labels for each text.
+
+        #### Raises: None
+        """
+        return [
+            self._entities(doc) for doc in self.nlp.pipe(texts, batch_size=batch_size)
+        ]
+
+    def _entities(self, doc: Doc) -> list[tuple[str, str]]:
+        """
+        Helper function to collect the named entities of a doc.
+
+        #### Parameters:
+
+        doc: Doc
+            The doc to collect the named entities of.
+
+        #### Returns: list[tuple[str, str]]
+            A list of tuples containing the named entity and its label.
+
+        #### Raises: None
+        """
+        return [(ent.text, ent.label_) for ent in doc.ents]
+
+    def _store(
+        self, text: str, entities: list[tuple[str, str]]
+    ) -> list[tuple[str, str]]:
+        """
+        Helper function to cache the named entities of a text, if the cache is
+        enabled. A copy is cached, so changing the returned list does not change
+        the cache.
+
+        #### Parameters:
+
+        text: str
+            The stripped text.
+
+        entities: list[tuple[str, str]]
+            The named entities of the text.
+
+        #### Returns: list[tuple[str, str]]
+            The named entities of the text.
+
+        #### Raises: None
+        """
+        if self.cache is not None:
+            self.cache.put(text, tuple(entities))
+        return entities
+
+    def _load_spacy_model(
+        self, spacy_model: str = "en"
+    ) -> spacy.language.Language:  # pragma: no cover
+        """
+        Helper function to load the correct spaCy language model.
+
+        #### Parameters:
+
+        spacy_model: str (default: "en")
+            The name of the spaCy model to load.
+
+        #### Returns: spacy.language.Language
+            The spaCy language model.
+
+        #### Raises: None
+        """
+        return (
+            spacy.blank(spacy_model)
+            if spacy_model == "en"
+            else _load_pipeline(
+                spacy_model, self.config.components, self.config.vectors_mmap_path
+            )
+        )
+
+
+def _load_pipeline(
+    spacy_model: str,
+    components: list[str],
+    vectors_mmap_path: str = "",
+    vocab: Union[Vocab, None] = None,
+) -> spacy.language.Language:  # pragma: no cover
+    """
+    Helper function to load a spaCy pipeline with only the given components. The
+    other components are excluded, so they are never loaded into memory.
+
+    #### Parameters:
+
+    spacy_model: str
+        The name of, or the path to, the spaCy model to load.
+
+    components: list[str]
+        The components to keep. Leave empty to load every component.
+
+    vectors_mmap_path: str (default: "")
+        The path to a `.npy` file to memory-map the word vectors from, instead of
+        reading them into this process. Leave empty to read them as usual.
+
+    vocab: Union[Vocab, None] (default: None)
+        A vocab to load the pipeline into, adding the pipeline's strings but keeping
+        the vectors and lookup tables of the vocab. Leave empty to load the
+        pipeline's own vocab.
+
+    #### Returns: spacy.language.Language
+        The spaCy language model.
+
+    #### Raises: None
+    """
+    path = _model_path(spacy_model) if components or vectors_mmap_path else None
+
+    exclude = []
+    if path is not None and components:
+        meta = spacy.util.get_model_meta(path)
+        exclude = [
+            component
+            for component in meta.get("components", meta.get("pipeline", []))
+            if component not in components
+        ]
+
+    mmap_vectors = (
+        path is not None
+        and vocab is None
+        and bool(vectors_mmap_path)
+        and (path / "vocab" / "vectors").is_file()
+    )
+
+    start = time.perf_counter()
+    if vocab is not None:
+        nlp = spacy.load(
+            spacy_model, exclude=[*exclude, "vectors", "lookups"], vocab=vocab
+        )
+    elif mmap_vectors:
+        vectors = _mmap_vectors(
+            path / "vocab" / "vectors", Path(vectors_mmap_path)  # type: ignore
+        )
+        nlp = spacy.load(spacy_model, exclude=[*exclude, "vectors"])
+
+        # Load the keys and settings of the vectors, then use the mapped table
+        nlp.vocab.vectors.data = vectors
+        nlp.vocab.vectors.from_disk(
+            path / "vocab", exclude=["strings", "vectors"]  # type: ignore
+        )
+    else:
+        nlp = spacy.load(spacy_model, exclude=exclude)
+    logger.log(
+        "info",
+        f"Loaded spaCy model '{spacy_model}' with components {nlp.pipe_names} "
+        + f"(excluded {exclude}) in {time.perf_counter() - start:.3f}s"
+        + (f", mapping the vectors from {vectors_mmap_path}" if mmap_vectors else ""),
+    )
+    return nlp
+
+
+def _model_path(spacy_model: str) -> Path:  # pragma: no cover
+    """
+    Helper function to find the directory holding the data of a spaCy model, either
+    the path it was given as or the data directory inside its installed package.
+
+    #### Parameters:
+
+    spacy_model: str
+        The name of, or the path to, the spaCy model.
+
+    #### Returns: Path
+        The directory holding the model's `meta.json`, `vocab` and components.
+
+    #### Raises: None
+    """
+    if Path(spacy_model).exists():
+        return Path(spacy_model)
+
+    path = spacy.util.get_package_path(spacy_model)
+    meta = spacy.util.get_model_meta(path)
+    data_dir = path / f"{meta['lang']}_{meta['name']}-{meta['version']}"
+    return data_dir if data_dir.exists() else path
+
+
+def _mmap_vectors(vectors_file: Path, vectors_mmap_path: Path) -> np.ndarray:
+    """
+    Helper function to memory-map the vectors table of a spaCy model read-only.
+    The table is written to the `.npy` file first if it does not exist yet, or if
+    its shape or type no longer match the model's table (which spaCy saves in the
+    same format).
+
+    #### Parameters:
+
+    vectors_file: Path
+        The vectors table saved with the spaCy model.
+
+    vectors_mmap_path: Path
+        The `.npy` file to map the vectors from.
+
+    #### Returns: np.ndarray
+        The read-only, memory-mapped vectors table.
+
+    #### Raises: None
+    """
+    source = np.load(vectors_file, mmap_mode="r")
+
+    if vectors_mmap_path.exists():
+        vectors = np.load(vectors_mmap_path, mmap_mode="r")
+        if vectors.shape == source.shape and vectors.dtype == source.dtype:
+            return vectors
+        logger.log(
+            "warning",
+            f"The vectors at {vectors_mmap_path} do not match {vectors_file}, "
+            "writing them again",
+        )
+        del vectors
+
+    # Write to a temporary file first, so other processes never map a partial table
+    vectors_mmap_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = vectors_mmap_path.with_name(f".{vectors_mmap_path.name}.{os.getpid()}")
+    with open(temp_path, "wb") as file:
+        np.save(file, np.ascontiguousarray(source), allow_pickle=False)
+    os.replace(temp_path, vectors_mmap_path)
+    logger.log("info", f"Saved the vectors of {vectors_file} to {vectors_mmap_path}")
+
+    return np.load(vectors_mmap_path, mmap_mode="r")
+
+
+def _fingerprint(*parts: Any) -> str:
+    """
+    Helper function to create a fingerprint of the given inputs.
+
+    #### Parameters:
+
+    *parts: Any
+        The inputs to fingerprint. Bytes are hashed as they are, anything else is
+        hashed as its string representation.
+
+    #### Returns: str
+        The SHA-256 hex digest of the inputs.
+
+    #### Raises: None
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        content = part if isinstance(part, bytes) else repr(part).encode("utf-8")
+        # Prefix each part with its length, so the parts cannot run together
+        digest.update(len(content).to_bytes(8, "little"))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def _read_docs(path: Union[str, Path], vocab: spacy.vocab.Vocab) -> Iterator[Doc]:
+    """
+    Helper function to stream the docs saved in a `.spacy` file, or in every
+    `.spacy` file in a directory of shards.
+
+    #### Parameters:
+
+    path: Union[str, Path]
+        The file or directory the docs were saved to.
+
+    vocab: spacy.vocab.Vocab
+        The vocab to create the docs with.
+
+    #### Returns: Iterator[Doc]
+        The docs, in the order they were saved.
+
+    #### Raises: None
+    """
+    path = Path(path)
+    files = sorted(path.glob("*.spacy")) if path.is_dir() else [path]
+    for file in files:
+        yield from DocBin().from_disk(file).get_docs(vocab)
+
+
+@spacy.registry.loggers("ace.TrainingLogger.v1")
+def _training_logger(wrapped: Union[Callable, None] = None) -> Callable:
+    """
+    A spaCy training logger that wraps another logger, e.g. the console logger,
+    and passes the metrics of each evaluation step on to the callback of the
+    current `IntentClassifierModel.train` call.
+
+    #### Parameters:
+
+    wrapped: Union[Callable, None] (default: None)
+        The spaCy logger to wrap.
+
+    #### Returns: Callable
+        The function spaCy calls to set up the logger.
+
+    #### Raises: None
+    """
+
+    def setup_logger(
+        nlp: spacy.language.Language, stdout: Any, stderr: Any
+    ) -> tuple[Callable, Callable]:
+        log_wrapped, finalize = (
+            wrapped(nlp, stdout, stderr)
+            if wrapped is not None
+            else (lambda info: None, lambda: None)
+        )
+        previous = {"words": 0, "seconds": 0.0}
+
+        def log_step(info: Union[dict[str, Any], None]) -> None:
+            log_wrapped(info)
+            if info is None or _training_callback is None:
+                return
+
+            words = info["words"] - previous["words"]
+            seconds = info["seconds"] - previous["seconds"]
+            previous.update(words=info["words"], seconds=info["seconds"])
+
+            _training_callback(
+                TrainingStep(
+                    epoch=info["epoch"],
+                    step=info["step"],
+                    score=float(info["score"]),
+                    losses={name: float(loss) for name, loss in info["losses"].items()},
+                    other_scores=info["other_scores"],
+                    words_per_second=words / seconds if seconds else 0.0,
+                    seconds=float(info["seconds"]),
+                )
+            )
+
+        return log_step, finalize
+
+    return setup_logger
@@ -0,0 +1,619 @@
+"""
+Rule-based matching of text against the intent templates and entity lists used to
+generate the intent datasets. Matching is exact (ignoring case, punctuation and
+spacing), so it can answer the common phrases without running the spaCy models.
+
+#### Classes:
+
+TemplateMatcherConfig:
+    Holds the configuration for the template matcher.
+
+TemplateMatcher:
+    Matches text exactly against the compiled intent templates.
+
+LocationMatcherConfig:
+    Holds the configuration for the location matcher.
+
+LocationMatcher:
+    Finds known locations in text using a gazetteer of place names.
+
+#### Functions: None
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Union
+
+import toml
+
+from ace.ai import data
+from ace.utils import Logger
+
+CONFIG_PATH = os.path.join("config", "ai.toml")
+TOKEN_PATTERN = data.TOKEN_PATTERN
+SLOT_PATTERN = re.compile(r"({.*?})")
+
+logger = Logger.from_toml(config_file_name="logs.toml", log_name="models")
+
+
+@dataclass
+class TemplateMatcherConfig:
+    """
+    Holds the configuration for the template matcher.
+
+    #### Parameters:
+
+    enabled: bool (default: False)
+        Whether or not to match text against the templates before using the model.
+
+    intents_directory: str (default: "data/rules/intents")
+        The directory containing the intent files.
+
+    entities_directory: str (default: "data/rules/entities")
+        The directory containing the entity files.
+
+    entity_store_directory: str (default: "")
+        The directory to compile the entity files into, so the entity values are
+        memory-mapped instead of loaded into memory. Leave empty to load them.
+
+    #### Methods:
+
+    from_toml(config_file: Union[str, None] = None) -> TemplateMatcherConfig
+        Load the configuration from a TOML file. Leave the config_file parameter
+        empty to load the configuration from the default location: config/ai.toml.
+    """
+
+    enabled: bool = False
+    intents_directory: str = "data/rules/intents"
+    entities_directory: str = "data/rules/entities"
+    entity_store_directory: str = ""
+
+    @staticmethod
+    def from_toml(config_file: Union[str, None] = None) -> "TemplateMatcherConfig":
+        """
+        Load the configuration from a TOML file. Leave the config_file parameter
+        empty to load the configuration from the default location: config/ai.toml.
+
+        #### Parameters:
+
+        config_file: Union[str, None] (default: None)
+            The path to the TOML file to load the configuration from.
+
+        #### Returns: TemplateMatcherConfig
+            The configuration object for the template matcher.
+
+        #### Raises: None
+        """
+        config = toml.load(config_file or CONFIG_PATH)
+        return TemplateMatcherConfig(**config.get("TemplateMatcherConfig", {}))
+
+
+class _Node:
+    """
+    A node in a token trie.
+
+    #### Parameters: None
+
+    #### Methods: None
+    """
+
+    __slots__ = ("children", "slots", "values")
+
+    def __init__(self) -> None:
+        self.children: dict[str, "_Node"] = {}
+        self.slots: dict[str, "_Node"] = {}
+        self.values: set[str] = set()
+
+    def add(self, tokens: list[str]) -> "_Node":
+        """
+        Add a path of literal tokens below this node.
+
+        #### Parameters:
+
+        tokens: list[str]
+            The tokens to add.
+
+        #### Returns: _Node
+            The node at the end of the path.
+
+        #### Raises: None
+        """
+        node = self
+        for token in tokens:
+            node = node.children.setdefault(token, _Node())
+        return node
+
+
+class TemplateMatcher:
+    """
+    Matches text exactly against the intent templates. The templates are compiled
+    into a token trie, with each `{entity}` slot matched against a trie of the
+    entity's values, or against the compiled values of an `EntityStore`.
+
+    #### Parameters:
+
+    config: TemplateMatcherConfig (default: TemplateMatcherConfig())
+        The configuration object for the template matcher.
+
+    raw_intents: Union[dict, None] (default: None)
+        The intent templates to compile. Leave empty to load them from the
+        intents directory in the configuration.
+
+    raw_entities: Union[dict, None] (default: None)
+        The entity values to compile, or an `EntityStore`. Leave empty to load them
+        from the entities directory (or the entity store) in the configuration.
+
+    #### Methods:
+
+    match(text: str) -> Union[str, None]
+        Find the intent whose templates match the given text exactly.
+
+    stats() -> dict[str, Union[int, float]]
+        The number of texts that did and did not match a template.
+    """
+
+    def __init__(
+        self,
+        config: TemplateMatcherConfig = TemplateMatcherConfig(),
+        raw_intents: Union[dict, None] = None,
+        raw_entities: Union[dict, None] = None,
+    ) -> None:
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+
+        with logger.log_context(
+            "info", "Compiling intent templates", "Finished compiling intent templates"
+        ):
+            self._entities = self._compile_entities(
+                raw_entities or self._load_entities()
+            )
+            self._root = self._compile_intents(
+                raw_intents or data.load_intents(self.config.intents_directory)
+            )
+
+    def match(self, text: str) -> Union[str, None]:
+        """
+        Find the intent whose templates match the given text exactly. Case,
+        punctuation and spacing are ignored.
+
+        #### Parameters:
+
+        text: str
+            The text to match.
+
+        #### Returns: Union[str, None]
+            The matched intent, or None if no template matches or the templates
+            of more than one intent match.
+
+        #### Raises: None
+        """
+        tokens = self._tokenise(text)
+        intents = self._match(tokens) if tokens else set()
+
+        if len(intents) == 1:
+            self.hits += 1
+            intent = intents.pop()
+            logger.log("debug", f"Matched template for intent: {intent}")
+            return intent
+
+        if len(intents) > 1:
+            logger.log("debug", f"Templates for several intents matched: {intents}")
+
+        self.misses += 1
+        return None
+
+    def stats(self) -> dict[str, Union[int, float]]:
+        """
+        The number of texts that did and did not match a template.
+
+        #### Parameters: None
+
+        #### Returns: dict[str, Union[int, float]]
+            The hit and miss counters and the hit rate of the matcher.
+
+        #### Raises: None
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _tokenise(self, text: Union[str, None]) -> list[str]:
+        """
+        Helper function to split the text into lowercase word tokens.
+
+        #### Parameters:
+
+        text: Union[str, None]
+            The text to split.
+
+        #### Returns: list[str]
+            The tokens in the text.
+
+        #### Raises: None
+        """
+        return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+    def _load_entities(self) -> Union[dict, data.EntityStore]:
+        """
+        Helper function to load the entity values, compiling them into the entity
+        store if one is configured.
+
+        #### Parameters: None
+
+        #### Returns: Union[dict, EntityStore]
+            The entities and their values.
+
+        #### Raises: FileNotFoundError
+            If no entities are found in the entities directory.
+        """
+        if self.config.entity_store_directory:
+            return data.EntityStore.build(
+                self.config.entities_directory, self.config.entity_store_directory
+            )
+        return data.load_entities(self.config.entities_directory)
+
+    def _compile_entities(
+        self, raw_entities: Union[dict, data.EntityStore]
+    ) -> dict[str, Union[_Node, data.EntityValues]]:
+        """
+        Helper function to compile the values of each entity into a token trie.
+        Values from an entity store are already compiled, so they are used as they
+        are.
+
+        #### Parameters:
+
+        raw_entities: Union[dict, EntityStore]
+            A dictionary of the entities and their values.
+
+        #### Returns: dict[str, Union[_Node, EntityValues]]
+            A dictionary of the entities and the roots of their tries.
+
+        #### Raises: None
+        """
+        entities: dict[str, Union[_Node, data.EntityValues]] = {}
+        for entity, values in raw_entities.items():
+            if isinstance(values, data.EntityValues):
+                entities[entity] = values
+                continue
+
+            root = _Node()
+            for value in values:
+                if tokens := self._tokenise(value):
+                    root.add(tokens).values.add(value)
+            entities[entity] = root
+        return entities
+
+    def _compile_intents(self, raw_intents: dict) -> _Node:
+        """
+        Helper function to compile the intent templates into a single token trie.
+
+        #### Parameters:
+
+        raw_intents: dict
+            A dictionary of the intents and their templates.
+
+        #### Returns: _Node
+            The root of the trie.
+
+        #### Raises: None
+        """
+        root = _Node()
+        for intent, templates in raw_intents.items():
+            for template in templates:
+                parts = SLOT_PATTERN.split(template)
+                if any(
+                    part[1:-1] not in self._entities
+                    for part in parts
+                    if SLOT_PATTERN.fullmatch(part)
+                ):
+                    logger.log(
+                        "warning", f"Skipping template with no entity: {template}"
+                    )
+                    continue
+
+                node = root
+                for part in parts:
+                    if SLOT_PATTERN.fullmatch(part):
+                        node = node.slots.setdefault(part[1:-1], _Node())
+                    else:
+                        node = node.add(self._tokenise(part))
+
+                if node is not root:
+                    node.values.add(intent)
+        return root
+
+    def _match(self, tokens: list[str]) -> set[str]:
+        """
+        Helper function to walk the template trie with the given tokens.
+
+        #### Parameters:
+
+        tokens: list[str]
+            The tokens to match.
+
+        #### Returns: set[str]
+            The intents with a template that matches all of the tokens.
+
+        #### Raises: None
+        """
+        intents: set[str] = set()
+        stack = [(self._root, 0)]
+        while stack:
+            node, position = stack.pop()
+
+            if position == len(tokens):
+                intents |= node.values
+                continue
+
+            if child := node.children.get(tokens[position]):
+                stack.append((child, position + 1))
+
+            for entity, child in node.slots.items():
+                stack.extend(
+                    (child, end)
+                    for end in self._match_entity(
+                        self._entities[entity], tokens, position
+                    )
+                )
+        return intents
+
+    def _match_entity(
+        self, root: Union[_Node, data.EntityValues], tokens: list[str], start: int
+    ) -> Iterator[int]:
+        """
+        Helper function to find the entity values that start at the given position.
+
+        #### Parameters:
+
+        root: Union[_Node, EntityValues]
+            The root of the entity's trie, or its compiled values.
+
+        tokens: list[str]
+            The tokens to match.
+
+        start: int
+            The position of the first token of the value.
+
+        #### Returns: Iterator[int]
+            The positions just after each matching value.
+
+        #### Raises: None
+        """
+        if isinstance(root, data.EntityValues):
+            yield from root.match(tokens, start)
+            return
+
+        node = root
+        for position in range(start, len(tokens)):
+            if (node := node.children.get(tokens[position])) is None:  # type: ignore
+                return
+            if node.values:
+                yield position + 1
+
+
+@dataclass
+class LocationMatcherConfig:
+    """
+    Holds the configuration for the location matcher.
+
+    #### Parameters:
+
+    enabled: bool (default: False)
+        Whether or not to look for known locations before using the named entity
+        recognition model.
+
+    locations_file: str (default: "data/rules/entities/location.entity")
+        The entity file listing the known locations, one on each line.
+
+    gazetteer_file: str (default: "config/gazetteer.txt")
+        A file of extra locations to know, one on each line, in the same format.
+        Lines starting with `#` are ignored. The file is optional.
+
+    entity_store_directory: str (default: "")
+        The directory to compile the entity files next to the locations file into,
+        so the locations are memory-mapped instead of loaded into memory. Leave
+        empty to load them.
+
+    #### Methods:
+
+    from_toml(config_file: Union[str, None] = None) -> LocationMatcherConfig
+        Load the configuration from a TOML file. Leave the config_file parameter
+        empty to load the configuration from the default location: config/ai.toml.
+    """
+
+    enabled: bool = False
+    locations_file: str = "data/rules/entities/location.entity"
+    gazetteer_file: str = "config/gazetteer.txt"
+    entity_store_directory: str = ""
+
+    @staticmethod
+    def from_toml(config_file: Union[str, None] = None) -> "LocationMatcherConfig":
+        """
+        Load the configuration from a TOML file. Leave the config_file parameter
+        empty to load the configuration from the default location: config/ai.toml.
+
+        #### Parameters:
+
+        config_file: Union[str, None] (default: None)
+            The path to the TOML file to load the configuration from.
+
+        #### Returns: LocationMatcherConfig
+            The configuration object for the location matcher.
+
+        #### Raises: None
+        """
+        config = toml.load(config_file or CONFIG_PATH)
+        return LocationMatcherConfig(**config.get("LocationMatcherConfig", {}))
+
+
+class LocationMatcher:
+    """
+    Finds known locations in text using a gazetteer of place names, compiled into a
+    token trie, or into an `EntityStore` for very large lists of locations. Matching
+    ignores case and punctuation, and finds names of several words. A location
+    written as "place, region" can also be found by the place alone, e.g.
+    "tokyo, japan" by "tokyo".
+
+    #### Parameters:
+
+    config: LocationMatcherConfig (default: LocationMatcherConfig())
+        The configuration object for the location matcher.
+
+    locations: Union[list[str], None] (default: None)
+        The locations to compile. Leave empty to load them from the locations and
+        gazetteer files in the configuration.
+
+    #### Methods:
+
+    match(text: str) -> Union[str, None]
+        Find the first known location in the given text.
+
+    stats() -> dict[str, Union[int, float]]
+        The number of texts that did and did not contain a known location.
+    """
+
+    def __init__(
+        self,
+        config: LocationMatcherConfig = LocationMatcherConfig(),
+        locations: Union[list[str], None] = None,
+    ) -> None:
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self._stored: Union[data.EntityValues, None] = None
+
+        with logger.log_context(
+            "info", "Compiling location gazetteer", "Finished compiling gazetteer"
+        ):
+            if locations is None and self.config.entity_store_directory:
+                # Only the small gazetteer file is loaded into the trie
+                locations_file = Path(self.config.locations_file)
+                self._stored = data.EntityStore.build(
+                    str(locations_file.parent), self.config.entity_store_directory
+                ).get(locations_file.stem)
+                locations = self._load_locations(self.config.gazetteer_file)
+
+            self._root = self._compile(
+                locations
+                if locations is not None
+                else self._load_locations(
+                    self.config.locations_file, self.config.gazetteer_file
+                )
+            )
+
+    def match(self, text: str) -> Union[str, None]:
+        """
+        Find the first known location in the given text. Where several locations
+        start at the same word, the longest is used.
+
+        #### Parameters:
+
+        text: str
+            The text to search.
+
+        #### Returns: Union[str, None]
+            The location as it is written in the text, or None if no known location
+            is in the text.
+
+        #### Raises: None
+        """
+        tokens = list(TOKEN_PATTERN.finditer(text)) if text else []
+        words = [token.group().lower() for token in tokens]
+
+        for start, first in enumerate(tokens):
+            last = None
+            node = self._root
+            for position in range(start, len(words)):
+                if (node := node.children.get(words[position])) is None:  # type: ignore
+                    break
+                if node.values:
+                    last = position
+
+            # The stored locations end in order, so the last is the longest
+            if self._stored is not None:
+                for end in self._stored.match(words, start, short=True):
+                    if last is None or end - 1 > last:
+                        last = end - 1
+
+            if last is not None:
+                self.hits += 1
+                location = text[first.start() : tokens[last].end()]
+                logger.log("debug", f"Matched location: {location}")
+                return location
+
+        self.misses += 1
+        return None
+
+    def stats(self) -> dict[str, Union[int, float]]:
+        """
+        The number of texts that did and did not contain a known location.
+
+        #### Parameters: None
+
+        #### Returns: dict[str, Union[int, float]]
+            The hit and miss counters and the hit rate of the matcher.
+
+        #### Raises: None
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _load_locations(self, *files: str) -> list[str]:
+        """
+        Helper function to read the locations from the given files, skipping the
+        files that do not exist.
+
+        #### Parameters:
+
+        *files: str
+            The paths of the files to read.
+
+        #### Returns: list[str]
+            The locations.
+
+        #### Raises: None
+        """
+        locations = []
+        for path in map(Path, files):
+            if not path.is_file():
+                logger.log("debug", f"Skipping missing gazetteer: {path}")
+                continue
+
+            locations.extend(
+                line.strip()
+                for line in path.read_text(encoding="utf-8").splitlines()
+                if line.strip() and not line.lstrip().startswith("#")
+            )
+        return locations
+
+    def _compile(self, locations: list[str]) -> _Node:
+        """
+        Helper function to compile the locations into a token trie, adding the
+        place before the first comma of each location as another name for it.
+
+        #### Parameters:
+
+        locations: list[str]
+            The locations to compile.
+
+        #### Returns: _Node
+            The root of the trie.
+
+        #### Raises: None
+        """
+        root = _Node()
+        for location in locations:
+            for name in {location, location.split(",", 1)[0]}:
+                if tokens := TOKEN_PATTERN.findall(name.lower()):
+                    root.add(tokens).values.add(location)
+        return root
@@ -0,0 +1,255 @@
+"""
+Train and compare variants of the intent classifier. A grid of overrides for the
+`IntentClassifierModelConfig` and the spaCy base config is expanded into variants,
+which are trained in a pool of processes. Each variant is then evaluated on its
+validation data, so they can be compared by their accuracy, size, load time and
+latency.
+
+#### Classes: None
+
+#### Functions:
+
+load_grid(grid_file: Union[str, None] = None) -> list[dict[str, dict[str, Any]]]
+    Load a grid of overrides from a TOML file and expand it into variants.
+
+run_sweep(
+    variants: list[dict[str, dict[str, Any]]],
+    output_dir: str = "models/sweep",
+    processes: int = 2,
+) -> list[dict[str, Any]]
+    Train and evaluate every variant in a pool of processes.
+"""
+
+import dataclasses
+import itertools
+import json
+import multiprocessing
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Union
+
+import spacy
+import toml
+from spacy.cli.init_config import fill_config
+
+from ace.ai.models import IntentClassifierModel, IntentClassifierModelConfig
+from ace.prefork import FORK_SUPPORTED
+from ace.utils import Logger
+
+GRID_PATH = "config/sweep.toml"
+
+logger = Logger.from_toml(config_file_name="logs.toml", log_name="models")
+
+
+def load_grid(grid_file: Union[str, None] = None) -> list[dict[str, dict[str, Any]]]:
+    """
+    Load a grid of overrides from a TOML file and expand it into every combination.
+    The `model` table overrides fields of the `IntentClassifierModelConfig`, and the
+    `spacy` table overrides settings of the spaCy base config by their dotted path.
+    Each setting can be a single value or a list of values to try. Leave the
+    grid_file parameter empty to load the grid from the default location:
+    config/sweep.toml.
+
+    #### Parameters:
+
+    grid_file: Union[str, None] (default: None)
+        The path to the TOML file to load the grid from.
+
+    #### Returns: list[dict[str, dict[str, Any]]]
+        The variants, each holding the `model` and `spacy` overrides to use.
+
+    #### Raises: ValueError
+        If the grid overrides a field the `IntentClassifierModelConfig` does not have.
+    """
+    grid = toml.load(grid_file or GRID_PATH)
+    fields = {field.name for field in dataclasses.fields(IntentClassifierModelConfig)}
+
+    if unknown := set(grid.get("model", {})) - fields:
+        logger.log("error", f"Unknown intent classifier settings: {sorted(unknown)}")
+        raise ValueError(f"Unknown intent classifier settings: {sorted(unknown)}")
+
+    settings = [
+        (section, name, values if isinstance(values, list) else [values])
+        for section in ("model", "spacy")
+        for name, values in grid.get(section, {}).items()
+    ]
+
+    variants = []
+    for combination in itertools.product(*[values for *_, values in settings]):
+        variant: dict[str, dict[str, Any]] = {"model": {}, "spacy": {}}
+        for (section, name, _), value in zip(settings, combination):
+            variant[section][name] = value
+        variants.append(variant)
+
+    logger.log("info", f"Expanded the grid into {len(variants)} variants")
+    return variants
+
+
+def run_sweep(
+    variants: list[dict[str, dict[str, Any]]],
+    output_dir: str = "models/sweep",
+    processes: int = 2,
+) -> list[dict[str, Any]]:
+    """
+    Train and evaluate every variant in a pool of processes. Each variant is trained
+    in its own directory, then loaded and evaluated one example at a time on its
+    validation data. A variant that fails is reported with its error, without
+    stopping the others. The results are also saved to `sweep.json` in the output
+    directory.
+
+    #### Parameters:
+
+    variants: list[dict[str, dict[str, Any]]]
+        The variants to train, as returned by `load_grid`.
+
+    output_dir: str (default: "models/sweep")
+        The directory to train the variants in.
+
+    processes: int (default: 2)
+        The most variants to train at the same time.
+
+    #### Returns: list[dict[str, Any]]
+        The results of each variant, in the same order as the variants: the
+        accuracy, the size of the model in bytes, the time to load it in seconds,
+        the p50/p95/p99 latency of a single prediction in milliseconds, and whether
+        no other variant is both at least as accurate and faster.
+
+    #### Raises: None
+    """
+    root_dir = Path(output_dir)
+    root_dir.mkdir(parents=True, exist_ok=True)
+
+    results: list[dict[str, Any]] = [{} for _ in variants]
+
+    # Fork the workers where possible, so they do not import everything again
+    with ProcessPoolExecutor(
+        max_workers=max(processes, 1),
+        mp_context=multiprocessing.get_context("fork" if FORK_SUPPORTED else "spawn"),
+    ) as executor:
+        futures = {
+            executor.submit(
+                _run_variant, variant, str(root_dir / f"variant-{index:03d}")
+            ): index
+            for index, variant in enumerate(variants)
+        }
+
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as error:
+                logger.log("error", f"Variant {index} failed: {error}")
+                results[index] = {**variants[index], "error": str(error)}
+
+            results[index]["name"] = f"variant-{index:03d}"
+            logger.log("info", f"Finished variant {index}: {results[index]}")
+
+    _mark_pareto(results)
+
+    (root_dir / "sweep.json").write_text(
+        json.dumps(results, indent=4), encoding="utf-8"
+    )
+    logger.log("info", f"Saved the sweep results to: {root_dir / 'sweep.json'}")
+
+    return results
+
+
+def _run_variant(variant: dict[str, dict[str, Any]], directory: str) -> dict[str, Any]:
+    """
+    Helper function to train and evaluate a single variant in a worker process.
+
+    #### Parameters:
+
+    variant: dict[str, dict[str, Any]]
+        The `model` and `spacy` overrides of the variant.
+
+    directory: str
+        The directory to train the variant in.
+
+    #### Returns: dict[str, Any]
+        The results of the variant.
+
+    #### Raises: None
+    """
+    variant_dir = Path(directory)
+    variant_dir.mkdir(parents=True, exist_ok=True)
+
+    config = dataclasses.replace(
+        IntentClassifierModelConfig.from_toml(), **variant["model"]
+    )
+
+    # Fill the base config and apply the spaCy overrides, for this variant only
+    base_config = variant_dir / "base_config.cfg"
+    full_config = variant_dir / "config.cfg"
+    shutil.copyfile(config.base_config, base_config)
+    fill_config(full_config, base_config, silent=True)
+    spacy.util.load_config(
+        full_config, overrides=variant["spacy"], interpolate=False
+    ).to_disk(full_config)
+
+    config = dataclasses.replace(
+        config,
+        mode="train",
+        runtime="spacy",
+        cache_size=0,
+        rebuild_data=True,
+        rebuild_config=False,
+        base_config=str(base_config),
+        output_dir=str(variant_dir),
+        best_model_location=str(variant_dir / "model-best"),
+        train_data_save_path=str(variant_dir / "train.spacy"),
+        valid_data_save_path=str(variant_dir / "dev.spacy"),
+        data_cache_dir=str(variant_dir / "cache"),
+    )
+    summary = IntentClassifierModel(config).train()
+
+    start = time.perf_counter()
+    model = IntentClassifierModel(dataclasses.replace(config, mode="test"))
+    load_seconds = time.perf_counter() - start
+
+    evaluation = model.evaluate(batch_size=1)
+
+    return {
+        **variant,
+        "accuracy": evaluation["accuracy"],
+        "model_bytes": sum(
+            path.stat().st_size
+            for path in Path(config.best_model_location).rglob("*")
+            if path.is_file()
+        ),
+        "load_seconds": load_seconds,
+        "latency_ms": evaluation["latency_ms"],
+        "docs_per_second": evaluation["docs_per_second"],
+        "train_seconds": summary.seconds,
+        "best_score": summary.best_score,
+    }
+
+
+def _mark_pareto(results: list[dict[str, Any]]) -> None:
+    """
+    Helper function to mark the variants that no other variant beats on both
+    accuracy and median latency, so the trade-off between them can be chosen.
+
+    #### Parameters:
+
+    results: list[dict[str, Any]]
+        The results of each variant. Failed variants are never marked.
+
+    #### Returns: None
+
+    #### Raises: None
+    """
+    finished = [result for result in results if "error" not in result]
+
+    for result in results:
+        result["pareto"] = "error" not in result and not any(
+            other["accuracy"] >= result["accuracy"]
+            and other["latency_ms"]["p50"] <= result["latency_ms"]["p50"]
+            and (
+                other["accuracy"] > result["accuracy"]
+                or other["latency_ms"]["p50"] < result["latency_ms"]["p50"]
+            )
+            for other in finished
+        )
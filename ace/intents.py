@@ -13,10 +13,11 @@ run_intent(intent_name: str, *args, **kwargs) -> tuple[str, bool]:
 import os
 import platform
 from collections import namedtuple
-from typing import Callable
+from typing import Callable, Union
 
 import ace.application as app
-from ace.ai.models import NERModel, NERModelConfig
+from ace.ai.models import LazyModel, NERModel, NERModelConfig
+from ace.ai.rules import LocationMatcher, LocationMatcherConfig
 from ace.apis import TodoAPI, WeatherAPI
 from ace.utils import TextProcessor, Logger
 
@@ -38,8 +39,16 @@ logger = Logger.from_toml(config_file_name="logs.toml", log_name="intents")
 app_factory = app.AppManagerFactory()
 weather_api = WeatherAPI()
 todo_api = TodoAPI()
-ner_model = NERModel(NERModelConfig.from_toml())
+# Only loaded when an intent first needs entities, or when preloaded
+ner_model = LazyModel(lambda: NERModel(NERModelConfig.from_toml()), name="NER model")
 text_processor = TextProcessor()
+# Known locations are found without the NER model
+location_matcher_config = LocationMatcherConfig.from_toml()
+location_matcher = (
+    LocationMatcher(location_matcher_config)
+    if location_matcher_config.enabled
+    else None
+)
 
 Intent = namedtuple("Intent", ["func", "should_exit", "requires_text"])
 intent_funcs: dict[str, Intent] = {}
@@ -232,6 +241,35 @@ def close_app(text: str) -> str:
         return f"Sorry, I am having trouble closing '{app_name}'."
 
 
+def _find_location(text: str) -> Union[str, None]:
+    """
+    Finds the location in the text, trying the known locations before the NER
+    model. If there is no location in the text, the `ACE_LOCATION` environment
+    variable is used.
+
+    #### Parameters:
+
+    text: str
+        The text to parse for the location.
+
+    #### Returns: Union[str, None]
+        The location, or None if there is no location in the text and
+        `ACE_LOCATION` is not set.
+
+    #### Raises: None
+    """
+    if location_matcher and (location := location_matcher.match(text)):
+        return location
+
+    entities = ner_model.model.predict(text)
+    logger.log("debug", f"Got entities: {entities}")
+
+    return next(
+        (entity[0] for entity in entities if entity[1] == "GPE"),
+        os.environ.get("ACE_LOCATION", None),
+    )
+
+
 @_register(requires_text=True)
 def current_weather(text: str) -> str:
     """
@@ -248,13 +286,7 @@ def current_weather(text: str) -> str:
 
     #### Raises: None
     """
-    entities = ner_model.predict(text)
-    logger.log("debug", f"Got entities: {entities}")
-
-    location = next(
-        (entity[0] for entity in entities if entity[1] == "GPE"),
-        os.environ.get("ACE_LOCATION", None),
-    )
+    location = _find_location(text)
 
     if response := weather_api.get_current_weather(location):  # type: ignore
 
@@ -294,13 +326,7 @@ def tomorrow_weather(text: str) -> str:
 
     #### Raises: None
     """
-    entities = ner_model.predict(text)
-    logger.log("debug", f"Got entities: {entities}")
-
-    location = next(
-        (entity[0] for entity in entities if entity[1] == "GPE"),
-        os.environ.get("ACE_LOCATION", None),
-    )
+    location = _find_location(text)
 
     if response := weather_api.get_tomorrow_weather(location):  # type: ignore
 
@@ -1,8 +1,10 @@
 import pandas as pd
 import json
 import os
+import signal
 import tkinter as tk
 from abc import ABC, abstractmethod
+from pathlib import Path
 from typing import Union
 
 import customtkinter as ctk
@@ -11,9 +13,15 @@ from colorama import Fore
 from colorama import init as colorama_init
 
 from ace import __version__
-from ace.ai.models import IntentClassifierModel, IntentClassifierModelConfig
+from ace.ai.models import (
+    IntentClassifierModel,
+    IntentClassifierModelConfig,
+    ModelHolder,
+    NERModelConfig,
+)
+from ace.ai.rules import TemplateMatcher, TemplateMatcherConfig
 from ace.inputs import CommandLineInput, Input
-from ace.intents import run_intent
+from ace.intents import ner_model, run_intent
 from ace.outputs import CommandLineOutput, Output, SpeechOutput
 from ace.utils import Logger
 
@@ -45,6 +53,12 @@ class Interface(ABC):  # pragma: no cover
     intent_classifier (IntentClassifierModel):
         The intent classifier model.
 
+    model_holder (ModelHolder):
+        Holds the intent classifier model, and loads a new one when it changes.
+
+    template_matcher (Union[TemplateMatcher, None]):
+        The matcher used to find intents from the templates before using the model.
+
     show_header (bool):
         Whether to show the start information to the user.
 
@@ -76,19 +90,39 @@ class Interface(ABC):  # pragma: no cover
 
     get_intent():
         Method to get the text from the user and determine the intent.
+
+    predict_intent(text):
+        Determine the intent of the text, using the templates before the model.
+
+    reload_model():
+        Load the saved intent classifier model again in the background.
+
+    rollback_model():
+        Go back to the intent classifier model used before the last reload.
     """
 
     def __init__(self, show_header: bool, header: str = "") -> None:
         self._config = toml.load("config/main.toml")["interfaces"].get(
             self.__class__.__name__.lower(), {}
         )
-        self._intent_classifier = self._create_intent_classifier()
+        self._model_holder = self._create_model_holder()
+        self._template_matcher = self._create_template_matcher()
         self._show_header = show_header
         self._header = header
         self._input = self.create_input()
         self._outputs = self.create_outputs()
         self._header_outputs = self.create_header_outputs()
 
+        # The intent classifier can only share the vocab of the NER model once it
+        # has loaded, so load the classifier again into it then, even if another
+        # load is already running
+        if self.intent_classifier.config.analyse_with_ner and not ner_model.loaded:
+            ner_model.on_load(lambda model: self.model_holder.reload(queue=True))
+
+        # Load the NER model in the background, so the first weather turn is fast
+        if NERModelConfig.from_toml().preload:
+            ner_model.preload()
+
     @property
     def config(self) -> dict:
         """
@@ -107,7 +141,27 @@ class Interface(ABC):  # pragma: no cover
         ### Returns: IntentClassifierModel
             The intent classifier model.
         """
-        return self._intent_classifier
+        return self._model_holder.model
+
+    @property
+    def model_holder(self) -> ModelHolder:
+        """
+        Holds the intent classifier model, and loads a new one when it changes.
+
+        ### Returns: ModelHolder
+            The model holder.
+        """
+        return self._model_holder
+
+    @property
+    def template_matcher(self) -> Union[TemplateMatcher, None]:
+        """
+        The matcher used to find intents from the templates before using the model.
+
+        ### Returns: Union[TemplateMatcher, None]
+            The template matcher, or None if it is disabled.
+        """
+        return self._template_matcher
 
     @property
     def show_header(self) -> bool:
@@ -267,6 +321,81 @@ class Interface(ABC):  # pragma: no cover
         """
         raise NotImplementedError
 
+    def predict_intent(self, text: str) -> str:
+        """
+        Determine the intent of the text. Text that exactly matches one of the
+        intent templates skips the intent classifier model. With `analyse_with_ner`
+        set, once the named entity recognition model has loaded and the intent
+        classifier has been loaded into its vocab, the text is tokenised by it and
+        the intent classifier uses that doc, which the intents then reuse. Until
+        then, the intent classifier never waits for it to load.
+
+        ### Parameters:
+
+        text (str):
+            The text from the user.
+
+        ### Returns: str
+            The predicted intent.
+        """
+        # Only swap in a newly loaded model between turns
+        self.model_holder.swap()
+
+        if self.template_matcher and (intent := self.template_matcher.match(text)):
+            logger.log(
+                "debug", f"Template matcher stats: {self.template_matcher.stats()}"
+            )
+            return intent
+
+        if (
+            self.intent_classifier.config.analyse_with_ner
+            and ner_model.loaded
+            and self.intent_classifier.vocab is ner_model.model.nlp.vocab
+        ):
+            return self.intent_classifier.predict_doc(
+                ner_model.model.analyse(text, entities=False)
+            )
+
+        return self.intent_classifier.predict(text)
+
+    def reload_model(self) -> bool:
+        """
+        Load the saved intent classifier model again in the background. It is used
+        from the next turn once it has loaded.
+
+        ### Returns: bool
+            Whether or not a new load was started.
+        """
+        logger.log("info", "Reloading the intent classifier model.")
+        return self.model_holder.reload()
+
+    def rollback_model(self) -> bool:
+        """
+        Go back to the intent classifier model used before the last reload.
+
+        ### Returns: bool
+            Whether or not there was a previous model to go back to.
+        """
+        return self.model_holder.rollback()
+
+    def _create_model_holder(self) -> ModelHolder:
+        """
+        Helper method to create the holder of the intent classifier model, which
+        watches the saved model for changes.
+
+        ### Returns: ModelHolder
+            The model holder.
+        """
+        config = IntentClassifierModelConfig.from_toml()
+        watch_path = (
+            Path(config.lite_model_location)
+            if config.runtime.lower() == "lite"
+            else Path(config.best_model_location)
+        )
+        return ModelHolder(
+            self._create_intent_classifier, watch_path, config.watch_interval
+        )
+
     def _create_intent_classifier(self) -> IntentClassifierModel:
         """
         Helper method to create an intent classifier model.
@@ -281,7 +410,30 @@ class Interface(ABC):  # pragma: no cover
             "Finished loading intent classifier model.",
         ):
             config = IntentClassifierModelConfig.from_toml()
-            return IntentClassifierModel(config=config)
+            return IntentClassifierModel(
+                config=config,
+                vocab=(
+                    ner_model.model.nlp.vocab
+                    if config.analyse_with_ner and ner_model.loaded
+                    else None
+                ),
+            )
+
+    def _create_template_matcher(self) -> Union[TemplateMatcher, None]:
+        """
+        Helper method to create the template matcher, if it is enabled.
+
+        ### Returns: Union[TemplateMatcher, None]
+            The template matcher, or None if it is disabled.
+        """
+        config = TemplateMatcherConfig.from_toml()
+        if not config.enabled:
+            return None
+
+        with logger.log_context(
+            "info", "Loading template matcher.", "Finished loading template matcher."
+        ):
+            return TemplateMatcher(config=config)
 
 
 class CLI(Interface):
@@ -412,6 +564,10 @@ class CLI(Interface):
         """
         self.display_header()
 
+        # Reload the model when sent SIGHUP, e.g. `kill -HUP <pid>`
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self.reload_model())
+
         while True:
             output = run_intent(*self.get_intent())
 
@@ -458,7 +614,7 @@ class CLI(Interface):
         text = self.input.get()
         logger.log("info", f"Received input: {text}")
 
-        intent = self.intent_classifier.predict(text)
+        intent = self.predict_intent(text)
         logger.log("info", f"Predicted intent: {intent}")
 
         return intent, text
@@ -699,7 +855,7 @@ class GUI(Interface):
         """
         logger.log("info", f"Received input: {text}")
 
-        intent = self.intent_classifier.predict(text)
+        intent = self.predict_intent(text)
         logger.log("info", f"Predicted intent: {intent}")
 
         return intent, text
@@ -748,9 +904,10 @@ class GUI(Interface):
         # Create the menu bar object
         menu_bar = tk.Menu(self.root)
 
-        # Need a menu with File and Help
+        # Need a menu with File, Model and Help
         file_menu = tk.Menu(menu_bar, tearoff=0)
         save_menu = tk.Menu(file_menu, tearoff=0)
+        model_menu = tk.Menu(menu_bar, tearoff=0)
         help_menu = tk.Menu(menu_bar, tearoff=0)
 
         # Add the options to the menu
@@ -762,10 +919,14 @@ class GUI(Interface):
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self._close)
 
+        model_menu.add_command(label="Reload", command=self._reload)
+        model_menu.add_command(label="Roll back", command=self._rollback)
+
         help_menu.add_command(label="About", command=self._about)
 
         # Add the menus to the menu bar
         menu_bar.add_cascade(label="File", menu=file_menu)
+        menu_bar.add_cascade(label="Model", menu=model_menu)
         menu_bar.add_cascade(label="Help", menu=help_menu)
 
         # Add the menu bar to the root
@@ -908,6 +1069,38 @@ class GUI(Interface):
             self.chat_box.insert(tk.END, "Exiting...")
         self.root.after(1000, self.root.destroy)
 
+    def _reload(self) -> None:  # pragma: no cover
+        """
+        Helper method to reload the intent classifier model from the menu.
+
+        ### Parameters: None
+
+        ### Returns: None
+
+        ### Raises: None
+        """
+        if self.reload_model():
+            self._broadcast_ace_message(
+                "Loading the new model, I will use it once it has loaded."
+            )
+        else:
+            self._broadcast_ace_message("A new model is already being loaded.")
+
+    def _rollback(self) -> None:  # pragma: no cover
+        """
+        Helper method to go back to the previous intent classifier model from the menu.
+
+        ### Parameters: None
+
+        ### Returns: None
+
+        ### Raises: None
+        """
+        if self.rollback_model():
+            self._broadcast_ace_message("Gone back to the previous model.")
+        else:
+            self._broadcast_ace_message("There is no previous model to go back to.")
+
     def _about(self) -> None:  # pragma: no cover
         """
         Helper method to show the about information.
@@ -0,0 +1,282 @@
+"""
+Worker processes that are forked from a parent that has already loaded the models,
+so every worker shares the read-only model memory with the parent copy-on-write.
+The garbage collector is frozen before forking, so collections in the workers do
+not write to (and so copy) the shared objects.
+
+Forking is only available on Unix. Elsewhere the pool runs in the calling process.
+
+#### Classes:
+
+PreforkPool:
+    A pool of forked worker processes that run a function on batches of items.
+
+#### Functions:
+
+fork_workers(target: Callable[[], None], processes: int) -> list[int]
+    Fork worker processes that each run the target function.
+
+memory_usage(pid: Union[int, None] = None) -> dict[str, int]
+    Get the resident, proportional and unique memory of a process.
+"""
+
+import gc
+import multiprocessing
+import os
+import signal
+from typing import Any, Callable, Sequence, Union
+
+from ace.utils import Logger
+
+FORK_SUPPORTED = hasattr(os, "fork")
+
+logger = Logger.from_toml(config_file_name="logs.toml", log_name="main")
+
+# The function run by the pool workers, inherited from the parent when forked
+_worker_function: Union[Callable[[Any], Any], None] = None
+
+
+def fork_workers(target: Callable[[], None], processes: int) -> list[int]:
+    """
+    Fork worker processes that each run the target function, then exit. The
+    garbage collector is frozen while forking, so the workers share the objects
+    that were already loaded in the parent. The workers do not inherit the parent's
+    SIGTERM handler, so SIGTERM stops them.
+
+    #### Parameters:
+
+    target: Callable[[], None]
+        The function each worker runs.
+
+    processes: int
+        The number of workers to fork.
+
+    #### Returns: list[int]
+        The process IDs of the workers.
+
+    #### Raises: OSError
+        If processes cannot be forked on this platform.
+    """
+    if not FORK_SUPPORTED:
+        raise OSError("Forking worker processes is only supported on Unix.")
+
+    pids = []
+    _freeze()
+    try:
+        for _ in range(processes):
+            if (pid := os.fork()) == 0:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                exit_code = 0
+                try:
+                    target()
+                except KeyboardInterrupt:
+                    pass
+                except BaseException as error:
+                    logger.log("error", f"Worker {os.getpid()} failed: {error}")
+                    exit_code = 1
+                finally:
+                    os._exit(exit_code)
+            pids.append(pid)
+    finally:
+        gc.unfreeze()
+
+    logger.log("info", f"Forked {len(pids)} workers: {pids}")
+    return pids
+
+
+def memory_usage(pid: Union[int, None] = None) -> dict[str, int]:
+    """
+    Get the resident, proportional and unique memory of a process, using
+    `/proc/<pid>/smaps_rollup`. The unique set size (USS) is the memory only this
+    process uses, so it is what each extra worker costs.
+
+    #### Parameters:
+
+    pid: Union[int, None] (default: None)
+        The process ID. Leave empty to use the current process.
+
+    #### Returns: dict[str, int]
+        The "rss", "pss", "uss" and "shared" memory in bytes, or an empty
+        dictionary if it is not available on this platform.
+
+    #### Raises: None
+    """
+    fields: dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup", encoding="utf-8") as file:
+            for line in file:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        return {}
+
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+class PreforkPool:
+    """
+    A pool of forked worker processes that run a function on batches of items.
+    The workers are forked when the pool is created, so the function (and any
+    models it uses) is inherited rather than pickled, and shared copy-on-write.
+    Only the batches and their results are sent between processes.
+
+    #### Parameters:
+
+    function: Callable[[list[Any]], list[Any]]
+        The function that processes a batch of items, returning one result per
+        item in the same order.
+
+    processes: int (default: 2)
+        The number of worker processes. With fewer than 2, or where forking is not
+        supported, the batches are processed in the calling process.
+
+    #### Methods:
+
+    map(items: Sequence[Any], batch_size: int = 128) -> list[Any]
+        Process the items in batches across the workers.
+
+    worker_memory() -> dict[int, dict[str, int]]
+        Get the memory usage of each worker.
+
+    close() -> None
+        Stop the workers.
+    """
+
+    def __init__(
+        self, function: Callable[[list[Any]], list[Any]], processes: int = 2
+    ) -> None:
+        self.function = function
+        self.processes = processes
+        self._pool = None
+
+        if FORK_SUPPORTED and processes > 1:
+            _freeze()
+            try:
+                self._pool = multiprocessing.get_context("fork").Pool(
+                    processes, initializer=_init_worker, initargs=(function,)
+                )
+            finally:
+                gc.unfreeze()
+
+    def __enter__(self) -> "PreforkPool":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def map(self, items: Sequence[Any], batch_size: int = 128) -> list[Any]:
+        """
+        Process the items in batches across the workers.
+
+        #### Parameters:
+
+        items: Sequence[Any]
+            The items to process.
+
+        batch_size: int (default: 128)
+            The number of items sent to a worker at a time.
+
+        #### Returns: list[Any]
+            The results, in the same order as the items.
+
+        #### Raises: None
+        """
+        batch_size = max(batch_size, 1)
+        batches = [
+            list(items[start : start + batch_size])
+            for start in range(0, len(items), batch_size)
+        ]
+        results = (
+            self._pool.map(_run_batch, batches)
+            if self._pool is not None
+            else [self.function(batch) for batch in batches]
+        )
+        return [result for batch in results for result in batch]
+
+    def worker_memory(self) -> dict[int, dict[str, int]]:
+        """
+        Get the memory usage of each worker.
+
+        #### Parameters: None
+
+        #### Returns: dict[int, dict[str, int]]
+            The memory usage of each worker, keyed by process ID.
+
+        #### Raises: None
+        """
+        if self._pool is None:
+            return {}
+        return {
+            worker.pid: memory_usage(worker.pid)
+            for worker in self._pool._pool  # type: ignore
+        }
+
+    def close(self) -> None:
+        """
+        Stop the workers.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+def _freeze() -> None:
+    """
+    Helper function to collect any garbage, then move every remaining object into
+    the permanent generation so the garbage collector leaves it alone.
+
+    #### Parameters: None
+
+    #### Returns: None
+
+    #### Raises: None
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def _init_worker(function: Callable[[Any], Any]) -> None:
+    """
+    Helper function to store the pool's function in a worker process.
+
+    #### Parameters:
+
+    function: Callable[[Any], Any]
+        The function to run on each batch.
+
+    #### Returns: None
+
+    #### Raises: None
+    """
+    global _worker_function
+    _worker_function = function
+
+
+def _run_batch(batch: list[Any]) -> list[Any]:
+    """
+    Helper function to run the pool's function on a batch in a worker process.
+
+    #### Parameters:
+
+    batch: list[Any]
+        The items to process.
+
+    #### Returns: list[Any]
+        The results for the items.
+
+    #### Raises: None
+    """
+    return _worker_function(batch)  # type: ignore
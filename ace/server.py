@@ -0,0 +1,518 @@
+"""
+A local inference server that loads the AI models once and shares them with any
+number of lightweight front ends, through JSON endpoints over HTTP on localhost or
+a Unix socket.
+
+#### Classes:
+
+ServerConfig:
+    Holds the configuration for the inference server.
+
+InferenceServer:
+    Serves intent and entity predictions from a single set of loaded models.
+
+#### Functions: None
+"""
+
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Union
+
+import toml
+
+from ace.prefork import FORK_SUPPORTED, fork_workers, memory_usage
+from ace.utils import Logger
+
+CONFIG_PATH = os.path.join("config", "main.toml")
+UNIX_SOCKETS_SUPPORTED = hasattr(socketserver, "UnixStreamServer")
+
+logger = Logger.from_toml(config_file_name="logs.toml", log_name="server")
+
+
+@dataclass
+class ServerConfig:
+    """
+    Holds the configuration for the inference server.
+
+    #### Parameters:
+
+    host: str (default: "127.0.0.1")
+        The host to listen on.
+
+    port: int (default: 8080)
+        The port to listen on.
+
+    socket_path: str (default: "")
+        The path of a Unix socket to listen on instead of the host and port. Leave
+        empty to use HTTP over TCP. Unix sockets are only supported on Unix.
+
+    workers: int (default: 4)
+        The number of worker threads handling connections in each process.
+
+    processes: int (default: 0)
+        The number of worker processes to fork once the models are loaded, so they
+        share the model memory. Set to 0 to serve from a single process. Forking is
+        only supported on Unix.
+
+    memory_report_interval: float (default: 60.0)
+        How often, in seconds, to log the memory usage of each worker process. Set
+        to 0 to only log it when the workers start.
+
+    #### Methods:
+
+    from_toml(config_file: Union[str, None] = None) -> ServerConfig
+        Load the configuration from a TOML file. Leave the config_file parameter
+        empty to load the configuration from the default location: config/main.toml.
+    """
+
+    host: str = "127.0.0.1"
+    port: int = 8080
+    socket_path: str = ""
+    workers: int = 4
+    processes: int = 0
+    memory_report_interval: float = 60.0
+
+    @staticmethod
+    def from_toml(config_file: Union[str, None] = None) -> "ServerConfig":
+        """
+        Load the configuration from a TOML file. Leave the config_file parameter
+        empty to load the configuration from the default location: config/main.toml.
+
+        #### Parameters:
+
+        config_file: Union[str, None] (default: None)
+            The path to the TOML file to load the configuration from.
+
+        #### Returns: ServerConfig
+            The configuration object for the inference server.
+
+        #### Raises: None
+        """
+        config = toml.load(config_file or CONFIG_PATH)
+        return ServerConfig(**config.get("server", {}))
+
+
+class _WorkerPoolMixIn:
+    """
+    Handles each connection on a bounded pool of worker threads, instead of
+    starting a new thread for every connection.
+
+    #### Parameters: None
+
+    #### Methods: None
+    """
+
+    workers = 4
+    # Queue bursts of connections rather than refusing them while the workers are busy
+    request_queue_size = 128
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        if not hasattr(self, "_pool"):
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="ace-server"
+            )
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)  # type: ignore
+        except Exception:
+            self.handle_error(request, client_address)  # type: ignore
+        finally:
+            self.shutdown_request(request)  # type: ignore
+
+    def server_close(self) -> None:
+        super().server_close()  # type: ignore
+        if hasattr(self, "_pool"):
+            self._pool.shutdown(wait=True)
+
+
+class _HTTPServer(_WorkerPoolMixIn, HTTPServer):
+    """
+    An HTTP server listening on a host and port.
+    """
+
+
+if UNIX_SOCKETS_SUPPORTED:
+
+    class _UnixHTTPServer(_WorkerPoolMixIn, socketserver.UnixStreamServer):
+        """
+        An HTTP server listening on a Unix socket.
+        """
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    Passes each JSON request on to the inference server.
+
+    #### Parameters: None
+
+    #### Methods: None
+    """
+
+    server_version = "ACE"
+    # Send the headers and body straight away, rather than waiting to fill a packet
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._respond(HTTPStatus.BAD_REQUEST, {"error": "Invalid JSON"})
+            return
+
+        status, body = self.server.inference.handle(self.path, payload)  # type: ignore
+        self._respond(status, body)
+
+    def do_GET(self) -> None:
+        status, body = self.server.inference.handle(self.path, None)  # type: ignore
+        self._respond(status, body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Unix socket clients have no address, so log without one
+        logger.log("debug", format % args)
+
+    def _respond(self, status: HTTPStatus, body: dict) -> None:
+        # Connections are closed after each response, so idle clients cannot hold
+        # on to the workers
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+if UNIX_SOCKETS_SUPPORTED:
+
+    class _UnixRequestHandler(_RequestHandler):
+        """
+        Passes each JSON request from a Unix socket on to the inference server.
+
+        #### Parameters: None
+
+        #### Methods: None
+        """
+
+        # Unix sockets have no TCP options to set
+        disable_nagle_algorithm = False
+
+
+class InferenceServer:
+    """
+    Serves intent and entity predictions from a single set of loaded models. Each
+    endpoint takes a JSON body of the form `{"text": "..."}`:
+
+        POST /intent    -> {"intent": str}
+        POST /entities  -> {"entities": [[str, str], ...]}
+        POST /respond   -> {"intent": str, "response": str, "should_exit": bool}
+        GET  /health    -> {"status": "ok", "pid": int, "memory": dict[str, int]}
+
+    #### Parameters:
+
+    config: ServerConfig (default: ServerConfig())
+        The configuration object for the inference server.
+
+    #### Methods:
+
+    handle(path: str, payload: Union[dict, None]) -> tuple[HTTPStatus, dict]
+        Handle a request to one of the endpoints.
+
+    serve_forever() -> None
+        Listen for requests until the server is shut down.
+
+    shutdown() -> None
+        Stop listening for requests and close the socket.
+    """
+
+    def __init__(self, config: ServerConfig = ServerConfig()) -> None:
+        if config.socket_path and not UNIX_SOCKETS_SUPPORTED:
+            raise OSError("Serving on a Unix socket is only supported on Unix.")
+        self.config = config
+
+        with logger.log_context(
+            "info", "Loading models for the server", "Finished loading models"
+        ):
+            # Importing the intents is slow, so it is only done here
+            from ace import intents
+            from ace.ai.models import IntentClassifierModel, IntentClassifierModelConfig
+            from ace.ai.rules import TemplateMatcher, TemplateMatcherConfig
+
+            self.intents = intents
+            # Load the NER model before forking, so the workers share it
+            intents.ner_model.preload(wait=True)
+            classifier_config = IntentClassifierModelConfig.from_toml()
+            self.intent_classifier = IntentClassifierModel(
+                classifier_config,
+                vocab=(
+                    intents.ner_model.model.nlp.vocab
+                    if classifier_config.analyse_with_ner
+                    else None
+                ),
+            )
+            matcher_config = TemplateMatcherConfig.from_toml()
+            self.template_matcher = (
+                TemplateMatcher(matcher_config) if matcher_config.enabled else None
+            )
+
+        self._server: Union[_HTTPServer, "_UnixHTTPServer", None] = None
+        self._stopping = threading.Event()
+        self._workers: list[int] = []
+
+    @property
+    def address(self) -> str:
+        """
+        The address the server listens on.
+
+        #### Parameters: None
+
+        #### Returns: str
+            The Unix socket path, or the HTTP URL of the server.
+
+        #### Raises: None
+        """
+        if self.config.socket_path:
+            return self.config.socket_path
+        port = self._server.server_address[1] if self._server else self.config.port
+        return f"http://{self.config.host}:{port}"
+
+    def handle(self, path: str, payload: Union[dict, None]) -> tuple[HTTPStatus, dict]:
+        """
+        Handle a request to one of the endpoints.
+
+        #### Parameters:
+
+        path: str
+            The path of the endpoint.
+
+        payload: Union[dict, None]
+            The JSON body of the request, or None for a GET request.
+
+        #### Returns: tuple[HTTPStatus, dict]
+            The status and JSON body of the response.
+
+        #### Raises: None
+        """
+        endpoint = path.split("?", 1)[0].rstrip("/")
+
+        if endpoint == "/health":
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "pid": os.getpid(),
+                "memory": memory_usage(),
+            }
+
+        if endpoint not in ("/intent", "/entities", "/respond"):
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {endpoint}"}
+
+        if payload is None:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use a POST request"}
+
+        text = payload.get("text") if isinstance(payload, dict) else None
+        if not isinstance(text, str):
+            return HTTPStatus.BAD_REQUEST, {"error": "Missing 'text' string"}
+
+        try:
+            if endpoint == "/intent":
+                return HTTPStatus.OK, {"intent": self._predict_intent(text)}
+
+            if endpoint == "/entities":
+                entities = self.intents.ner_model.model.predict(text)
+                return HTTPStatus.OK, {"entities": [list(ent) for ent in entities]}
+
+            intent = self._predict_intent(text)
+            response, should_exit = self.intents.run_intent(intent, text)
+            return HTTPStatus.OK, {
+                "intent": intent,
+                "response": response,
+                "should_exit": should_exit,
+            }
+        except Exception as error:
+            logger.log("error", f"Failed to handle request to {endpoint}: {error}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)}
+
+    def serve_forever(self) -> None:
+        """
+        Listen for requests until the server is shut down. If `processes` is set,
+        the worker processes are forked here and this process waits for them.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        self._stopping.clear()
+        self._server = self._create_server()
+        logger.log(
+            "info",
+            f"Serving on {self.address} with {self.config.workers} workers",
+        )
+
+        if self.config.processes > 0 and not FORK_SUPPORTED:
+            logger.log(
+                "warning", "Worker processes need Unix, serving from one process"
+            )
+
+        try:
+            if self.config.processes > 0 and FORK_SUPPORTED:
+                self._serve_workers()
+            else:
+                self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if self.config.socket_path and os.path.exists(self.config.socket_path):
+                os.unlink(self.config.socket_path)
+
+    def shutdown(self) -> None:
+        """
+        Stop listening for requests and close the socket. Must be called from a
+        different thread to `serve_forever`.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        self._stopping.set()
+        if self._server is not None and self.config.processes <= 0:
+            self._server.shutdown()
+
+    def worker_memory(self) -> dict[int, dict[str, int]]:
+        """
+        Get the memory usage of each worker process.
+
+        #### Parameters: None
+
+        #### Returns: dict[int, dict[str, int]]
+            The "rss", "pss", "uss" and "shared" memory in bytes of each worker,
+            keyed by process ID.
+
+        #### Raises: None
+        """
+        return {pid: memory_usage(pid) for pid in self._workers}
+
+    def _serve_workers(self) -> None:
+        """
+        Helper function to fork the worker processes onto the listening socket,
+        then wait for them until the server is shut down.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        server = self._server
+        # Workers that lose the race for a connection go back to waiting for the next
+        server.socket.setblocking(False)  # type: ignore
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *args: self._stopping.set())
+
+        self._workers = fork_workers(server.serve_forever, self.config.processes)  # type: ignore
+        self._log_worker_memory()
+
+        next_report = time.monotonic() + self.config.memory_report_interval
+        try:
+            while self._workers and not self._stopping.wait(0.5):
+                # Only reap the workers, leaving any other children alone
+                for pid in list(self._workers):
+                    try:
+                        exited = os.waitpid(pid, os.WNOHANG)[0] == pid
+                    except ChildProcessError:
+                        exited = True
+                    if exited:
+                        logger.log("warning", f"Worker {pid} exited")
+                        self._workers.remove(pid)
+
+                if (
+                    self.config.memory_report_interval > 0
+                    and time.monotonic() >= next_report
+                ):
+                    self._log_worker_memory()
+                    next_report += self.config.memory_report_interval
+        finally:
+            for pid in self._workers:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                    os.waitpid(pid, 0)
+                except (ChildProcessError, ProcessLookupError):
+                    pass
+            self._workers = []
+
+    def _log_worker_memory(self) -> None:
+        """
+        Helper function to log the memory usage of each worker process.
+
+        #### Parameters: None
+
+        #### Returns: None
+
+        #### Raises: None
+        """
+        for pid, memory in self.worker_memory().items():
+            logger.log(
+                "info",
+                f"Worker {pid} memory: "
+                + ", ".join(
+                    f"{name}={size / 2**20:.1f}MiB" for name, size in memory.items()
+                ),
+            )
+
+    def _create_server(self) -> Union[_HTTPServer, "_UnixHTTPServer"]:
+        """
+        Helper function to bind the socket for the server.
+
+        #### Parameters: None
+
+        #### Returns: Union[_HTTPServer, _UnixHTTPServer]
+            The socket server.
+
+        #### Raises: None
+        """
+        if self.config.socket_path:
+            if os.path.exists(self.config.socket_path):
+                os.unlink(self.config.socket_path)
+            server: Union[_HTTPServer, "_UnixHTTPServer"] = _UnixHTTPServer(
+                self.config.socket_path, _UnixRequestHandler
+            )
+        else:
+            server = _HTTPServer((self.config.host, self.config.port), _RequestHandler)
+
+        server.workers = max(self.config.workers, 1)
+        server.inference = self  # type: ignore
+        return server
+
+    def _predict_intent(self, text: str) -> str:
+        """
+        Helper function to predict the intent of the text, trying the templates
+        before the intent classifier.
+
+        #### Parameters:
+
+        text: str
+            The text to predict the intent of.
+
+        #### Returns: str
+            The predicted intent.
+
+        #### Raises: None
+        """
+        if self.template_matcher and (intent := self.template_matcher.match(text)):
+            return intent
+        if self.intent_classifier.config.analyse_with_ner:
+            return self.intent_classifier.predict_doc(
+                self.intents.ner_model.model.analyse(text, entities=False)
+            )
+        return self.intent_classifier.predict(text)
@@ -38,6 +38,8 @@ datasets_app = typer.Typer()
 main_app.add_typer(
     datasets_app, name="datasets", help="Build and interact with datasets."
 )
+pipeline_app = typer.Typer()
+main_app.add_typer(pipeline_app, name="pipeline", help="Train and test the AI models.")
 
 
 @main_app.command()
@@ -84,7 +86,67 @@ def gui(
 
 
 @main_app.command()
+def serve(
+    host: str = typer.Option(
+        None,
+        "--host",
+        help="The host to listen on. Defaults to the host in the config.",
+        show_default=True,
+    ),
+    port: int = typer.Option(
+        None,
+        "--port",
+        "-p",
+        help="The port to listen on. Defaults to the port in the config.",
+        show_default=True,
+    ),
+    socket_path: str = typer.Option(
+        None,
+        "--socket",
+        "-s",
+        help="The path of a Unix socket to listen on instead of the host and port.",
+        show_default=True,
+    ),
+    workers: int = typer.Option(
+        None,
+        "--workers",
+        "-w",
+        help="The number of worker threads. Defaults to the workers in the config.",
+        show_default=True,
+    ),
+    processes: int = typer.Option(
+        None,
+        "--processes",
+        "-np",
+        help="The number of worker processes sharing the models. Defaults to the processes in the config.",
+        show_default=True,
+    ),
+) -> None:
+    """
+    Load the AI models once and serve intent and entity predictions as JSON.
+    """
+    from ace.server import InferenceServer, ServerConfig
+
+    config = ServerConfig.from_toml()
+    config.host = host or config.host
+    config.port = port or config.port
+    config.socket_path = socket_path or config.socket_path
+    config.workers = workers or config.workers
+    config.processes = config.processes if processes is None else processes
+
+    server = InferenceServer(config)
+    typer.echo(f"Serving on {server.address} with {config.workers} workers.")
+    logger.log("info", "Starting the ACE server.")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        typer.echo("Stopped the server.")
+
+
+@pipeline_app.callback(invoke_without_command=True)
 def pipeline(
+    ctx: typer.Context,
     no_train: bool = typer.Option(
         False,
         "--no-train",
@@ -99,10 +161,27 @@ def pipeline(
         help="Don't run testing after training.",
         show_default=True,
     ),
+    export_lite: bool = typer.Option(
+        False,
+        "--export-lite",
+        "-el",
+        help="Export the trained model for the NumPy only runtime.",
+        show_default=True,
+    ),
+    force_rebuild: bool = typer.Option(
+        False,
+        "--force-rebuild",
+        "-fr",
+        help="Rebuild the data and config even if their inputs have not changed.",
+        show_default=True,
+    ),
 ) -> None:
     """
     Train and test the AI models.
     """
+    if ctx.invoked_subcommand is not None:
+        return
+
     logger.log("info", "Starting the AI pipeline.")
     from ace.ai import models
 
@@ -133,9 +212,25 @@ def pipeline(
     if not no_train:
         typer.echo("===================== Training the model =====================")
         config.mode = "train"
+        config.force_rebuild = config.force_rebuild or force_rebuild
 
         model = models_available[model_name](config)
-        model.train()
+        summary = model.train()
+
+        typer.echo(
+            f"Best score: {summary.best_score:.4f} at step {summary.best_step} "
+            f"({summary.epochs} epochs, {summary.seconds:.1f}s)"
+        )
+        typer.echo(f"Saved the best model to '{summary.best_model_location}'")
+
+    # Export the model for the lite runtime.
+    if export_lite:
+        config.mode = "test"
+        model = models_available[model_name](config)
+
+        typer.echo("===================== Exporting the model =====================")
+        export_path = model.export_lite()
+        typer.echo(f"Exported the lite model to '{export_path}'")
 
     # Test the model.
     if not no_test:
@@ -157,6 +252,310 @@ def pipeline(
             typer.echo(f"Intent: {result}")
 
 
+@pipeline_app.command()
+def compact(
+    output: str = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="The path to export the compacted model to. Defaults to the lite_model_location in the config.",
+        show_default=True,
+    ),
+    prune_threshold: float = typer.Option(
+        0.01,
+        "--prune-threshold",
+        "-p",
+        help="Prune n-grams whose weights are all smaller than this.",
+        show_default=True,
+    ),
+    no_quantise: bool = typer.Option(
+        False,
+        "--no-quantise",
+        "-nq",
+        help="Keep the weights as float32 instead of int8.",
+        show_default=True,
+    ),
+) -> None:
+    """
+    Prune and quantise the trained intent classifier for the NumPy only runtime.
+
+    Set runtime = "lite" in the config to make predictions with the compacted model.
+    """
+    logger.log("info", "Compacting the intent classifier.")
+    from ace.ai import models
+
+    config = models.IntentClassifierModelConfig.from_toml("config/ai.toml")
+    config.mode = "test"
+    config.runtime = "spacy"
+    model = models.IntentClassifierModel(config)
+
+    typer.echo("===================== Compacting the model =====================")
+    report = model.compact(output, prune_threshold, not no_quantise)
+
+    typer.echo(f"N-grams kept: {report['kept_features']} / {report['features']}")
+    typer.echo(f"spaCy weights: {report['spacy_weights_bytes']:,} bytes")
+    typer.echo(f"Exported weights: {report['original_weights_bytes']:,} bytes")
+    typer.echo(f"Compacted weights: {report['compact_weights_bytes']:,} bytes")
+    typer.echo(f"Compacted file: {report['file_bytes']:,} bytes")
+    typer.echo(
+        f"Accuracy on {report['examples']} validation examples: "
+        f"{report['spacy_accuracy']:.2%} (spaCy), {report['compact_accuracy']:.2%} (compacted)"
+    )
+
+
+@pipeline_app.command("eval")
+def evaluate(
+    data: str = typer.Option(
+        None,
+        "--data",
+        "-d",
+        help="The .spacy or CSV file to evaluate on. Defaults to the validation data in the config.",
+        show_default=True,
+    ),
+    batch_size: int = typer.Option(
+        128,
+        "--batch-size",
+        "-b",
+        help="The number of examples to predict at a time.",
+        show_default=True,
+    ),
+    output: str = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="The JSON file to save the results to. Defaults to eval.json in the output_dir in the config.",
+        show_default=True,
+    ),
+) -> None:
+    """
+    Evaluate the accuracy and throughput of the trained intent classifier.
+    """
+    logger.log("info", "Evaluating the intent classifier.")
+    from pathlib import Path
+
+    from ace.ai import models
+
+    config = models.IntentClassifierModelConfig.from_toml("config/ai.toml")
+    config.mode = "test"
+    model = models.IntentClassifierModel(config)
+
+    output = output or str(Path(config.output_dir) / "eval.json")
+
+    typer.echo("===================== Evaluating the model =====================")
+    results = model.evaluate(data, batch_size, output)
+
+    typer.echo(f"Examples: {results['examples']}")
+    typer.echo(f"Accuracy: {results['accuracy']:.2%}")
+    typer.echo()
+    typer.echo(
+        f"{'intent':<20} {'precision':>9} {'recall':>9} {'f1':>9} {'support':>9}"
+    )
+    for intent, scores in results["intents"].items():
+        typer.echo(
+            f"{intent:<20} {scores['precision']:>9.3f} {scores['recall']:>9.3f} "
+            f"{scores['f1']:>9.3f} {scores['support']:>9}"
+        )
+    typer.echo()
+    typer.echo(f"Docs/sec: {results['docs_per_second']:,.1f}")
+    typer.echo(
+        "Batch latency (ms): "
+        + ", ".join(
+            f"{name}={value:.2f}" for name, value in results["latency_ms"].items()
+        )
+    )
+    typer.echo(f"Saved the results to '{output}'")
+
+
+@pipeline_app.command()
+def update(
+    data: str = typer.Argument(
+        ...,
+        help="A CSV file of the corrected phrases and their intents, with 'phrase' and 'intent' columns.",
+    ),
+    steps: int = typer.Option(
+        10,
+        "--steps",
+        "-s",
+        help="The number of optimizer steps to take.",
+        show_default=True,
+    ),
+    rehearsal: int = typer.Option(
+        64,
+        "--rehearsal",
+        "-r",
+        help="The number of training examples to train on with the corrections at each step.",
+        show_default=True,
+    ),
+) -> None:
+    """
+    Fold corrected phrases into the trained intent classifier without retraining it.
+    """
+    logger.log("info", "Updating the intent classifier.")
+    from pathlib import Path
+
+    from ace.ai import data as datasets, models
+
+    config = models.IntentClassifierModelConfig.from_toml("config/ai.toml")
+    config.mode = "test"
+    config.runtime = "spacy"
+    model = models.IntentClassifierModel(config)
+
+    corrections = datasets.IntentClassifierDataset(Path(data)).data
+    examples = list(
+        corrections[["phrase", "intent"]].itertuples(index=False, name=None)
+    )
+
+    typer.echo("===================== Updating the model =====================")
+    version = model.update(examples, steps, rehearsal)
+
+    correct = sum(model.predict(phrase) == intent for phrase, intent in examples)
+    typer.echo(
+        f"Corrected phrases now predicted correctly: {correct} / {len(examples)}"
+    )
+    typer.echo(f"Saved the new version to '{version}'")
+    typer.echo(f"Replaced the model at '{config.best_model_location}'")
+
+
+@pipeline_app.command()
+def distil(
+    teacher_config: str = typer.Option(
+        "config/intents/teacher_config.cfg",
+        "--teacher-config",
+        "-t",
+        help="The spaCy base config of the teacher model.",
+        show_default=True,
+    ),
+    num_examples: int = typer.Option(
+        500,
+        "--examples",
+        "-e",
+        help="The number of examples to generate for each intent for the teacher to label.",
+        show_default=True,
+    ),
+    epochs: int = typer.Option(
+        20,
+        "--epochs",
+        "-ep",
+        help="The number of times to train the student on every example.",
+        show_default=True,
+    ),
+    batch_size: int = typer.Option(
+        16,
+        "--batch-size",
+        "-b",
+        help="The number of examples in each update of the student.",
+        show_default=True,
+    ),
+    retrain_teacher: bool = typer.Option(
+        False,
+        "--retrain-teacher",
+        "-rt",
+        help="Train the teacher even if it was trained before.",
+        show_default=True,
+    ),
+) -> None:
+    """
+    Train the intent classifier to copy a slower but more accurate teacher model.
+    """
+    logger.log("info", "Distilling the intent classifier.")
+    from ace.ai import models
+
+    config = models.IntentClassifierModelConfig.from_toml("config/ai.toml")
+    config.mode = "train"
+    config.runtime = "spacy"
+    model = models.IntentClassifierModel(config)
+
+    typer.echo("===================== Distilling the model =====================")
+    report = model.distil(
+        teacher_config, num_examples, epochs, batch_size, retrain_teacher
+    )
+
+    typer.echo(f"Trained the student on {report['examples']} labelled examples")
+    typer.echo()
+    typer.echo(
+        f"  {'model':<10} {'accuracy':>8} {'size (MB)':>9} {'p50 (ms)':>8} "
+        f"{'p95 (ms)':>8}"
+    )
+    for name in ("teacher", "baseline", "student"):
+        if (result := report[name]) is None:
+            continue
+        typer.echo(
+            f"  {name:<10} {result['accuracy']:>8.2%} "
+            f"{result['model_bytes'] / 1e6:>9.2f} {result['latency_ms']['p50']:>8.2f} "
+            f"{result['latency_ms']['p95']:>8.2f}"
+        )
+    typer.echo()
+    if report["accuracy_gain"] is not None:
+        typer.echo(
+            f"Accuracy gained over the current model: {report['accuracy_gain']:+.2%}"
+        )
+    typer.echo(f"Saved the student to '{report['student']['location']}'")
+
+
+@pipeline_app.command()
+def sweep(
+    grid: str = typer.Option(
+        "config/sweep.toml",
+        "--grid",
+        "-g",
+        help="The TOML file holding the grid of overrides to try.",
+        show_default=True,
+    ),
+    output_dir: str = typer.Option(
+        "models/sweep",
+        "--output-dir",
+        "-o",
+        help="The directory to train the variants in.",
+        show_default=True,
+    ),
+    processes: int = typer.Option(
+        2,
+        "--processes",
+        "-np",
+        help="The most variants to train at the same time.",
+        show_default=True,
+    ),
+) -> None:
+    """
+    Train every variant in a grid of intent classifier settings and compare them.
+
+    Variants marked with * are not beaten on both accuracy and median latency by any
+    other variant.
+    """
+    logger.log("info", "Sweeping the intent classifier settings.")
+    from ace.ai import sweep as sweeps
+
+    variants = sweeps.load_grid(grid)
+
+    typer.echo("===================== Sweeping the models =====================")
+    typer.echo(f"Training {len(variants)} variants, {processes} at a time...")
+    results = sweeps.run_sweep(variants, output_dir, processes)
+
+    typer.echo()
+    typer.echo(
+        f"  {'variant':<12} {'accuracy':>8} {'size (MB)':>9} {'load (s)':>8} "
+        f"{'p50 (ms)':>8} {'p95 (ms)':>8}  overrides"
+    )
+    for result in results:
+        overrides = ", ".join(
+            f"{name}={value}"
+            for section in ("model", "spacy")
+            for name, value in result[section].items()
+        )
+        if "error" in result:
+            typer.echo(f"  {result['name']:<12} failed: {result['error']}")
+            continue
+
+        typer.echo(
+            f"{'*' if result['pareto'] else ' '} {result['name']:<12} "
+            f"{result['accuracy']:>8.2%} {result['model_bytes'] / 1e6:>9.2f} "
+            f"{result['load_seconds']:>8.2f} {result['latency_ms']['p50']:>8.2f} "
+            f"{result['latency_ms']['p95']:>8.2f}  {overrides}"
+        )
+    typer.echo()
+    typer.echo(f"Saved the results to '{output_dir}/sweep.json'")
+
+
 @main_app.command()
 def datasets() -> None:
     """
@@ -187,6 +586,19 @@ def intents(
         help="The directory to save the dataset to.",
         show_default=True,
     ),
+    cache_dir: str = typer.Option(
+        "data/datasets/cache",
+        "--cache-dir",
+        "-c",
+        help="The directory to cache the examples of each intent in.",
+        show_default=True,
+    ),
+    entity_store: str = typer.Option(
+        "",
+        "--entity-store",
+        help="The directory to compile the entities into, instead of loading them.",
+        show_default=True,
+    ),
 ) -> None:
     """
     Interact with the intents dataset.
@@ -200,6 +612,7 @@ def intents(
     from datetime import datetime
 
     from ace.ai.data import (
+        EntityStore,
         generate_intent_dataset,
         load_entities,
         load_intents,
@@ -212,7 +625,14 @@ def intents(
     typer.echo("============= Intents Dataset =============")
 
     dataset = generate_intent_dataset(
-        load_intents(), load_entities(), num_examples=num_examples
+        load_intents(),
+        (
+            EntityStore.build(store_directory=entity_store)
+            if entity_store
+            else load_entities()
+        ),
+        num_examples=num_examples,
+        cache_directory=cache_dir,
     )
 
     typer.echo(f"Random seed: {random.seed}")
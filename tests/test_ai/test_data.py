@@ -148,6 +148,115 @@ class TestGenerateIntentDataset:
                 raw_intents={}, raw_entities={}, num_examples=1
             )
 
+    def test_intent_dependencies(self) -> None:
+        raw_intents = {
+            "greet": ["hello {name}", "hi {name} {age}"],
+            "goodbye": ["goodbye"],
+        }
+
+        assert data.intent_dependencies(raw_intents) == {
+            "greet": {"name", "age"},
+            "goodbye": set(),
+        }
+
+    def test_generate_intent_dataset_cache(self, tmp_path) -> None:
+        raw_intents = {"greet": ["hello {name}"], "goodbye": ["goodbye {place}"]}
+        raw_entities = {"name": ["Alice", "Bob"], "place": ["London"]}
+
+        dataset = data.generate_intent_dataset(raw_intents, raw_entities, 10)
+        cached = data.generate_intent_dataset(
+            raw_intents, raw_entities, 10, cache_directory=str(tmp_path)
+        )
+
+        assert cached == dataset
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "goodbye.json",
+            "greet.json",
+        ]
+
+        # Only the intents that use a changed entity are generated again
+        goodbye_modified = (tmp_path / "goodbye.json").stat().st_mtime_ns
+        raw_entities["name"] = ["Carol"]
+        cached = data.generate_intent_dataset(
+            raw_intents, raw_entities, 10, cache_directory=str(tmp_path)
+        )
+
+        assert cached == {"greet": {"hello Carol"}, "goodbye": {"goodbye London"}}
+        assert (tmp_path / "goodbye.json").stat().st_mtime_ns == goodbye_modified
+
+
+class TestEntityStore:
+    @pytest.fixture
+    def entities_dir(self, tmp_path) -> Path:
+        entities_dir = tmp_path / "entities"
+        entities_dir.mkdir()
+        (entities_dir / "location.entity").write_text(
+            "tokyo, japan\nlondon\nnew york\nlondon\nsão paulo\n", encoding="utf-8"
+        )
+        (entities_dir / "name.entity").write_text("Bob\nAlice\n", encoding="utf-8")
+        return entities_dir
+
+    def test_build(self, entities_dir, tmp_path) -> None:
+        store = data.EntityStore.build(str(entities_dir), str(tmp_path / "store"))
+
+        assert sorted(store) == ["location", "name"]
+        assert list(store["location"]) == [
+            "london",
+            "new york",
+            "são paulo",
+            "tokyo, japan",
+        ]
+        assert store["name"][0] == "Alice"
+        assert store["name"][-1] == "Bob"
+        assert "são paulo" in store["location"]
+        assert "paris" not in store["location"]
+
+        with pytest.raises(IndexError):
+            store["name"][2]
+
+    def test_build_only_changed(self, entities_dir, tmp_path) -> None:
+        data.EntityStore.build(str(entities_dir), str(tmp_path / "store"))
+        name_modified = (tmp_path / "store" / "name").stat().st_mtime_ns
+
+        (entities_dir / "location.entity").write_text("paris\n", encoding="utf-8")
+        store = data.EntityStore.build(str(entities_dir), str(tmp_path / "store"))
+
+        assert list(store["location"]) == ["paris"]
+        assert (tmp_path / "store" / "name").stat().st_mtime_ns == name_modified
+
+        (entities_dir / "name.entity").unlink()
+        store = data.EntityStore.build(str(entities_dir), str(tmp_path / "store"))
+
+        assert list(store) == ["location"]
+        assert not (tmp_path / "store" / "name").exists()
+
+    def test_build_invalid_directory(self, tmp_path) -> None:
+        with pytest.raises(FileNotFoundError):
+            data.EntityStore.build("tests/data/rules/invalid", str(tmp_path))
+
+    def test_match(self, entities_dir, tmp_path) -> None:
+        locations = data.EntityStore.build(str(entities_dir), str(tmp_path))["location"]
+        tokens = ["weather", "in", "new", "york", "and", "tokyo", "japan"]
+
+        assert list(locations.match(tokens, 2)) == [4]
+        assert list(locations.match(tokens, 3)) == []
+        assert list(locations.match(tokens, 5)) == [7]
+        assert list(locations.match(["tokyo"], short=True)) == [1]
+        assert list(locations.match(["tokyo"])) == []
+
+    def test_generate_intent_dataset(self, entities_dir, tmp_path) -> None:
+        raw_intents = {"greet": ["hello {name}"]}
+        store = data.EntityStore.build(str(entities_dir), str(tmp_path / "store"))
+
+        dataset = data.generate_intent_dataset(
+            raw_intents, store, 10, cache_directory=str(tmp_path / "cache")
+        )
+
+        assert dataset == {"greet": {"hello Alice", "hello Bob"}}
+        assert data.generate_intent_dataset(
+            raw_intents, store, 1, cache_directory=str(tmp_path / "cache")
+        ) == {"greet": {"hello Alice"}}
+
 
 class TestSaveDataset:
     @pytest.mark.parametrize(
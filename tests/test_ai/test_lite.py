@@ -0,0 +1,109 @@
+from statistics import mean, stdev
+
+import numpy as np
+import pytest
+
+from ace.ai.lite import LiteIntentClassifierModel, confidence, tokenise
+
+
+@pytest.fixture
+def lite_model(tmp_path) -> LiteIntentClassifierModel:
+    path = tmp_path / "model-lite.npz"
+    np.savez_compressed(
+        path,
+        labels=np.array(["greeting", "goodbye", "open_app"]),
+        features=np.array(["hello", "bye", "open", "good bye"]),
+        weights=np.array(
+            [[4.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 4.0], [0.0, 3.0, 0.0]],
+            dtype=np.float32,
+        ),
+        bias=np.zeros(3, dtype=np.float32),
+        ngram_size=np.array(2),
+        activation=np.array("softmax"),
+    )
+    return LiteIntentClassifierModel(path, threshold=0.5)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("hello there!", ["hello", "there", "!"]),
+        ("what's the weather", ["what", "'s", "the", "weather"]),
+        ("don't open f.lux", ["do", "n't", "open", "f.lux"]),
+        (
+            "add milk to my to-do list",
+            ["add", "milk", "to", "my", "to", "-", "do", "list"],
+        ),
+    ],
+)
+def test_tokenise(text, expected):
+    assert tokenise(text) == expected
+
+
+def test_confidence():
+    scores = np.array([[0.7, 0.2, 0.1], [0.0, 0.0, 0.0]])
+
+    assert confidence(scores)[0] == pytest.approx(
+        stdev([0.7, 0.2, 0.1]) / mean([0.7, 0.2, 0.1])
+    )
+    assert confidence(scores)[1] == 0
+    assert confidence(scores[0]) == pytest.approx(confidence(scores)[0])
+
+
+class TestLiteIntentClassifierModel:
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("Hello", "greeting"),
+            ("good bye!", "goodbye"),
+            ("OPEN chrome", "open_app"),
+            ("something else", "unknown"),
+            ("", "unknown"),
+            (None, "unknown"),
+        ],
+    )
+    def test_predict(self, lite_model, text, expected):
+        assert lite_model.predict(text) == expected
+
+    def test_predict_batch(self, lite_model):
+        texts = ["hello", "", "bye"]
+
+        predictions = lite_model.predict_batch(texts)
+
+        assert [intent for intent, _ in predictions] == [
+            "greeting",
+            "unknown",
+            "goodbye",
+        ]
+        assert predictions[1][1] == {"greeting": 0.0, "goodbye": 0.0, "open_app": 0.0}
+        assert sum(predictions[0][1].values()) == pytest.approx(1)
+
+    def test_top_k(self, lite_model):
+        top = lite_model.top_k("hello", 2)
+
+        assert [intent for intent, _ in top] == ["greeting", "goodbye"]
+        assert lite_model.predict_scores("hello")[:2] == top
+
+    def test_quantised_weights(self, lite_model, tmp_path):
+        weights = np.array(
+            [[4.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 4.0], [0.0, 3.0, 0.0]],
+            dtype=np.float32,
+        )
+        scales = np.abs(weights).max(axis=1) / 127
+        path = tmp_path / "model-compact.npz"
+        np.savez_compressed(
+            path,
+            labels=np.array(["greeting", "goodbye", "open_app"]),
+            features=np.array(["hello", "bye", "open", "good bye"]),
+            weights=np.round(weights / scales[:, None]).astype(np.int8),
+            scales=scales.astype(np.float32),
+            bias=np.zeros(3, dtype=np.float32),
+            ngram_size=np.array(2),
+            activation=np.array("softmax"),
+        )
+
+        compacted = LiteIntentClassifierModel(path, threshold=0.5)
+        texts = ["hello", "good bye!", "open chrome", ""]
+
+        assert compacted.scores(texts) == pytest.approx(lite_model.scores(texts))
+        assert compacted._weights.dtype == np.int8
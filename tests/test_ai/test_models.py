@@ -1,11 +1,31 @@
+import asyncio
+import dataclasses
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
 import pytest
+import spacy
 
 from ace.ai.models import (
     IntentClassifierModel,
     IntentClassifierModelConfig,
+    LazyModel,
+    MicroBatcher,
+    ModelHolder,
     NERModel,
     NERModelConfig,
+    PredictionCache,
+    TrainingStep,
+    _fingerprint,
+    _load_pipeline,
+    _read_docs,
+    _training_logger,
 )
+from ace.ai import models
 
 
 class TestIntentClassifierModel:
@@ -135,6 +155,468 @@ class TestIntentClassifierModel:
     def test_predict_add_todo(self, text):
         assert self.model.predict(text) == "add_todo"
 
+    def test_components(self):
+        assert self.model.nlp.pipe_names == ["textcat"]
+
+    def test_predict_batch(self):
+        texts = ["Hello", "Goodbye", "weather tomorrow", "", None]
+
+        predictions = self.model.predict_batch(texts, batch_size=2)
+
+        assert [label for label, _ in predictions] == [
+            self.model.predict(text) for text in texts
+        ]
+        assert all(isinstance(scores, dict) for _, scores in predictions)
+
+    @pytest.mark.parametrize("text", ["Hello There!", "weather in London", ""])
+    def test_predict_doc(self, text):
+        doc = spacy.blank("en")(text)
+
+        assert self.model.predict_doc(doc) == self.model.predict(text)
+        assert set(doc.cats) == set(self.model.labels)
+
+    def test_predict_scores(self):
+        scores = self.model.predict_scores("Hello")
+
+        assert [label for label, _ in scores] == sorted(
+            self.model.labels, key=dict(scores).get, reverse=True
+        )
+        assert scores[0][0] == "greeting"
+
+    @pytest.mark.parametrize("k", [1, 3, 100])
+    def test_top_k(self, k):
+        top = self.model.top_k("Hello", k)
+
+        assert top == self.model.predict_scores("Hello")[: min(k, len(top))]
+        assert len(top) == min(k, len(self.model.labels))
+
+    def test_apredict(self):
+        texts = ["Hello", "Goodbye", "weather tomorrow", "", None]
+
+        async def predict_all():
+            return await asyncio.gather(*(self.model.apredict(text) for text in texts))
+
+        assert asyncio.run(predict_all()) == [
+            self.model.predict(text) for text in texts
+        ]
+
+    def test_evaluate(self, tmp_path):
+        data = tmp_path / "intents.csv"
+        data.write_text(
+            "phrase,intent\nHello,greeting\nGoodbye,goodbye\nOpen Google,open_app\n"
+        )
+        output = tmp_path / "eval.json"
+
+        results = self.model.evaluate(str(data), batch_size=2, output=str(output))
+
+        assert results["examples"] == 3
+        assert results["accuracy"] == 1
+        assert results["intents"]["greeting"] == {
+            "precision": 1,
+            "recall": 1,
+            "f1": 1,
+            "support": 1,
+        }
+        assert set(results["latency_ms"]) == {"p50", "p95", "p99"}
+        assert json.loads(output.read_text()) == results
+
+    def test_classification_report(self):
+        report = self.model._classification_report(
+            ["greeting", "greeting", "goodbye"], ["greeting", "goodbye", "unknown"]
+        )
+
+        assert report["greeting"]["precision"] == 1
+        assert report["greeting"]["recall"] == 0.5
+        assert report["greeting"]["f1"] == pytest.approx(2 / 3)
+        assert report["goodbye"]["f1"] == 0
+        assert report["unknown"]["support"] == 0
+
+    @pytest.mark.parametrize("shard_size,shards", [(0, 1), (2, 3), (5, 1)])
+    def test_save_docs(self, tmp_path, monkeypatch, shard_size, shards):
+        monkeypatch.setattr(self.model.config, "shard_size", shard_size)
+        texts = ["hello", "goodbye", "open paint", "close paint", "weather now"]
+        path = tmp_path / "train.spacy"
+
+        assert self.model._save_docs(map(self.model.nlp, texts), path) == shards
+        assert [doc.text for doc in _read_docs(path, self.model.nlp.vocab)] == texts
+        assert path.is_dir() == (shard_size > 0)
+
+    def test_save_docs_unsharded_over_shards(self, tmp_path, monkeypatch):
+        path = tmp_path / "train.spacy"
+        monkeypatch.setattr(self.model.config, "shard_size", 1)
+        self.model._save_docs(map(self.model.nlp, ["hello", "goodbye"]), path)
+        monkeypatch.setattr(self.model.config, "shard_size", 0)
+
+        assert self.model._save_docs(map(self.model.nlp, ["hello"]), path) == 1
+        assert path.is_file()
+        assert [doc.text for doc in _read_docs(path, self.model.nlp.vocab)] == [
+            "hello"
+        ]
+
+    def test_fingerprint_files(self, tmp_path, monkeypatch):
+        path = tmp_path / "train.spacy"
+        path.write_bytes(b"")
+        fingerprint = _fingerprint(b"phrase,intent", 0.8)
+
+        assert not self.model._is_up_to_date(fingerprint, path)
+        self.model._save_fingerprint(fingerprint, path)
+        assert self.model._is_up_to_date(fingerprint, path)
+        assert not self.model._is_up_to_date(_fingerprint(b"phrase,intent", 0.7), path)
+
+        monkeypatch.setattr(self.model.config, "force_rebuild", True)
+        assert not self.model._is_up_to_date(fingerprint, path)
+
+    def test_update(self, tmp_path):
+        best_model = tmp_path / "model-best"
+        shutil.copytree(self.model.config.best_model_location, best_model)
+        config = dataclasses.replace(
+            self.model.config,
+            best_model_location=str(best_model),
+            output_dir=str(tmp_path),
+            cache_size=8,
+        )
+        model = IntentClassifierModel(config)
+        text = "bring up the calculator app for me please"
+        model.predict(text)
+
+        version = model.update([(text, "open_app")], steps=20)
+
+        assert model.predict(text) == "open_app"
+        assert version.parent == tmp_path / "versions"
+        assert (tmp_path / "model-best.previous").is_dir()
+        assert IntentClassifierModel(config).predict(text) == "open_app"
+
+    def test_transfer_texts(self):
+        texts = self.model._transfer_texts(5)
+        held_out = {text for text, _ in self.model._labelled_examples()}
+
+        assert texts
+        assert all(text == self.model._normalise(text) for text in texts)
+        assert not held_out.intersection(texts)
+
+    def test_update_unknown_intent(self):
+        with pytest.raises(ValueError):
+            self.model.update([("hello", "not_an_intent")])
+
+    def test_invalid_runtime(self):
+        with pytest.raises(KeyError):
+            IntentClassifierModel(IntentClassifierModelConfig(runtime="onnx"))
+
+    def test_confidence_matrix(self):
+        scores = np.array([[0.7, 0.2, 0.1], [0.0, 0.0, 0.0], [0.4, 0.3, 0.3]])
+
+        confidence = self.model._confidence(scores)
+
+        assert confidence.shape == (3,)
+        assert confidence[1] == 0
+        assert confidence[0] == pytest.approx(self.model._confidence(scores[0]))
+
+
+class TestPredictionCache:
+    def test_hits_and_misses(self):
+        cache = PredictionCache(max_size=2)
+
+        assert cache.get("hello") is None
+        cache.put("hello", "greeting")
+
+        assert cache.get("hello") == "greeting"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.parametrize(
+        "eviction,expected",
+        [
+            ("lru", {"hello", "bye"}),
+            ("fifo", {"weather", "bye"}),
+        ],
+    )
+    def test_eviction(self, eviction, expected):
+        cache = PredictionCache(max_size=2, eviction=eviction)
+
+        cache.put("hello", "greeting")
+        cache.put("weather", "current_weather")
+        cache.get("hello")
+        cache.put("bye", "goodbye")
+
+        assert {key for key in expected if key in cache._cache} == expected
+        assert cache.stats()["evictions"] == 1
+
+    def test_ensure_version(self):
+        cache = PredictionCache()
+        cache.ensure_version("models/intents/model-best")
+        cache.put("hello", "greeting")
+
+        cache.ensure_version("models/intents/model-best")
+        assert len(cache) == 1
+
+        cache.ensure_version("models/intents/model-new")
+        assert len(cache) == 0
+
+    def test_invalid_eviction(self):
+        with pytest.raises(KeyError):
+            PredictionCache(eviction="random")
+
+
+class TestMicroBatcher:
+    @staticmethod
+    def run(batcher, items):
+        async def submit_all():
+            return await asyncio.gather(*(batcher.submit(item) for item in items))
+
+        return asyncio.run(submit_all())
+
+    def test_batches_concurrent_items(self):
+        batches = []
+
+        def double(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+
+        assert self.run(batcher, range(10)) == [item * 2 for item in range(10)]
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        assert batcher.stats()["items"] == 10
+
+    def test_missing_results(self):
+        batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2)
+
+        async def submit_all():
+            return await asyncio.gather(
+                batcher.submit(1), batcher.submit(2), return_exceptions=True
+            )
+
+        first, second = asyncio.run(submit_all())
+
+        assert first == 1
+        assert isinstance(second, ValueError)
+        assert not batcher._tasks
+
+    def test_flushes_after_max_wait(self):
+        batcher = MicroBatcher(lambda items: items, max_batch_size=100, max_wait_ms=1)
+
+        assert self.run(batcher, ["hello"]) == ["hello"]
+        assert batcher.stats()["batches"] == 1
+
+    def test_propagates_errors(self):
+        batcher = MicroBatcher(lambda items: [1 / 0 for _ in items])
+
+        with pytest.raises(ZeroDivisionError):
+            self.run(batcher, [1, 2])
+
+
+class TestModelHolder:
+    def test_reload_swap_and_rollback(self):
+        versions = iter(range(10))
+        holder = ModelHolder(lambda: next(versions))
+
+        assert holder.model == 0
+        assert not holder.swap()
+        assert not holder.rollback()
+
+        assert holder.reload(wait=True)
+        # The new model is only used once it is swapped in
+        assert holder.model == 0
+        assert holder.swap()
+        assert (holder.model, holder.previous) == (1, 0)
+
+        assert holder.rollback()
+        assert (holder.model, holder.previous) == (0, 1)
+
+    def test_queued_reload(self):
+        versions = iter(range(10))
+        release = threading.Event()
+
+        def factory():
+            version = next(versions)
+            if version == 1:
+                release.wait()
+            return version
+
+        holder = ModelHolder(factory)
+
+        assert holder.reload()
+        assert not holder.reload()
+        assert not holder.reload(queue=True)
+        loader = holder._loader
+        release.set()
+        loader.join()
+
+        # The queued load ran after the first, and the unqueued one was dropped
+        assert holder.swap()
+        assert holder.model == 2
+        assert not holder.loading
+
+    def test_failed_reload_keeps_model(self):
+        def factory():
+            if holder_created:
+                raise OSError("Model not found")
+            return "model"
+
+        holder_created = False
+        holder = ModelHolder(factory)
+        holder_created = True
+
+        holder.reload(wait=True)
+
+        assert not holder.swap()
+        assert holder.model == "model"
+
+    def test_watch(self, tmp_path):
+        meta = tmp_path / "meta.json"
+        meta.write_text("{}")
+        versions = iter(range(10))
+        holder = ModelHolder(lambda: next(versions), meta, poll_interval=0.01)
+
+        # Replace the file by renaming, as when a new model is saved
+        replacement = tmp_path / "replacement.json"
+        replacement.write_text("{}")
+        os.replace(replacement, meta)
+
+        deadline = time.monotonic() + 5
+        while not holder.swap() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        holder.close()
+
+        assert holder.model == 1
+
+    def test_watch_waits_for_write(self, tmp_path):
+        (tmp_path / "meta.json").write_text("{}")
+        versions = iter(range(10))
+        holder = ModelHolder(lambda: next(versions), tmp_path, poll_interval=0)
+
+        # Keep writing the model's files between checks, as spaCy does
+        weights = tmp_path / "textcat" / "model"
+        weights.parent.mkdir()
+        previous = holder._signature
+        for size in range(1, 4):
+            weights.write_bytes(b"0" * size)
+            previous = holder._poll(previous)
+            assert not holder.loading and not holder.swap()
+
+        # Once the files are the same on two checks in a row, the model is loaded
+        holder._poll(previous)
+        if (loader := holder._loader) is not None:
+            loader.join()
+
+        assert holder.swap()
+        assert holder.model == 1
+
+
+class TestLazyModel:
+    def test_loads_on_first_use(self):
+        loads = []
+        lazy = LazyModel(lambda: loads.append(1) or "model")
+
+        assert not lazy.loaded
+        assert not loads
+        assert lazy.model == "model"
+        assert lazy.model == "model"
+        assert lazy.loaded
+        assert lazy.load_seconds is not None
+        assert loads == [1]
+
+    def test_preload(self):
+        loads = []
+
+        def factory():
+            time.sleep(0.2)
+            loads.append(1)
+            return "model"
+
+        lazy = LazyModel(factory)
+
+        assert lazy.preload()
+        assert not lazy.preload()
+        # Using the model while it is preloading waits for the same load
+        assert lazy.model == "model"
+        assert not lazy.preload(wait=True)
+        assert loads == [1]
+
+    def test_preload_failure(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("Model not found")
+            return "model"
+
+        lazy = LazyModel(factory)
+
+        assert lazy.preload(wait=True)
+        assert not lazy.loaded
+        assert lazy.model == "model"
+
+    def test_on_load(self):
+        calls = []
+        lazy = LazyModel(lambda: "model")
+        lazy.on_load(calls.append)
+
+        assert not calls
+        assert lazy.preload(wait=True)
+        assert calls == ["model"]
+
+        lazy.on_load(calls.append)
+        assert calls == ["model", "model"]
+
+
+def test_training_logger(monkeypatch):
+    steps = []
+    monkeypatch.setattr(models, "_training_callback", steps.append)
+    log_step, finalize = _training_logger()(None, None, None)
+
+    for step, words in [(100, 1000), (200, 3000)]:
+        log_step(
+            {
+                "epoch": 1,
+                "step": step,
+                "score": 0.5,
+                "other_scores": {"cats_macro_f": 0.5},
+                "losses": {"textcat": 1.5},
+                "words": words,
+                "seconds": step // 100,
+            }
+        )
+    log_step(None)
+    finalize()
+
+    assert steps[-1] == TrainingStep(
+        epoch=1,
+        step=200,
+        score=0.5,
+        losses={"textcat": 1.5},
+        other_scores={"cats_macro_f": 0.5},
+        words_per_second=2000.0,
+        seconds=2.0,
+    )
+    assert len(steps) == 2
+
+
+def test_fingerprint():
+    assert _fingerprint(b"data", 0.8, 42) == _fingerprint(b"data", 0.8, 42)
+    assert _fingerprint(b"data", 0.8) != _fingerprint(0.8, b"data")
+    # The parts cannot run together
+    assert _fingerprint(b"ab", b"c") != _fingerprint(b"a", b"bc")
+
+
+def test_mmap_vectors(tmp_path):
+    nlp = spacy.blank("en")
+    nlp.vocab.set_vector("hello", np.arange(4, dtype="float32"))
+    nlp.vocab.set_vector("world", np.ones(4, dtype="float32"))
+    nlp.to_disk(tmp_path / "model")
+    vectors_path = tmp_path / "vectors.npy"
+
+    loaded = _load_pipeline(str(tmp_path / "model"), [], str(vectors_path))
+    # The second load maps the file that the first one wrote
+    mapped = _load_pipeline(str(tmp_path / "model"), [], str(vectors_path))
+
+    assert vectors_path.exists()
+    assert isinstance(mapped.vocab.vectors.data, np.memmap)
+    assert not mapped.vocab.vectors.data.flags.writeable
+    assert np.array_equal(mapped("hello")[0].vector, np.arange(4))
+    assert np.array_equal(mapped("world").vector, loaded("world").vector)
+
 
 class TestNERModel:
     model = NERModel(NERModelConfig.from_toml())
@@ -157,3 +639,43 @@ class TestNERModel:
     )
     def test_predict(self, text, expected):
         assert self.model.predict(text) == expected
+
+    def test_components(self):
+        assert set(self.model.nlp.pipe_names) <= set(self.model.config.components)
+
+    def test_analyse(self):
+        doc = self.model.analyse("Weather in London ", entities=False)
+
+        assert not doc.ents
+        assert self.model.analyse("Weather in London") is doc
+        assert self.model.predict("Weather in London") == [("London", "GPE")]
+        assert self.model.analyse("Weather in Paris") is not doc
+
+    def test_predict_batch(self):
+        texts = ["Weather in London", "", "Weather tomorrow", " Weather in London "]
+
+        assert self.model.predict_batch(texts, batch_size=2) == [
+            self.model.predict(text) for text in texts
+        ]
+
+    def test_predict_cache(self):
+        model = NERModel(NERModelConfig(spacy_model="en", cache_size=2))
+        model.nlp.add_pipe("entity_ruler").add_patterns(
+            [{"label": "GPE", "pattern": "London"}]
+        )
+
+        assert model.predict("Weather in London") == [("London", "GPE")]
+        assert model.predict(" Weather in London ") == [("London", "GPE")]
+        assert model.predict_batch(["Weather in London", "Weather in Paris"]) == [
+            [("London", "GPE")],
+            [],
+        ]
+        assert model.cache_stats()["hits"] == 2
+        assert model.cache_stats()["misses"] == 2
+
+        # Changing the result does not change the cache
+        model.predict("Weather in London").clear()
+        assert model.predict("Weather in London") == [("London", "GPE")]
+
+    def test_predict_cache_disabled(self):
+        assert NERModel(NERModelConfig(spacy_model="en")).cache_stats() == {}
@@ -0,0 +1,155 @@
+import pytest
+
+from ace.ai.rules import (
+    LocationMatcher,
+    LocationMatcherConfig,
+    TemplateMatcher,
+    TemplateMatcherConfig,
+)
+
+
+class TestTemplateMatcher:
+    matcher = TemplateMatcher(
+        TemplateMatcherConfig(
+            enabled=True,
+            intents_directory="tests/data/rules/intents",
+            entities_directory="tests/data/rules/entities",
+        )
+    )
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("this is an example using abc", "example1"),
+            ("Here is another example using DEF!", "example1"),
+            ("  showing   example using 123 ", "example2"),
+            ("another example showing 789", "example2"),
+            ("this is an example using xyz", None),
+            ("this is an example", None),
+            ("example showing 123 and abc", None),
+            ("", None),
+            (None, None),
+        ],
+    )
+    def test_match(self, text, expected):
+        assert self.matcher.match(text) == expected
+
+    def test_match_multi_word_entity(self):
+        matcher = TemplateMatcher(
+            raw_intents={"current_weather": ["weather in {location}"]},
+            raw_entities={"location": ["new york", "york"]},
+        )
+
+        assert matcher.match("Weather in New York") == "current_weather"
+        assert matcher.match("weather in york") == "current_weather"
+        assert matcher.match("weather in new") is None
+
+    def test_match_entity_store(self, tmp_path):
+        matcher = TemplateMatcher(
+            TemplateMatcherConfig(
+                enabled=True,
+                intents_directory="tests/data/rules/intents",
+                entities_directory="tests/data/rules/entities",
+                entity_store_directory=str(tmp_path),
+            )
+        )
+
+        assert matcher.match("Here is another example using DEF!") == "example1"
+        assert matcher.match("another example showing 789") == "example2"
+        assert matcher.match("this is an example using xyz") is None
+
+    def test_match_ambiguous(self):
+        matcher = TemplateMatcher(
+            raw_intents={"open_app": ["open {app}"], "close_app": ["{verb} {app}"]},
+            raw_entities={"app": ["chrome"], "verb": ["open", "close"]},
+        )
+
+        assert matcher.match("open chrome") is None
+        assert matcher.match("close chrome") == "close_app"
+
+    def test_stats(self):
+        matcher = TemplateMatcher(
+            raw_intents={"greeting": ["hello"]}, raw_entities={"name": ["ace"]}
+        )
+
+        matcher.match("hello")
+        matcher.match("goodbye")
+
+        assert matcher.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+class TestLocationMatcher:
+    matcher = LocationMatcher(locations=["london", "new york", "york", "tokyo, japan"])
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("current weather in London", "London"),
+            ("Weather in NEW YORK tomorrow?", "NEW YORK"),
+            ("weather in york", "york"),
+            ("is it raining in tokyo", "tokyo"),
+            ("weather in Tokyo, Japan", "Tokyo, Japan"),
+            ("weather in japan", None),
+            ("what is the weather like", None),
+            ("", None),
+            (None, None),
+        ],
+    )
+    def test_match(self, text, expected):
+        assert self.matcher.match(text) == expected
+
+    def test_gazetteer(self, tmp_path):
+        locations_file = tmp_path / "location.entity"
+        locations_file.write_text("london\n", encoding="utf-8")
+        gazetteer_file = tmp_path / "gazetteer.txt"
+        gazetteer_file.write_text("# my places\nsan jose\n\n", encoding="utf-8")
+
+        matcher = LocationMatcher(
+            LocationMatcherConfig(
+                enabled=True,
+                locations_file=str(locations_file),
+                gazetteer_file=str(gazetteer_file),
+            )
+        )
+
+        assert matcher.match("weather in london") == "london"
+        assert matcher.match("weather in San Jose") == "San Jose"
+        assert matcher.match("weather in my places") is None
+
+    def test_entity_store(self, tmp_path):
+        locations_file = tmp_path / "entities" / "location.entity"
+        locations_file.parent.mkdir()
+        locations_file.write_text("new york\ntokyo, japan\n", encoding="utf-8")
+        gazetteer_file = tmp_path / "gazetteer.txt"
+        gazetteer_file.write_text("york\n", encoding="utf-8")
+
+        matcher = LocationMatcher(
+            LocationMatcherConfig(
+                locations_file=str(locations_file),
+                gazetteer_file=str(gazetteer_file),
+                entity_store_directory=str(tmp_path / "store"),
+            )
+        )
+
+        assert matcher.match("weather in New York") == "New York"
+        assert matcher.match("weather in york") == "york"
+        assert matcher.match("is it raining in Tokyo") == "Tokyo"
+        assert matcher.match("weather in japan") is None
+
+    def test_missing_gazetteer(self, tmp_path):
+        matcher = LocationMatcher(
+            LocationMatcherConfig(
+                locations_file="tests/data/rules/entities/example_entity1.entity",
+                gazetteer_file=str(tmp_path / "missing.txt"),
+            )
+        )
+
+        assert matcher.match("weather in abc") == "abc"
+
+    def test_stats(self):
+        matcher = LocationMatcher(locations=["paris"])
+
+        matcher.match("weather in paris")
+        matcher.match("weather here")
+
+        assert matcher.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
@@ -0,0 +1,57 @@
+import pytest
+
+from ace.ai import sweep
+
+
+class TestLoadGrid:
+    def test_load_grid(self, tmp_path) -> None:
+        grid = tmp_path / "sweep.toml"
+        grid.write_text(
+            "[model]\n"
+            'spacy_model = ["en", "en_core_web_md"]\n'
+            "threshold = 0.5\n"
+            "[spacy]\n"
+            '"components.textcat.model.ngram_size" = [1, 2]\n'
+        )
+
+        variants = sweep.load_grid(str(grid))
+
+        assert len(variants) == 4
+        assert variants[0] == {
+            "model": {"spacy_model": "en", "threshold": 0.5},
+            "spacy": {"components.textcat.model.ngram_size": 1},
+        }
+        assert {
+            (
+                variant["model"]["spacy_model"],
+                variant["spacy"][next(iter(variant["spacy"]))],
+            )
+            for variant in variants
+        } == {("en", 1), ("en", 2), ("en_core_web_md", 1), ("en_core_web_md", 2)}
+
+    def test_load_grid_empty(self, tmp_path) -> None:
+        grid = tmp_path / "sweep.toml"
+        grid.write_text("")
+
+        assert sweep.load_grid(str(grid)) == [{"model": {}, "spacy": {}}]
+
+    def test_load_grid_unknown_setting(self, tmp_path) -> None:
+        grid = tmp_path / "sweep.toml"
+        grid.write_text("[model]\nlearning_rate = [0.1, 0.2]\n")
+
+        with pytest.raises(ValueError):
+            sweep.load_grid(str(grid))
+
+
+def test_mark_pareto() -> None:
+    results = [
+        {"accuracy": 0.9, "latency_ms": {"p50": 2.0}},
+        {"accuracy": 0.8, "latency_ms": {"p50": 1.0}},
+        {"accuracy": 0.8, "latency_ms": {"p50": 3.0}},
+        {"accuracy": 0.9, "latency_ms": {"p50": 2.0}},
+        {"error": "failed"},
+    ]
+
+    sweep._mark_pareto(results)
+
+    assert [result["pareto"] for result in results] == [True, True, False, True, False]
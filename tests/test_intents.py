@@ -7,6 +7,7 @@ from pytest import mark
 from requests.exceptions import ConnectionError, HTTPError
 from todoist_api_python.models import Due, Task
 
+from ace.ai.models import LazyModel
 from ace.intents import run_intent
 
 
@@ -281,6 +282,23 @@ class TestCurrentWeatherIntent:
         assert response == expected
         assert exit_script is False
 
+    @staticmethod
+    def test_current_weather_known_location_skips_ner(
+        monkeypatch, mock_weather_response_failure_404
+    ):
+        def fail_to_load():
+            raise AssertionError("The NER model should not be loaded")
+
+        monkeypatch.setattr("ace.intents.ner_model", LazyModel(fail_to_load))
+        monkeypatch.setattr(
+            "ace.intents.WeatherAPI._get_response",
+            lambda *args: mock_weather_response_failure_404,
+        )
+
+        response, _ = run_intent("current_weather", "what's the weather in Las Vegas")
+
+        assert "(Las Vegas)" in response
+
 
 @freeze_time("13-07-2022 08:00:00")
 class TestTomorrowWeatherIntent:
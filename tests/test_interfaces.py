@@ -1,6 +1,9 @@
+import threading
+
 import pytest
 
 from ace import interfaces
+from ace.ai.models import LazyModel
 from ace.utils import TextProcessor
 
 text_processor = TextProcessor()
@@ -42,12 +45,110 @@ class TestCLI:
         mock_input.get.return_value = "testing 123"
 
         mock_intent_classifier = mocker.patch("ace.interfaces.CLI.intent_classifier")
+        mock_intent_classifier.config.analyse_with_ner = False
         mock_intent_classifier.predict.return_value = "test_intent"
 
         cli = interfaces.CLI(show_header=False)
 
         assert cli.get_intent() == ("test_intent", "testing 123")
 
+    def test_get_intent_analyse_with_ner(self, mocker):
+        interfaces.ner_model.preload(wait=True)
+        mock_input = mocker.patch("ace.interfaces.CLI.input")
+        mock_input.get.return_value = "is it raining in london right now"
+
+        mock_intent_classifier = mocker.patch("ace.interfaces.CLI.intent_classifier")
+        mock_intent_classifier.config.analyse_with_ner = True
+        mock_intent_classifier.vocab = interfaces.ner_model.model.nlp.vocab
+        mock_intent_classifier.predict_doc.return_value = "current_weather"
+
+        cli = interfaces.CLI(show_header=False)
+
+        assert cli.get_intent() == (
+            "current_weather",
+            "is it raining in london right now",
+        )
+        doc = mock_intent_classifier.predict_doc.call_args.args[0]
+        assert (
+            interfaces.ner_model.model.analyse("is it raining in london right now")
+            is doc
+        )
+
+    def test_get_intent_without_ner_loaded(self, mocker, monkeypatch):
+        def load_ner():
+            raise AssertionError("The NER model should not be loaded")
+
+        monkeypatch.setattr(interfaces, "ner_model", LazyModel(load_ner))
+        mock_input = mocker.patch("ace.interfaces.CLI.input")
+        mock_input.get.return_value = "hello"
+
+        mock_intent_classifier = mocker.patch("ace.interfaces.CLI.intent_classifier")
+        mock_intent_classifier.config.analyse_with_ner = True
+        mock_intent_classifier.predict.return_value = "greeting"
+
+        cli = interfaces.CLI(show_header=False)
+
+        assert cli.get_intent() == ("greeting", "hello")
+        assert not interfaces.ner_model.loaded
+
+    def test_reload_model_on_ner_load(self, monkeypatch):
+        ner_model = interfaces.ner_model
+        lazy = LazyModel(lambda: ner_model.model)
+        monkeypatch.setattr(interfaces, "ner_model", lazy)
+        cli = interfaces.CLI(show_header=False)
+        model = cli.intent_classifier
+
+        lazy.preload(wait=True)
+        cli.model_holder.reload(wait=True)
+        cli.predict_intent("hello")
+
+        assert model.vocab is None
+        assert cli.intent_classifier is not model
+        assert cli.intent_classifier.vocab is lazy.model.nlp.vocab
+
+    def test_reload_model_on_ner_load_while_loading(self, monkeypatch):
+        ner_model = interfaces.ner_model
+        ner_ready = threading.Event()
+        lazy = LazyModel(lambda: ner_ready.wait() and ner_model.model)
+        monkeypatch.setattr(interfaces, "ner_model", lazy)
+        cli = interfaces.CLI(show_header=False)
+
+        # A reload, e.g. from the watcher, builds its model before the NER model
+        # has loaded, and is still running when it does
+        built, release = threading.Event(), threading.Event()
+        factory = cli.model_holder.factory
+
+        def slow_factory():
+            model = factory()
+            built.set()
+            release.wait()
+            return model
+
+        monkeypatch.setattr(cli.model_holder, "factory", slow_factory)
+        cli.model_holder.reload()
+        built.wait()
+        loader = cli.model_holder._loader
+
+        ner_ready.set()
+        lazy.preload(wait=True)
+        release.set()
+        loader.join()
+        cli.predict_intent("hello")
+
+        assert cli.intent_classifier.vocab is lazy.model.nlp.vocab
+
+    def test_reload_model(self):
+        cli = interfaces.CLI(show_header=False)
+        model = cli.intent_classifier
+
+        cli.reload_model()
+        cli.model_holder.reload(wait=True)
+        cli.predict_intent("hello")
+
+        assert cli.intent_classifier is not model
+        assert cli.rollback_model()
+        assert cli.intent_classifier is model
+
 
 class TestGUI:
     @pytest.fixture
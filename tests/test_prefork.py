@@ -0,0 +1,79 @@
+import os
+import signal
+import time
+
+import pytest
+
+from ace.prefork import FORK_SUPPORTED, PreforkPool, fork_workers, memory_usage
+
+requires_fork = pytest.mark.skipif(not FORK_SUPPORTED, reason="Requires os.fork")
+requires_proc = pytest.mark.skipif(
+    not os.path.exists("/proc/self/smaps_rollup"), reason="Requires /proc"
+)
+
+
+def double(items):
+    return [item * 2 for item in items]
+
+
+@pytest.mark.parametrize("processes", [1, 3])
+def test_pool_map(processes):
+    with PreforkPool(double, processes) as pool:
+        assert pool.map(list(range(25)), batch_size=4) == double(list(range(25)))
+
+
+def test_pool_map_empty():
+    with PreforkPool(double, 2) as pool:
+        assert pool.map([]) == []
+
+
+@requires_fork
+@requires_proc
+def test_pool_worker_memory():
+    with PreforkPool(double, 2) as pool:
+        memory = pool.worker_memory()
+
+    assert len(memory) == 2
+    assert all(usage["rss"] >= usage["uss"] > 0 for usage in memory.values())
+
+
+@requires_fork
+def test_fork_workers(tmp_path):
+    pids = fork_workers(lambda: (tmp_path / str(os.getpid())).touch(), 2)
+
+    for pid in pids:
+        assert os.waitpid(pid, 0)[1] == 0
+    assert sorted(int(path.name) for path in tmp_path.iterdir()) == sorted(pids)
+
+
+@requires_fork
+def test_fork_workers_default_sigterm():
+    previous = signal.signal(signal.SIGTERM, lambda *args: None)
+    try:
+        (pid,) = fork_workers(lambda: time.sleep(30), 1)
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + 5
+    while not (status := os.waitpid(pid, os.WNOHANG))[0]:
+        if time.monotonic() > deadline:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            pytest.fail("Worker ignored SIGTERM")
+        time.sleep(0.05)
+
+    assert os.WIFSIGNALED(status[1])
+    assert os.WTERMSIG(status[1]) == signal.SIGTERM
+
+
+@requires_proc
+def test_memory_usage():
+    usage = memory_usage()
+
+    assert set(usage) == {"rss", "pss", "uss", "shared"}
+    assert usage["rss"] >= usage["pss"] >= usage["uss"] > 0
+
+
+def test_memory_usage_missing_process():
+    assert memory_usage(-1) == {}
@@ -0,0 +1,177 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.client import HTTPConnection
+
+import pytest
+
+from ace.prefork import FORK_SUPPORTED
+from ace import server as server_module
+from ace.server import UNIX_SOCKETS_SUPPORTED, InferenceServer, ServerConfig
+
+
+@pytest.fixture(scope="module")
+def server():
+    return InferenceServer(ServerConfig(port=0, workers=2))
+
+
+def test_config_from_toml(tmp_path):
+    config_file = tmp_path / "main.toml"
+    config_file.write_text("[server]\nport = 9000\nworkers = 8\n")
+
+    config = ServerConfig.from_toml(str(config_file))
+
+    assert config == ServerConfig(port=9000, workers=8)
+    assert config.processes == 0
+
+
+def test_config_defaults(tmp_path):
+    config_file = tmp_path / "main.toml"
+    config_file.write_text("")
+
+    assert ServerConfig.from_toml(str(config_file)) == ServerConfig()
+
+
+def test_socket_path_unsupported(monkeypatch):
+    monkeypatch.setattr(server_module, "UNIX_SOCKETS_SUPPORTED", False)
+
+    with pytest.raises(OSError):
+        InferenceServer(ServerConfig(socket_path="ace.sock"))
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class TestInferenceServer:
+    @pytest.mark.parametrize(
+        "path,payload,status",
+        [
+            ("/health", None, HTTPStatus.OK),
+            ("/health/", None, HTTPStatus.OK),
+            ("/unknown", {"text": "hello"}, HTTPStatus.NOT_FOUND),
+            ("/intent", None, HTTPStatus.METHOD_NOT_ALLOWED),
+            ("/intent", {}, HTTPStatus.BAD_REQUEST),
+            ("/intent", {"text": 1}, HTTPStatus.BAD_REQUEST),
+        ],
+    )
+    def test_handle_status(self, server, path, payload, status):
+        assert server.handle(path, payload)[0] == status
+
+    def test_health(self, server):
+        assert server.handle("/health", None)[1]["pid"] == os.getpid()
+
+    def test_intent(self, server):
+        assert server.handle("/intent", {"text": "Hello"}) == (
+            HTTPStatus.OK,
+            {"intent": "greeting"},
+        )
+
+    def test_entities(self, server):
+        status, body = server.handle("/entities", {"text": "Weather in London"})
+
+        assert status == HTTPStatus.OK
+        assert body == {"entities": [["London", "GPE"]]}
+
+    def test_respond(self, server):
+        status, body = server.handle("/respond", {"text": "Goodbye"})
+
+        assert status == HTTPStatus.OK
+        assert body["intent"] == "goodbye"
+        assert body["should_exit"] is True
+
+    def test_serve(self, server):
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        while server._server is None:
+            pass
+
+        connection = HTTPConnection("127.0.0.1", server._server.server_address[1])
+        connection.request("POST", "/intent", body=json.dumps({"text": "Hello"}))
+        response = connection.getresponse()
+
+        server.shutdown()
+        thread.join()
+
+        assert response.status == HTTPStatus.OK
+        assert json.loads(response.read()) == {"intent": "greeting"}
+
+    @pytest.mark.skipif(not FORK_SUPPORTED, reason="Requires os.fork")
+    def test_serve_processes(self, server, monkeypatch):
+        monkeypatch.setattr(server, "config", ServerConfig(port=0, processes=2))
+        monkeypatch.setattr(server, "_server", None)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        while server._server is None:
+            pass
+
+        connection = HTTPConnection("127.0.0.1", server._server.server_address[1])
+        connection.request("POST", "/intent", body=json.dumps({"text": "Hello"}))
+        response = connection.getresponse()
+
+        server.shutdown()
+        thread.join(timeout=10)
+
+        assert not thread.is_alive()
+        assert server._workers == []
+        assert response.status == HTTPStatus.OK
+        assert json.loads(response.read()) == {"intent": "greeting"}
+
+    @pytest.mark.skipif(not UNIX_SOCKETS_SUPPORTED, reason="Requires Unix sockets")
+    def test_serve_unix_socket(self, server, monkeypatch, tmp_path):
+        socket_path = str(tmp_path / "ace.sock")
+        monkeypatch.setattr(server, "config", ServerConfig(socket_path=socket_path))
+        monkeypatch.setattr(server, "_server", None)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        while server._server is None:
+            pass
+
+        connection = _UnixHTTPConnection(socket_path)
+        connection.request("POST", "/intent", body=json.dumps({"text": "Hello"}))
+        response = connection.getresponse()
+
+        server.shutdown()
+        thread.join()
+
+        assert response.status == HTTPStatus.OK
+        assert json.loads(response.read()) == {"intent": "greeting"}
+        assert not os.path.exists(socket_path)
+
+    @pytest.mark.skipif(not FORK_SUPPORTED, reason="Requires os.fork")
+    def test_serve_processes_reaps_workers(self, server, monkeypatch):
+        monkeypatch.setattr(server, "config", ServerConfig(port=0, processes=2))
+        monkeypatch.setattr(server, "_server", None)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 10
+        while len(server._workers) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # Another child exiting is left alone, and an exited worker is removed
+        other = subprocess.Popen([sys.executable, "-c", "pass"])
+        worker, survivor = server._workers
+        os.kill(worker, signal.SIGKILL)
+        while server._workers != [survivor] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        workers = list(server._workers)
+        alive = thread.is_alive()
+
+        server.shutdown()
+        thread.join(timeout=10)
+
+        assert other.wait(timeout=5) == 0
+        assert alive
+        assert workers == [survivor]